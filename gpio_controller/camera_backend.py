@@ -0,0 +1,416 @@
+# -*- coding: utf-8 -*-
+"""
+카메라 백엔드 (촬영 1장 = capture(path)).
+- picamera2: 프로세스당 1회 open → 센서 설정·연속 AF 상태로 유지(warm). 이후 촬영은 실행 중 스트림에서 바로 JPEG 저장
+  (libcamera-still 프로세스 기동 + 2s 프리뷰 + AF 없음 → 슬롯 촬영이 feces_st+offset 에 가깝게).
+- libcamera: 기존 방식 (촬영마다 libcamera-still 실행). picamera2 미설치/초기화 실패 시 fallback.
+- fake: 하드웨어 없이 더미 JPEG 저장 (개발/시뮬레이션/검증용).
+
+선택: 환경변수 HEM_CAMERA_BACKEND = auto(기본) | picamera2 | libcamera | fake
+  auto → picamera2 import·open 성공 시 picamera2, 아니면 libcamera.
+
+모든 촬영은 CAMERA_CAPTURE_TIMEOUT_SEC 상한. libcamera-still 은 새 프로세스 그룹으로 실행 → 초과 시 그룹 전체
+SIGTERM → SIGKILL (멈춘 카메라 스택이 main.py 를 붙잡지 않음). 결과는 capture_result() dict
+(ok, returncode, duration_sec, timed_out, stderr_tail, error).
+
+상태 확인은 probe_camera(): 촬영 없이 카메라 열거만 (picamera2 global_camera_info / libcamera-still --list-cameras),
+CAMERA_PROBE_TIMEOUT_SEC 상한, 결과는 CAMERA_PROBE_TTL_SEC 동안 캐시 → 세션 전/상태 보고마다 호출해도 수 ms.
+"""
+import os
+import re
+import sys
+import time
+import signal
+import threading
+import subprocess
+import importlib.util
+
+
+CAMERA_BACKEND = os.environ.get("HEM_CAMERA_BACKEND", "auto").strip().lower() or "auto"
+
+# 레거시: 촬영 타임아웃(ms), 자동초점 옵션 (libcamera 백엔드)
+LIBCAMERA_STILL_TIMEOUT_MS = int(os.environ.get("LIBCAMERA_STILL_TIMEOUT_MS", "2000"))
+LIBCAMERA_AUTOFOCUS = os.environ.get("LIBCAMERA_AUTOFOCUS", "1").lower() in ("1", "true", "yes")
+
+# 촬영 1회 wall-clock 상한(초). 기본: libcamera-still 프리뷰 시간 + 8초 (프로세스 기동·AF·저장 여유)
+CAMERA_CAPTURE_TIMEOUT_SEC = float(os.environ.get(
+    "CAMERA_CAPTURE_TIMEOUT_SEC", str(LIBCAMERA_STILL_TIMEOUT_MS / 1000.0 + 8.0)))
+# 타임아웃 시 SIGTERM 후 SIGKILL 까지 유예(초)
+CAMERA_KILL_GRACE_SEC = float(os.environ.get("CAMERA_KILL_GRACE_SEC", "1.0"))
+# 결과에 남길 stderr 끝부분(bytes)
+CAMERA_STDERR_TAIL_BYTES = int(os.environ.get("CAMERA_STDERR_TAIL_BYTES", "2048"))
+
+# probe_camera: 열거 상한(초), 결과 캐시 유지 시간(초)
+CAMERA_PROBE_TIMEOUT_SEC = float(os.environ.get("CAMERA_PROBE_TIMEOUT_SEC", "3.0"))
+CAMERA_PROBE_TTL_SEC = float(os.environ.get("CAMERA_PROBE_TTL_SEC", "60.0"))
+
+# picamera2: open 직후 초점/노출 수렴 대기(초). 이후 촬영에는 대기 없음.
+PICAMERA2_SETTLE_SEC = float(os.environ.get("PICAMERA2_SETTLE_SEC", "1.0"))
+# fake: 촬영 1회 소요 시간 흉내(초)
+FAKE_CAMERA_DELAY_SEC = float(os.environ.get("FAKE_CAMERA_DELAY_SEC", "0"))
+
+
+def capture_result(ok, duration_sec, returncode=None, timed_out=False, stderr_tail="", error=None):
+    """촬영/probe 1회 결과 dict (CaptureWorker 결과·로그에 그대로 기록)."""
+    return {
+        "ok": bool(ok),
+        "returncode": returncode,
+        "duration_sec": round(duration_sec, 3),
+        "timed_out": timed_out,
+        "stderr_tail": stderr_tail,
+        "error": error,
+    }
+
+
+def _kill_group(proc):
+    """proc 의 프로세스 그룹 전체 종료: SIGTERM → CAMERA_KILL_GRACE_SEC 후 SIGKILL."""
+    for sig, grace in ((signal.SIGTERM, CAMERA_KILL_GRACE_SEC), (signal.SIGKILL, None)):
+        try:
+            os.killpg(proc.pid, sig)
+        except ProcessLookupError:
+            return
+        except OSError:
+            proc.kill()
+        try:
+            proc.wait(timeout=grace)
+            return
+        except subprocess.TimeoutExpired:
+            continue
+
+
+def run_camera_command(args, timeout_sec=None, capture_stdout=False):
+    """
+    카메라 명령(libcamera-still 등)을 새 프로세스 그룹(세션)으로 실행, wall-clock 상한 적용.
+    :param args: argv 리스트 (shell 미사용)
+    :param timeout_sec: 상한(초). 기본 CAMERA_CAPTURE_TIMEOUT_SEC
+    :param capture_stdout: True 면 결과에 stdout(텍스트) 포함 (--list-cameras 등)
+    :return: capture_result() dict (ok = 종료 코드 0)
+    """
+    timeout_sec = CAMERA_CAPTURE_TIMEOUT_SEC if timeout_sec is None else timeout_sec
+    t0 = time.monotonic()
+    try:
+        proc = subprocess.Popen(args, stdin=subprocess.DEVNULL,
+                                stdout=subprocess.PIPE if capture_stdout else subprocess.DEVNULL,
+                                stderr=subprocess.PIPE, start_new_session=True)
+    except OSError as e:
+        return capture_result(False, time.monotonic() - t0, error=str(e))
+    timed_out = False
+    try:
+        out, err = proc.communicate(timeout=timeout_sec)
+    except subprocess.TimeoutExpired:
+        timed_out = True
+        _kill_group(proc)
+        try:
+            out, err = proc.communicate(timeout=CAMERA_KILL_GRACE_SEC)
+        except subprocess.TimeoutExpired:
+            out, err = b"", b""   # 자식이 파이프를 계속 잡고 있음 → 포기 (그룹은 이미 SIGKILL)
+    tail = (err or b"")[-CAMERA_STDERR_TAIL_BYTES:].decode("utf-8", "replace")
+    result = capture_result(proc.returncode == 0 and not timed_out, time.monotonic() - t0,
+                            returncode=proc.returncode, timed_out=timed_out, stderr_tail=tail,
+                            error=f"timeout after {timeout_sec:g}s" if timed_out else None)
+    if capture_stdout:
+        result["stdout"] = (out or b"").decode("utf-8", "replace")
+    if not result["ok"]:
+        print(f"[camera_backend] {args[0]} 실패 rc={proc.returncode} timed_out={timed_out} "
+              f"({result['duration_sec']}s): {tail[-300:].strip()}", file=sys.stderr)
+    return result
+
+
+class CameraBackend:
+    """
+    촬영 백엔드 공통 인터페이스. 인스턴스 1개를 여러 스레드가 공유 (capture 는 내부 lock 으로 직렬화).
+    - open(): 장치 준비 (warm 백엔드는 여기서 센서 기동). 실패 시 예외.
+    - capture(path): 1장 저장 (CAMERA_CAPTURE_TIMEOUT_SEC 상한). :return: capture_result() dict
+    - close(): 장치 해제.
+    상태 확인은 백엔드가 아닌 probe_camera() (촬영 없음).
+    - settle_sec: 촬영 직후 다음 카메라 사용 전 권장 대기(초). 슬롯 0 촬영 후 main 이 사용.
+    """
+
+    name = "base"
+    settle_sec = 0.0
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def open(self):
+        return self
+
+    def capture(self, path, timeout_ms=None, autofocus=True):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class LibcameraStillBackend(CameraBackend):
+    """촬영마다 libcamera-still 실행 (레거시 경로)."""
+
+    name = "libcamera"
+    settle_sec = 3.0   # 프로세스 종료 후 카메라 해제 대기 (레거시)
+
+    def capture(self, path, timeout_ms=None, autofocus=True):
+        # 프리뷰 시간을 따로 지정하면 상한도 그만큼 늘림
+        timeout_sec = CAMERA_CAPTURE_TIMEOUT_SEC if timeout_ms is None else max(
+            CAMERA_CAPTURE_TIMEOUT_SEC, timeout_ms / 1000.0 + 8.0)
+        timeout_ms = timeout_ms or LIBCAMERA_STILL_TIMEOUT_MS
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        args = ["libcamera-still", "-t", str(timeout_ms)]
+        if autofocus and LIBCAMERA_AUTOFOCUS:
+            args.append("--autofocus-on-capture")
+        args += ["-o", path]
+        with self._lock:
+            result = run_camera_command(args, timeout_sec)
+        if result["ok"] and not os.path.isfile(path):
+            result.update(ok=False, error="output file missing")
+        return result
+
+
+class Picamera2Backend(CameraBackend):
+    """picamera2 warm 세션: still 설정으로 1회 start, 연속 AF 유지. capture 는 실행 중 스트림에서 저장."""
+
+    name = "picamera2"
+
+    def __init__(self):
+        super().__init__()
+        self._cam = None
+
+    def open(self):
+        with self._lock:
+            if self._cam is not None:
+                return self
+            from picamera2 import Picamera2   # 지연 import (라즈베리파이 전용, import 비용 큼)
+            cam = Picamera2()
+            try:
+                cam.configure(cam.create_still_configuration(buffer_count=2))
+                cam.start()
+                if LIBCAMERA_AUTOFOCUS:
+                    try:
+                        from libcamera import controls
+                        cam.set_controls({"AfMode": controls.AfModeEnum.Continuous})
+                    except Exception as e:
+                        print(f"[camera_backend] 연속 AF 설정 실패(고정 초점 사용): {e}", file=sys.stderr)
+                time.sleep(PICAMERA2_SETTLE_SEC)
+            except Exception:
+                cam.close()
+                raise
+            self._cam = cam
+        return self
+
+    def capture(self, path, timeout_ms=None, autofocus=True):
+        from concurrent.futures import TimeoutError as FutureTimeout   # Python < 3.11 에서는 TimeoutError 와 별개
+        t0 = time.monotonic()
+        try:
+            if self._cam is None:
+                self.open()
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with self._lock:
+                job = self._cam.capture_file(path, wait=False)
+                job.get_result(timeout=CAMERA_CAPTURE_TIMEOUT_SEC)
+        except (TimeoutError, FutureTimeout):
+            # 카메라 스택 멈춤 → 세션 폐기 (다음 촬영에서 재open). close 도 멈출 수 있어 별도 스레드에서.
+            self._abandon()
+            return capture_result(False, time.monotonic() - t0, timed_out=True,
+                                  error=f"timeout after {CAMERA_CAPTURE_TIMEOUT_SEC:g}s")
+        except Exception as e:
+            return capture_result(False, time.monotonic() - t0, error=str(e))
+        return capture_result(os.path.isfile(path), time.monotonic() - t0)
+
+    def _abandon(self):
+        with self._lock:
+            cam, self._cam = self._cam, None
+        if cam is not None:
+            print("[camera_backend] picamera2 촬영 타임아웃 → 세션 폐기", file=sys.stderr)
+            threading.Thread(target=cam.close, name="picamera2-close", daemon=True).start()
+
+    @property
+    def model(self):
+        cam = self._cam
+        return cam.camera_properties.get("Model") if cam is not None else None
+
+    def close(self):
+        with self._lock:
+            cam, self._cam = self._cam, None
+        if cam is not None:
+            try:
+                cam.stop()
+            finally:
+                cam.close()
+
+
+class FakeCameraBackend(CameraBackend):
+    """하드웨어 없이 더미 JPEG 저장. captured 에 저장 경로 기록."""
+
+    name = "fake"
+
+    def __init__(self, delay_sec=None, size=(640, 480)):
+        super().__init__()
+        self.delay_sec = FAKE_CAMERA_DELAY_SEC if delay_sec is None else delay_sec
+        self.size = size
+        self.captured = []
+        self._jpeg = None
+
+    def _frame(self):
+        if self._jpeg is None:
+            try:
+                import io
+                from PIL import Image
+                buf = io.BytesIO()
+                Image.new("RGB", self.size, (128, 128, 128)).save(buf, "JPEG", quality=80)
+                self._jpeg = buf.getvalue()
+            except ImportError:
+                self._jpeg = b"\xff\xd8\xff\xd9"   # SOI+EOI (Pillow 없는 환경)
+        return self._jpeg
+
+    def capture(self, path, timeout_ms=None, autofocus=True):
+        t0 = time.monotonic()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._lock:
+            if self.delay_sec > CAMERA_CAPTURE_TIMEOUT_SEC:
+                time.sleep(CAMERA_CAPTURE_TIMEOUT_SEC)
+                return capture_result(False, time.monotonic() - t0, timed_out=True,
+                                      error=f"timeout after {CAMERA_CAPTURE_TIMEOUT_SEC:g}s")
+            if self.delay_sec > 0:
+                time.sleep(self.delay_sec)
+            with open(path, "wb") as f:
+                f.write(self._frame())
+            self.captured.append(path)
+        return capture_result(True, time.monotonic() - t0)
+
+
+BACKENDS = {
+    "picamera2": Picamera2Backend,
+    "libcamera": LibcameraStillBackend,
+    "fake": FakeCameraBackend,
+}
+
+
+def create_backend(name=None):
+    """
+    이름으로 백엔드 생성·open. auto 는 picamera2 → libcamera 순으로 시도.
+    :raises ValueError: 알 수 없는 이름
+    """
+    name = (name or CAMERA_BACKEND).lower()
+    if name == "auto":
+        try:
+            return Picamera2Backend().open()
+        except Exception as e:
+            print(f"[camera_backend] picamera2 사용 불가 → libcamera-still: {e}", file=sys.stderr)
+            return LibcameraStillBackend().open()
+    if name not in BACKENDS:
+        raise ValueError(f"unknown camera backend: {name} (choose from auto, {', '.join(BACKENDS)})")
+    return BACKENDS[name]().open()
+
+
+_camera = None
+_camera_lock = threading.Lock()
+
+
+def get_camera():
+    """프로세스 공용 카메라 백엔드 (첫 호출 시 생성·open, 이후 warm 상태 재사용)."""
+    global _camera
+    with _camera_lock:
+        if _camera is None:
+            _camera = create_backend()
+            print(f"[camera_backend] 카메라 백엔드: {_camera.name}", file=sys.stderr)
+        return _camera
+
+
+def set_camera(backend):
+    """공용 백엔드 교체 (검사 스크립트에서 FakeCameraBackend 주입 등). 기존 백엔드는 닫지 않고 반환."""
+    global _camera
+    with _camera_lock:
+        previous, _camera = _camera, backend
+    return previous
+
+
+def close_camera():
+    """공용 백엔드 해제 (원샷 종료/데몬 종료 시)."""
+    global _camera
+    with _camera_lock:
+        cam, _camera = _camera, None
+    if cam is not None:
+        try:
+            cam.close()
+        except Exception as e:
+            print(f"[camera_backend] 카메라 해제 예외(무시): {e}", file=sys.stderr)
+
+
+def _list_cameras_picamera2():
+    """picamera2(libcamera CameraManager) 로 연결된 카메라 모델 목록 (촬영/acquire 없음)."""
+    from picamera2 import Picamera2
+    return [info.get("Model") or "?" for info in Picamera2.global_camera_info()]
+
+
+_LIST_CAMERAS_LINE = re.compile(r"^\s*(\d+)\s*:\s*(\S+)")
+
+
+def _list_cameras_cli(timeout_sec):
+    """libcamera-still --list-cameras 출력 파싱 ("0 : imx708 [4608x2592] ..."). :return: (모델 목록, 결과 dict)"""
+    result = run_camera_command(["libcamera-still", "--list-cameras"], timeout_sec, capture_stdout=True)
+    text = result.get("stdout", "") + "\n" + result["stderr_tail"]
+    return [m.group(2) for m in map(_LIST_CAMERAS_LINE.match, text.splitlines()) if m], result
+
+
+def _probe(timeout_sec):
+    t0 = time.monotonic()
+    cam = _camera
+    backend = cam.name if cam is not None else CAMERA_BACKEND
+    out = {"ok": False, "backend": backend, "cameras": [], "method": None, "error": None}
+    try:
+        if backend == "fake":
+            out.update(ok=True, cameras=["fake"], method="fake")
+        elif isinstance(cam, Picamera2Backend) and cam.model:
+            # warm 세션이 열려 있음 = 카메라 정상 (다시 열거하면 세션과 경쟁)
+            out.update(ok=True, cameras=[cam.model], method="session")
+        elif backend in ("auto", "picamera2") and importlib.util.find_spec("picamera2") is not None:
+            box = {}
+
+            def _enumerate():
+                try:
+                    box["cameras"] = _list_cameras_picamera2()
+                except Exception as e:
+                    box["error"] = str(e)
+
+            t = threading.Thread(target=_enumerate, name="camera-probe", daemon=True)
+            t.start()
+            t.join(timeout_sec)
+            if t.is_alive():
+                out.update(method="picamera2", error=f"timeout after {timeout_sec:g}s")
+            else:
+                cameras = box.get("cameras") or []
+                out.update(ok=bool(cameras), cameras=cameras, method="picamera2",
+                           error=box.get("error") or (None if cameras else "no camera"))
+        else:
+            cameras, result = _list_cameras_cli(timeout_sec)
+            out.update(ok=bool(cameras), cameras=cameras, method="list-cameras",
+                       error=None if cameras else (result["error"] or "no camera"))
+    except Exception as e:
+        out["error"] = str(e)
+    out["duration_sec"] = round(time.monotonic() - t0, 3)
+    out["checked_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+    return out
+
+
+_probe_cache = None   # (time.monotonic(), result)
+_probe_lock = threading.Lock()
+
+
+def probe_camera(force=False, timeout_sec=None, ttl_sec=None):
+    """
+    카메라 상태 확인 (촬영 없음, 캐시). 부팅 시·세션 전·상태 보고에서 호출.
+    :param force: True 면 캐시 무시하고 다시 확인
+    :param timeout_sec: 열거 상한(초, 기본 CAMERA_PROBE_TIMEOUT_SEC)
+    :param ttl_sec: 캐시 유효 시간(초, 기본 CAMERA_PROBE_TTL_SEC)
+    :return: dict - ok, backend, cameras(모델 목록), method, error, duration_sec, checked_at
+    """
+    global _probe_cache
+    timeout_sec = CAMERA_PROBE_TIMEOUT_SEC if timeout_sec is None else timeout_sec
+    ttl_sec = CAMERA_PROBE_TTL_SEC if ttl_sec is None else ttl_sec
+    with _probe_lock:
+        if not force and _probe_cache is not None and time.monotonic() - _probe_cache[0] < ttl_sec:
+            return dict(_probe_cache[1])
+        result = _probe(timeout_sec)
+        _probe_cache = (time.monotonic(), result)
+        if not result["ok"]:
+            print(f"[camera_backend] 카메라 상태 이상: {result['error']} ({result['method']})", file=sys.stderr)
+        return dict(result)
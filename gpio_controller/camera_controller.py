@@ -14,61 +14,101 @@
 레거시 동작 (docs/LEGACY_ANALYSIS.md 참고):
 - 연결 확인: libcamera-still -t 2000 -o test.jpg
 - 4시점 촬영: NoFeces(0), Feces 1/2/3 → data_file_name-image_time-0~3.jpg
+
+촬영 장치는 camera_backend (HEM_CAMERA_BACKEND: picamera2 warm 세션 / libcamera-still / fake).
+슬롯 1~3 촬영은 CaptureWorker(백그라운드 스레드)에서 실행 → 가스 1Hz 샘플링 루프가 촬영 동안 멈추지 않음.
+config.PIPELINE_UPLOAD 사용 시 촬영 완료 즉시 UploadWorker 가 측정 중에 업로드 (UPLOAD_RATE_LIMIT_BPS 로 대역 제한).
+CAPTURE_BURST_FRAMES>1 이면 슬롯마다 연속 N장 촬영 → Laplacian 분산(선명도) 최고 1장만 남기고 점수는 업로드 필드로 전송.
+슬롯 0 축소 signature 를 기준으로 슬롯 1~3 유사도 계산 (config.SLOT_SIMILARITY_ACTION: flag 기록 / skip 업로드 생략).
+촬영 파일은 retention.CAPTURE_STAGING_DIR(HEM_CAPTURE_DIR, 기본 tmpfs)에 저장. 재전송이 필요한 이미지만 SD spool 로 이동.
+IMAGE_PREPROCESS=1 이면 CaptureWorker 에서 촬영 직후 ROI crop / 축소 / JPEG 재인코딩 (preprocess_image, Pillow).
 """
+import io
 import os
 import sys
-import json
+import queue
 import random
 import shutil
+import threading
+import time
 from datetime import datetime
-import urllib.request
-import urllib.error
+import http.client
 import config
+import http_client
+from retention import CAPTURE_STAGING_DIR
+from camera_backend import LIBCAMERA_AUTOFOCUS, LIBCAMERA_STILL_TIMEOUT_MS, capture_result, get_camera, probe_camera
 
 # 서버 규격: filename 에서 gas_id(5자), test_id, 촬영시각 파싱 (ref/servlet.py)
 # filename 형식: {gas_id}{test_id}-{YYYYmmddHHMMSS}-.jpg (마지막 '-'로 split 시 image_info[1]에 확장자 안 붙음 → servlet strptime 500 회피)
 # 예: FFFFF00042-20250213120500-.jpg
 
-# 레거시: 촬영 타임아웃(ms), 자동초점 옵션
-LIBCAMERA_STILL_TIMEOUT_MS = int(os.environ.get("LIBCAMERA_STILL_TIMEOUT_MS", "2000"))
-LIBCAMERA_AUTOFOCUS = os.environ.get("LIBCAMERA_AUTOFOCUS", "1").lower() in ("1", "true", "yes")
+# CaptureWorker 큐 크기 (슬롯 1~3 요청 대기열). 가득 차면 요청은 실패로 기록되고 샘플링 루프는 대기하지 않음.
+CAPTURE_QUEUE_SIZE = int(os.environ.get("CAPTURE_QUEUE_SIZE", "4"))
+
+# 측정 중 파이프라인 업로드 대역 제한(bytes/s, 0 이면 무제한). 측정 종료 후 남은 업로드는 제한 해제.
+UPLOAD_RATE_LIMIT_BPS = int(os.environ.get("UPLOAD_RATE_LIMIT_BPS", str(128 * 1024)))
+UPLOAD_CHUNK_SIZE = int(os.environ.get("UPLOAD_CHUNK_SIZE", str(16 * 1024)))
+
+# 슬롯 1~3 burst 촬영 장수 (1 이면 단일 촬영). warm 백엔드(picamera2)에서 사용 권장 — libcamera-still 은 장당 수 초.
+CAPTURE_BURST_FRAMES = max(1, int(os.environ.get("CAPTURE_BURST_FRAMES", "1")))
+# 선명도 채점용 축소 크기(긴 변 px). JPEG draft 디코딩으로 12MP 전체 디코딩 없이 채점 (Pi 4 장당 수십 ms)
+SHARPNESS_MAX_SIDE = int(os.environ.get("SHARPNESS_MAX_SIDE", "640"))
+# 슬롯 0 대비 유사도: 그레이스케일 IMAGE_SIGNATURE_SIZE² 블록 평균으로 축소, 블록 밝기 차가 평균 대비
+# IMAGE_SIGNATURE_TOLERANCE 를 넘으면 "바뀐 블록"
+IMAGE_SIGNATURE_SIZE = int(os.environ.get("IMAGE_SIGNATURE_SIZE", "32"))
+IMAGE_SIGNATURE_TOLERANCE = float(os.environ.get("IMAGE_SIGNATURE_TOLERANCE", "0.1"))
+
+# 업로드 전 이미지 전처리 (슬롯 1~3, CaptureWorker 스레드). 서버 Bristol/색상 분류는 12MP 불필요.
+IMAGE_PREPROCESS = os.environ.get("IMAGE_PREPROCESS", "").lower() in ("1", "true", "yes")
+# 변기 ROI: "x0,y0,x1,y1" 프레임 대비 비율(0~1). 비어 있으면 crop 안 함.
+IMAGE_ROI = os.environ.get("IMAGE_ROI", "").strip()
+# 긴 변 최대 픽셀 (0 이면 축소 안 함)
+IMAGE_MAX_SIDE = int(os.environ.get("IMAGE_MAX_SIDE", "1600"))
+IMAGE_JPEG_QUALITY = int(os.environ.get("IMAGE_JPEG_QUALITY", "85"))
+# 파일 크기 상한(bytes, 0 이면 없음). 초과 시 IMAGE_MIN_QUALITY 까지 품질을 낮춰 재인코딩.
+IMAGE_MAX_BYTES = int(os.environ.get("IMAGE_MAX_BYTES", "0"))
+IMAGE_MIN_QUALITY = int(os.environ.get("IMAGE_MIN_QUALITY", "50"))
 
 
 def check_camera_connection(timeout_sec=2, retries=2):
     """
-    libcamera-still로 카메라 연결 여부 확인 (Raspberry Pi).
-    :param timeout_sec: 촬영 대기 시간(초)
+    카메라 연결 여부 확인 (Raspberry Pi). 촬영 없이 camera_backend.probe_camera() 로 열거 (캐시 사용, 재시도는 캐시 무시).
+    :param timeout_sec: 열거 상한(초)
     :param retries: 실패 시 재시도 횟수
     :return: bool - 연결 성공 여부
     """
-    for _ in range(max(1, retries)):
-        try:
-            t_ms = min(10000, max(1000, int(timeout_sec * 1000)))
-            out = os.path.join(config.GPIO_CONTROLLER_DIR, "tmp", "test.jpg")
-            os.makedirs(os.path.dirname(out), exist_ok=True)
-            cmd = f"libcamera-still -t {t_ms} -o {out}"
-            if os.system(cmd) == 0 and os.path.isfile(out):
-                return True
-        except Exception:
-            pass
+    for attempt in range(max(1, retries)):
+        if probe_camera(force=attempt > 0, timeout_sec=timeout_sec)["ok"]:
+            return True
     return False
 
 
 def capture_to_file(save_path, timeout_ms=None, autofocus_on_capture=True):
     """
-    libcamera-still로 1회 촬영하여 save_path에 저장 (Raspberry Pi).
+    카메라 백엔드(get_camera)로 1회 촬영하여 save_path에 저장 (Raspberry Pi).
     :param save_path: 저장 경로 (예: /home/pi/FFFFF00042-20250216120000-0.jpg)
-    :param timeout_ms: 촬영 대기 ms (기본 LIBCAMERA_STILL_TIMEOUT_MS)
-    :param autofocus_on_capture: --autofocus-on-capture 사용 여부
+    :param timeout_ms: 촬영 대기 ms (libcamera 백엔드, 기본 LIBCAMERA_STILL_TIMEOUT_MS)
+    :param autofocus_on_capture: --autofocus-on-capture 사용 여부 (libcamera 백엔드. picamera2 는 연속 AF 유지)
     :return: bool - 성공 여부
     """
-    timeout_ms = timeout_ms or LIBCAMERA_STILL_TIMEOUT_MS
-    os.makedirs(os.path.dirname(save_path) or ".", exist_ok=True)
-    af = " --autofocus-on-capture" if autofocus_on_capture else ""
-    cmd = f"libcamera-still -t {timeout_ms}{af} -o {save_path}"
-    if os.system(cmd) == 0:
-        return os.path.isfile(save_path)
-    return False
+    return capture_to_file_result(save_path, timeout_ms, autofocus_on_capture)["ok"]
+
+
+def capture_to_file_result(save_path, timeout_ms=None, autofocus_on_capture=True):
+    """
+    capture_to_file 과 같으나 구조화 결과 반환 (CAMERA_CAPTURE_TIMEOUT_SEC 초과 시 실패, 세션은 계속).
+    :return: dict - ok, returncode, duration_sec, timed_out, stderr_tail, error (camera_backend.capture_result)
+    """
+    try:
+        return get_camera().capture(save_path, timeout_ms=timeout_ms, autofocus=autofocus_on_capture)
+    except Exception as e:
+        return capture_result(False, 0.0, error=str(e))
+
+
+def slot_image_path(data_file_name, image_time_str, slot_index, cwd=None):
+    """레거시 4시점 촬영 파일 경로: {cwd}/{data_file_name}-{image_time}-{slot}.jpg (cwd 기본 CAPTURE_STAGING_DIR)"""
+    base = cwd or CAPTURE_STAGING_DIR
+    return os.path.join(base, f"{data_file_name}-{image_time_str}-{slot_index}.jpg")
 
 
 def capture_at_slot(data_file_name, image_time_str, slot_index, cwd=None):
@@ -77,27 +117,442 @@ def capture_at_slot(data_file_name, image_time_str, slot_index, cwd=None):
     :param data_file_name: gas_id + test_id (예: FFFFF00042)
     :param image_time_str: 해당 슬롯의 촬영 시각 문자열 (YYYYmmddHHMMSS)
     :param slot_index: 0(NoFeces), 1,2,3(Feces)
-    :param cwd: 촬영 시 작업 디렉터리 (기본 GPIO_CONTROLLER_DIR 또는 /tmp)
+    :param cwd: 촬영 시 작업 디렉터리 (기본 CAPTURE_STAGING_DIR)
     :return: (success: bool, path: str)
     """
-    base = cwd or config.GPIO_CONTROLLER_DIR
-    save_path = os.path.join(base, f"{data_file_name}-{image_time_str}-{slot_index}.jpg")
+    save_path = slot_image_path(data_file_name, image_time_str, slot_index, cwd)
     ok = capture_to_file(save_path)
     return ok, save_path
 
 
+def sharpness_score(path, max_side=None):
+    """
+    선명도 점수: 그레이스케일 4-이웃 Laplacian 의 분산 (NumPy 벡터 연산). 흔들림/초점 이탈 시 작아짐.
+    - JPEG draft 로 긴 변 max_side 근처까지 축소 디코딩 → 같은 burst 의 프레임끼리만 비교 (절대값 의미 없음).
+    :return: float 또는 None (Pillow/NumPy 없음)
+    """
+    try:
+        import numpy as np      # 지연 import: burst 촬영 시에만 로드
+        from PIL import Image
+    except ImportError:
+        return None
+    max_side = SHARPNESS_MAX_SIDE if max_side is None else max_side
+    with Image.open(path) as im:
+        if max_side:
+            im.draft("L", (max_side, max_side))
+        im = im.convert("L")
+        if max_side and max(im.size) > max_side:
+            im.thumbnail((max_side, max_side), Image.BILINEAR)
+        g = np.asarray(im, dtype=np.float32)
+    if g.shape[0] < 3 or g.shape[1] < 3:
+        return 0.0
+    lap = g[1:-1, :-2] + g[1:-1, 2:] + g[:-2, 1:-1] + g[2:, 1:-1] - 4.0 * g[1:-1, 1:-1]
+    return float(lap.var())
+
+
+def capture_burst(save_path, frames=None):
+    """
+    연속 frames 장 촬영 → sharpness_score 최고 프레임을 save_path 로 남기고 나머지 삭제.
+    - 촬영을 먼저 모두 끝낸 뒤 채점 (프레임 간 시간 간격 최소화).
+    - 채점 불가(Pillow/NumPy 없음) 시 첫 성공 프레임 사용.
+    :return: capture_to_file_result dict + sharpness(선택 프레임 점수), sharpness_scores(프레임별, 실패 None),
+             best_frame, score_sec
+    """
+    frames = CAPTURE_BURST_FRAMES if frames is None else max(1, frames)
+    root, ext = os.path.splitext(save_path)
+    t0 = time.monotonic()
+    shots = []
+    for i in range(frames):
+        frame_path = f"{root}.b{i}{ext}"
+        shots.append((frame_path, capture_to_file_result(frame_path)))
+    captured_sec = time.monotonic() - t0
+    scores = []
+    for frame_path, shot in shots:
+        score = None
+        if shot["ok"]:
+            try:
+                score = sharpness_score(frame_path)
+            except Exception as e:
+                print(f"[camera_controller] 선명도 채점 실패 {frame_path}: {e}", file=sys.stderr)
+        scores.append(score)
+    score_sec = time.monotonic() - t0 - captured_sec
+    ok_idx = [i for i, (_, shot) in enumerate(shots) if shot["ok"]]
+    scored = [i for i in ok_idx if scores[i] is not None]
+    best = max(scored, key=lambda i: scores[i]) if scored else (ok_idx[0] if ok_idx else None)
+    for i, (frame_path, _) in enumerate(shots):
+        try:
+            if i == best:
+                os.replace(frame_path, save_path)
+            elif os.path.exists(frame_path):
+                os.remove(frame_path)
+        except OSError as e:
+            print(f"[camera_controller] burst 프레임 정리 실패 {frame_path}: {e}", file=sys.stderr)
+    result = dict(shots[best][1] if best is not None else shots[-1][1])
+    result.update(
+        duration_sec=round(captured_sec, 3),
+        sharpness=round(scores[best], 3) if best is not None and scores[best] is not None else None,
+        sharpness_scores=[round(s, 3) if s is not None else None for s in scores],
+        best_frame=best,
+        score_sec=round(score_sec, 3),
+    )
+    return result
+
+
+def image_signature(path, size=None):
+    """
+    변화 감지용 축소 signature: 그레이스케일 size×size 블록 평균(BOX) ÷ 전체 평균.
+    블록 평균이 센서 노이즈·JPEG 차이를 없애고, 평균 정규화로 노출 변화에 둔감.
+    :return: numpy float32 배열 (size, size) 또는 None (Pillow/NumPy 없음)
+    """
+    try:
+        import numpy as np
+        from PIL import Image
+    except ImportError:
+        return None
+    size = IMAGE_SIGNATURE_SIZE if size is None else size
+    with Image.open(path) as im:
+        im.draft("L", (size * 8, size * 8))
+        small = im.convert("L").resize((size, size), Image.BOX)
+    px = np.asarray(small, dtype=np.float32)
+    return px / max(float(px.mean()), 1.0)
+
+
+def signature_similarity(a, b, tolerance=None):
+    """
+    두 image_signature 의 유사도 = 1 - 바뀐 블록 비율 (|a-b| > tolerance). 하나라도 None 이면 None.
+    물체가 화면의 1% 를 덮으면 약 0.99 이하.
+    """
+    if a is None or b is None or a.shape != b.shape:
+        return None
+    tolerance = IMAGE_SIGNATURE_TOLERANCE if tolerance is None else tolerance
+    return 1.0 - float((abs(a - b) > tolerance).mean())
+
+
+def upload_fields(capture):
+    """CaptureWorker 슬롯 결과 → 업로드 multipart 텍스트 필드 (burst 점수 없으면 빈 dict)."""
+    if not capture or capture.get("sharpness") is None:
+        return {}
+    return {
+        "sharpness": str(capture["sharpness"]),
+        "sharpness_scores": ",".join("" if s is None else str(s) for s in capture["sharpness_scores"]),
+        "best_frame": str(capture["best_frame"]),
+    }
+
+
+def _parse_roi(roi):
+    """ "x0,y0,x1,y1" (0~1 비율) → tuple 또는 None (형식 오류 시 None)."""
+    if not roi:
+        return None
+    try:
+        x0, y0, x1, y1 = (float(v) for v in roi.split(","))
+    except ValueError:
+        print(f"[camera_controller] IMAGE_ROI 형식 오류(무시): {roi}", file=sys.stderr)
+        return None
+    if not (0 <= x0 < x1 <= 1 and 0 <= y0 < y1 <= 1):
+        print(f"[camera_controller] IMAGE_ROI 범위 오류(무시): {roi}", file=sys.stderr)
+        return None
+    return x0, y0, x1, y1
+
+
+def preprocess_image(path, roi=None, max_side=None, quality=None, max_bytes=None):
+    """
+    업로드 전 JPEG 전처리 (파일을 같은 경로에 교체). ROI crop → 긴 변 max_side 로 축소 → quality 재인코딩.
+    - JPEG draft 모드로 디코딩 단계에서 1/2~1/8 축소 → 12MP 전체 디코딩 없이 처리.
+    - max_bytes 지정 시 크기 이하가 될 때까지 품질을 10씩 낮춤 (IMAGE_MIN_QUALITY 까지).
+    - crop/축소 없이 재인코딩만 했는데 커지면 원본 유지.
+    :return: dict - bytes_before, bytes_after, size_before, size_after, quality, preprocess_sec (Pillow 없으면 None)
+    """
+    try:
+        from PIL import Image  # 지연 import: 전처리 사용 시에만 로드
+    except ImportError:
+        return None
+    roi = _parse_roi(IMAGE_ROI) if roi is None else roi
+    max_side = IMAGE_MAX_SIDE if max_side is None else max_side
+    quality = IMAGE_JPEG_QUALITY if quality is None else quality
+    max_bytes = IMAGE_MAX_BYTES if max_bytes is None else max_bytes
+    t0 = time.monotonic()
+    bytes_before = os.path.getsize(path)
+    with Image.open(path) as im:
+        size_before = im.size
+        exif = im.info.get("exif")
+        fx0, fy0, fx1, fy1 = roi or (0.0, 0.0, 1.0, 1.0)
+        roi_w, roi_h = size_before[0] * (fx1 - fx0), size_before[1] * (fy1 - fy0)
+        if max_side and max(roi_w, roi_h) > max_side:
+            scale = max_side / max(roi_w, roi_h)
+            im.draft("RGB", (int(size_before[0] * scale) + 1, int(size_before[1] * scale) + 1))
+        w, h = im.size
+        if roi:
+            im = im.crop((round(fx0 * w), round(fy0 * h), round(fx1 * w), round(fy1 * h)))
+        im = im.convert("RGB")
+        if max_side and max(im.size) > max_side:
+            im.thumbnail((max_side, max_side), Image.LANCZOS)
+        size_after = im.size
+        while True:
+            buf = io.BytesIO()
+            save_kw = {"quality": quality, "optimize": True}
+            if exif:
+                save_kw["exif"] = exif
+            im.save(buf, "JPEG", **save_kw)
+            if not max_bytes or buf.tell() <= max_bytes or quality <= IMAGE_MIN_QUALITY:
+                break
+            quality = max(IMAGE_MIN_QUALITY, quality - 10)
+    if size_after == size_before and buf.tell() >= bytes_before:
+        bytes_after = bytes_before
+    else:
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(buf.getbuffer())
+        os.replace(tmp_path, path)
+        bytes_after = buf.tell()
+    return {
+        "bytes_before": bytes_before,
+        "bytes_after": bytes_after,
+        "size_before": list(size_before),
+        "size_after": list(size_after),
+        "quality": quality,
+        "preprocess_sec": round(time.monotonic() - t0, 3),
+    }
+
+
+class CaptureWorker:
+    """
+    슬롯 촬영 요청을 bounded queue 로 받아 별도 스레드에서 capture_at_slot 실행.
+    - submit(): 샘플링 루프에서 호출. 큐에 넣기만 하고 즉시 반환 (블로킹 없음).
+    - 슬롯별 결과: 요청 시각(requested_at, time.monotonic) 대비 실제 촬영 시작/완료 지연을 기록.
+      촬영은 CAMERA_CAPTURE_TIMEOUT_SEC 상한 → 멈춘 카메라는 해당 슬롯 실패(timed_out)로 기록하고 다음 요청 진행.
+    - close(): 남은 요청 처리 후 스레드 종료, 슬롯 순서대로 결과 리스트 반환.
+    """
+
+    def __init__(self, cwd=None, maxsize=None, uploader=None, reference_signature=None):
+        """
+        :param uploader: UploadWorker — 지정 시 촬영 성공한 슬롯을 바로 업로드 요청
+        :param reference_signature: 슬롯 0 image_signature — 지정 시 슬롯마다 similarity/unchanged 기록,
+                               SLOT_SIMILARITY_ACTION=skip 이면 unchanged 슬롯은 uploader 에 넘기지 않음
+        """
+        self.cwd = cwd
+        self.uploader = uploader
+        self.reference_signature = reference_signature
+        self._queue = queue.Queue(maxsize=maxsize if maxsize is not None else CAPTURE_QUEUE_SIZE)
+        self._results = {}
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="capture-worker", daemon=True)
+        self._thread.start()
+
+    def submit(self, slot, data_file_name, image_time_str, requested_at=None):
+        """
+        촬영 요청 등록 (non-blocking).
+        :return: bool - 큐 등록 여부 (False 면 해당 슬롯은 실패로 기록)
+        """
+        if requested_at is None:
+            requested_at = time.monotonic()
+        try:
+            self._queue.put_nowait((slot, data_file_name, image_time_str, requested_at))
+            return True
+        except queue.Full:
+            print(f"[camera_controller] CaptureWorker 큐 가득 참 → 슬롯 {slot} 촬영 생략", file=sys.stderr)
+            self._record(slot, {
+                "slot": slot, "ok": False, "path": None, "image_time": image_time_str,
+                "error": "capture queue full", "queue_wait_sec": None, "capture_sec": None, "latency_sec": None,
+                "returncode": None, "timed_out": False, "stderr_tail": "",
+                "sharpness": None, "sharpness_scores": None, "best_frame": None,
+                "similarity": None, "unchanged": False,
+                "bytes_before": None, "bytes_after": None, "preprocess": None,
+            })
+            return False
+
+    def _record(self, slot, result):
+        with self._lock:
+            self._results[slot] = result
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            slot, data_file_name, image_time_str, requested_at = item
+            started_at = time.monotonic()
+            path = slot_image_path(data_file_name, image_time_str, slot, cwd=self.cwd)
+            if CAPTURE_BURST_FRAMES > 1:
+                capture = capture_burst(path)
+            else:
+                capture = capture_to_file_result(path)
+            ok, error = capture["ok"], capture["error"]
+            captured_at = time.monotonic()
+            similarity = None
+            if ok and self.reference_signature is not None:
+                # 전처리(ROI crop) 전 원본끼리 비교 (슬롯 0 과 같은 화각)
+                try:
+                    similarity = signature_similarity(self.reference_signature, image_signature(path))
+                except Exception as e:
+                    print(f"[camera_controller] 슬롯 {slot} 유사도 계산 실패: {e}", file=sys.stderr)
+            unchanged = similarity is not None and similarity >= config.SLOT_SIMILARITY_THRESHOLD
+            preprocess = None
+            if ok and IMAGE_PREPROCESS:
+                try:
+                    preprocess = preprocess_image(path)
+                except Exception as e:
+                    print(f"[camera_controller] 슬롯 {slot} 전처리 실패(원본 업로드): {e}", file=sys.stderr)
+            finished_at = time.monotonic()
+            result = {
+                "slot": slot,
+                "ok": ok,
+                "path": path,
+                "image_time": image_time_str,
+                "error": error,
+                "queue_wait_sec": round(started_at - requested_at, 3),
+                "capture_sec": round(captured_at - started_at, 3),
+                "latency_sec": round(finished_at - requested_at, 3),
+                "returncode": capture["returncode"],
+                "timed_out": capture["timed_out"],
+                "stderr_tail": capture["stderr_tail"],
+                "sharpness": capture.get("sharpness"),
+                "sharpness_scores": capture.get("sharpness_scores"),
+                "best_frame": capture.get("best_frame"),
+                "similarity": round(similarity, 4) if similarity is not None else None,
+                "unchanged": unchanged,
+                "bytes_before": preprocess["bytes_before"] if preprocess else None,
+                "bytes_after": preprocess["bytes_after"] if preprocess else None,
+                "preprocess": preprocess,
+            }
+            self._record(slot, result)
+            if preprocess:
+                print(f"[camera_controller] 슬롯 {slot} 전처리 {preprocess['size_before']}→{preprocess['size_after']} "
+                      f"{preprocess['bytes_before']}→{preprocess['bytes_after']} bytes ({preprocess['preprocess_sec']}s)", file=sys.stderr)
+            if result["sharpness_scores"]:
+                print(f"[camera_controller] 슬롯 {slot} burst 선명도 {result['sharpness_scores']} → "
+                      f"프레임 {result['best_frame']} 선택 (채점 {capture['score_sec']}s)", file=sys.stderr)
+            print(f"[camera_controller] 슬롯 {slot} 촬영 {'완료' if ok else '실패'} "
+                  f"(대기 {result['queue_wait_sec']}s, 촬영 {result['capture_sec']}s"
+                  f"{', ' + error if error else ''})", file=sys.stderr)
+            if unchanged:
+                print(f"[camera_controller] 슬롯 {slot} 슬롯 0 과 유사 (similarity={result['similarity']}) "
+                      f"→ {'업로드 생략' if config.SLOT_SIMILARITY_ACTION == 'skip' else 'flag'}", file=sys.stderr)
+            if ok and self.uploader is not None and not (unchanged and config.SLOT_SIMILARITY_ACTION == "skip"):
+                self.uploader.submit(slot, path, os.path.basename(path), fields=upload_fields(result))
+
+    def results(self):
+        """현재까지 완료된 슬롯 결과 (slot 오름차순)."""
+        with self._lock:
+            return [self._results[s] for s in sorted(self._results)]
+
+    def close(self, timeout=None):
+        """
+        대기 중인 요청을 모두 처리한 뒤 스레드 종료.
+        :param timeout: join 대기 상한(초). None 이면 완료까지 대기.
+        :return: results()
+        """
+        self._queue.put(None)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            print(f"[camera_controller] CaptureWorker 종료 대기 시간 초과 ({timeout}s)", file=sys.stderr)
+        return self.results()
+
+
+class _RateLimiter:
+    """
+    전송 대역 제한 (bytes/s). rate_bps 는 전송 도중에도 변경 가능 (0 이면 즉시 무제한).
+    consume(n): 지금까지 보낸 양이 rate_bps 를 넘지 않도록 필요한 만큼 sleep.
+    """
+
+    def __init__(self, rate_bps):
+        self.rate_bps = rate_bps
+        self._t0 = None
+        self._sent = 0
+
+    def reset(self):
+        self._t0 = time.monotonic()
+        self._sent = 0
+
+    def consume(self, n):
+        self._sent += n
+        rate = self.rate_bps
+        if not rate or rate <= 0:
+            return
+        ahead = self._sent / rate - (time.monotonic() - self._t0)
+        if ahead > 0:
+            time.sleep(ahead)
+
+
+class _ThrottledBody:
+    """본문 청크 iterable(MultipartFileBody 등)을 limiter 로 감싸 대역 제한. 재순회 가능 (재시도)."""
+
+    def __init__(self, body, limiter):
+        self._body = body
+        self._limiter = limiter
+
+    def __iter__(self):
+        self._limiter.reset()
+        for chunk in self._body:
+            yield chunk
+            self._limiter.consume(len(chunk))
+
+
+class UploadWorker:
+    """
+    측정 중 파이프라인 업로드: CaptureWorker 가 촬영 완료 파일을 submit → 별도 스레드에서 순차 업로드.
+    - 측정 루프와 겹치는 동안은 UPLOAD_RATE_LIMIT_BPS 로 대역 제한 (샘플링/상태 API 전송 방해 최소화).
+    - close(): 제한 해제 후 남은 업로드 완료 대기, 슬롯 순서대로 (slot, ok, filename, resp) 리스트 반환.
+    """
+
+    def __init__(self, rate_limit_bps=None):
+        self._limiter = _RateLimiter(UPLOAD_RATE_LIMIT_BPS if rate_limit_bps is None else rate_limit_bps)
+        self._queue = queue.Queue()
+        self._results = {}
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="upload-worker", daemon=True)
+        self._thread.start()
+
+    def submit(self, slot, path, filename, fields=None):
+        """업로드 요청 등록 (non-blocking). fields: 추가 multipart 텍스트 필드 (upload_fields)."""
+        self._queue.put((slot, path, filename, fields))
+
+    def unthrottle(self):
+        """대역 제한 해제 (진행 중인 업로드에도 즉시 적용)."""
+        self._limiter.rate_bps = 0
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            slot, path, filename, fields = item
+            started_at = time.monotonic()
+            ok, resp, status = _upload_image_to_server(path, filename, limiter=self._limiter, fields=fields)
+            with self._lock:
+                self._results[slot] = (slot, ok, filename, resp)
+            print(f"[camera_controller] [파이프라인 업로드] 슬롯 {slot} {'성공' if ok else '실패'} status={status} "
+                  f"({time.monotonic() - started_at:.2f}s) filename={filename}", file=sys.stderr)
+
+    def results(self):
+        """현재까지 완료된 업로드 결과 (slot 오름차순)."""
+        with self._lock:
+            return [self._results[s] for s in sorted(self._results)]
+
+    def close(self, timeout=None):
+        """
+        제한 해제 후 남은 업로드를 모두 처리하고 스레드 종료.
+        :return: results()
+        """
+        self.unthrottle()
+        self._queue.put(None)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            print(f"[camera_controller] UploadWorker 종료 대기 시간 초과 ({timeout}s)", file=sys.stderr)
+        return self.results()
+
+
 def upload_captured_slots(data_file_name, image_times, slots_to_upload=None, cwd=None):
     """
     레거시: 4장 중 첫 장(0)은 저장/전송하지 않고, 슬롯 1,2,3만 업로드.
     :param data_file_name: gas_id + test_id (예: FFFFF00042)
     :param image_times: [time0, time1, time2, time3] 문자열 리스트 (최소 슬롯 인덱스+1 길이)
     :param slots_to_upload: 업로드할 슬롯 (기본 (1, 2, 3))
-    :param cwd: 이미지가 저장된 디렉터리 (기본 config.GPIO_CONTROLLER_DIR)
+    :param cwd: 이미지가 저장된 디렉터리 (기본 CAPTURE_STAGING_DIR)
     :return: list of (slot_index, success: bool, filename, response_or_error)
     """
     if slots_to_upload is None:
         slots_to_upload = (1, 2, 3)
-    base = cwd or config.GPIO_CONTROLLER_DIR
+    base = cwd or CAPTURE_STAGING_DIR
     results = []
     for slot in slots_to_upload:
         if slot >= len(image_times):
@@ -170,7 +625,7 @@ def send_pending_images_from_folder(image_file_dir=None, remove_on_success=True)
 def _capture_image_to_file(save_path):
     """
     실제 카메라 1회 촬영하여 save_path에 저장.
-    라즈베리파이에서 libcamera 사용 가능 시 capture_to_file() 호출, 아니면 더미.
+    라즈베리파이에서 카메라 사용 가능 시 capture_to_file() 호출, 아니면 더미.
     :param save_path: 저장할 이미지 파일 경로 (예: /tmp/hem_capture_xxxx.jpg)
     :return: bool - 성공 여부
     """
@@ -291,56 +746,49 @@ def fetch_image_analysis_result(gas_id, test_id, timeout_sec=30):
         return None
     url = f"{base}/{gas_id}/upload/{test_id}"
     try:
-        req = urllib.request.Request(url, method="GET")
-        with urllib.request.urlopen(req, timeout=timeout_sec) as resp:
-            data = json.loads(resp.read().decode())
-            return data if isinstance(data, dict) else None
-    except (urllib.error.HTTPError, urllib.error.URLError, json.JSONDecodeError, OSError):
+        resp = http_client.request("GET", url, timeout=timeout_sec, endpoint="image_result", verify_tls=True)
+        if resp.status >= 400:
+            return None
+        data = resp.json()
+        return data if isinstance(data, dict) else None
+    except (ValueError, OSError, http.client.HTTPException):
         return None
 # 여기까지 시뮬레이션 모드에 해당하는 함수
 
-def _upload_image_to_server(file_path, filename):
+def _upload_image_to_server(file_path, filename, limiter=None, fields=None):
     """
     촬영된 이미지 파일을 config.IMAGE_UPLOAD_URL 로 multipart POST 전송.
     ref/servlet.py: 'file' 키로 파일 수신, filename으로 gas_id/test_id/촬영시각 파싱.
     :param file_path: 로컬 파일 경로
     :param filename: 서버에 보낼 파일명 (gas_id+test_id-YYYYmmddHHMMSS-.jpg, servlet strptime 호환)
+    :param limiter: _RateLimiter — 지정 시 청크 단위로 대역 제한 전송 (UploadWorker)
+    :param fields: 파일과 함께 보낼 텍스트 필드 dict (예: upload_fields 의 선명도 점수)
     :return: (success: bool, response_data or error_message, status_code or None)
     """
     url = config.IMAGE_UPLOAD_URL.rstrip("/")
     if not url:
         return False, "IMAGE_UPLOAD_URL 미설정", None
 
-    boundary = "----WebKitFormBoundary" + os.urandom(16).hex()
-    body_start = (
-        f"--{boundary}\r\n"
-        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
-        "Content-Type: image/jpeg\r\n\r\n"
-    )
-    body_end = f"\r\n--{boundary}--\r\n"
-
     try:
-        with open(file_path, "rb") as f:
-            file_data = f.read()
+        # 파일을 통째로 읽지 않고 청크 스트리밍 (12MP JPEG 수 MB 를 메모리에 복사하지 않음)
+        multipart = http_client.MultipartFileBody(
+            file_path, filename, chunk_size=UPLOAD_CHUNK_SIZE if limiter is not None else None, fields=fields)
     except OSError as e:
         return False, str(e), None
 
-    body = body_start.encode("utf-8") + file_data + body_end.encode("utf-8")
-    req = urllib.request.Request(
-        url,
-        data=body,
-        method="POST",
-        headers={
-            "Content-Type": f"multipart/form-data; boundary={boundary}",
-            "Content-Length": str(len(body)),
-        },
-    )
+    body = _ThrottledBody(multipart, limiter) if limiter is not None else multipart
     try:
-        resp = urllib.request.urlopen(req, timeout=30)
-        status = getattr(resp, "status", 200)
-        return True, json.loads(resp.read().decode()), status
-    except urllib.error.HTTPError as e:
-        return False, str(e), e.code
+        resp = http_client.request(
+            "POST",
+            url,
+            body=body,
+            headers=multipart.headers(),
+            endpoint="image_upload",
+            verify_tls=True,
+        )
+        if resp.status >= 400:
+            return False, f"HTTP Error {resp.status}", resp.status
+        return True, resp.json(), resp.status
     except Exception as e:
         return False, str(e), None
 
@@ -362,7 +810,7 @@ def capture_once(gas_id, test_id, simulation=False):
     print(f"[camera_controller] capture_once 진입 gas_id={gas_id} test_id={test_id} simulation={simulation}", file=sys.stderr)
     ts = datetime.now().strftime("%Y%m%d%H%M%S")
     filename = f"{gas_id}{test_id}-{ts}-.jpg"
-    tmp_dir = os.environ.get("HEM_CAPTURE_DIR", os.path.join(config.GPIO_CONTROLLER_DIR, "tmp"))
+    tmp_dir = CAPTURE_STAGING_DIR
     os.makedirs(tmp_dir, exist_ok=True)
     save_path = os.path.join(tmp_dir, filename)
     result_base = getattr(config, "IMAGE_ANALYSIS_RESULT_BASE", "image-analysis")
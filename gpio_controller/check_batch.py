@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+numpy 배치 함수 ↔ 스칼라 원본 동등성 검사 (하드웨어 불필요, numpy 필요).
+- utils.filter_batch        ↔ utils.filter 를 샘플마다 순서대로 호출 (b = a = 0 시작, measure_sequence 와 동일)
+- gas_controller.smooth_peak_h2s_batch ↔ for i in range(1, end): smooth_peak_h2s(arr, i)
+비교는 float 완전 일치 (==). 하나라도 다르면 exit 1 → 배치 함수·임계값(STABLE_THRE 등) 수정 후 CI/배포 전 검사용.
+입력:
+  1) 난수 trace (--traces 개): 기준선 잡음 / 0.01 경계 근처 계단 / 스파이크·0값 혼합, 길이 0~80, end 는 None·0·범위 밖 포함
+  2) 피크 연쇄 trace: 작은 값 집합에서 뽑아 smooth_peak_h2s 의 순차 의존(앞 위치 대체값으로 다음 판정)이 자주 생기게
+  3) 세션 스택 (2차원·3차원): 행마다 다른 end 배열, block_elems 를 작게 줘서 행 묶음 경계도 검사
+
+사용:
+  python check_batch.py
+  python check_batch.py --traces 20000 --seed 7
+"""
+import sys
+import random
+import argparse
+import logging
+
+import numpy as np
+
+import utils
+import gas_controller
+from utils import filter_batch
+from gas_controller import smooth_peak_h2s, smooth_peak_h2s_batch
+
+# 피크 연쇄용 값 집합 (차이가 0.005² 판정·STABLE_THRE 경계 근처)
+_CHAIN_VALUES = (0.0, 0.003, 0.006, 0.0065, 0.009, -0.003, 0.0035)
+
+
+def scalar_filter(c):
+    """utils.filter 를 순서대로 호출한 출력 x 리스트."""
+    b = a = 0.0
+    out = []
+    for v in c:
+        x, b, a = utils.filter(v, b, a)
+        out.append(x)
+    return out
+
+
+def scalar_smooth(h2s_ppm, end=None):
+    """smooth_peak_h2s 를 i = 1 .. end-1 순서대로 적용한 복사본."""
+    arr = list(h2s_ppm)
+    end = len(arr) - 1 if end is None else end
+    for i in range(1, end):
+        smooth_peak_h2s(arr, i)
+    return arr
+
+
+def generate_voltages(rnd, n):
+    """전압 trace 1개: 잡음 / 0.01 경계 계단 / 임의 값, 일부 0 (filter 의 a == 0 분기)."""
+    kind = rnd.random()
+    base = rnd.choice((0.0, 0.5, 0.55, 1.2))
+    out = []
+    for _ in range(n):
+        if kind < 0.3:
+            v = base + rnd.gauss(0, 0.003)
+        elif kind < 0.6:
+            v = base + rnd.choice((0, 0.01, -0.01, 0.009, 0.02, -0.005, 0.004, 0.0045)) * rnd.randint(-2, 2)
+        else:
+            v = rnd.choice((0.0, base, base + 0.011, base - 0.011, base + 0.0195, rnd.uniform(-1, 3)))
+        if rnd.random() < 0.05:
+            v = 0.0
+        out.append(v)
+    return out
+
+
+def generate_ppm(rnd, voltages):
+    """PPM 규모로 축소한 trace (smooth_peak_h2s 임계값 STABLE_THRE·0.005 근처 차이가 나오게)."""
+    scale = rnd.choice((0.01, 0.002, 0.003))
+    return [v * scale for v in voltages]
+
+
+def random_end(rnd, n):
+    return rnd.choice((None, 0, 1, rnd.randint(0, n + 2), n - 1, n + 5))
+
+
+def check_random(rnd, traces):
+    """1차원 trace. :return: 불일치 설명 리스트"""
+    errors = []
+    for k in range(traces):
+        n = rnd.randint(0, 80)
+        c = generate_voltages(rnd, n)
+        if filter_batch(c).tolist() != scalar_filter(c):
+            errors.append(f"filter random#{k} n={n}")
+        h = generate_ppm(rnd, c)
+        end = random_end(rnd, n)
+        if smooth_peak_h2s_batch(h, end).tolist() != scalar_smooth(h, end):
+            errors.append(f"smooth random#{k} n={n} end={end}")
+    return errors
+
+
+def check_chains(rnd, traces):
+    """피크 연쇄 trace. :return: (불일치 설명 리스트, 1회 판정과 결과가 달라 재판정이 필요했던 trace 수)"""
+    errors = []
+    chained = 0
+    for k in range(traces):
+        h = [rnd.choice(_CHAIN_VALUES) for _ in range(rnd.randint(3, 40))]
+        expected = scalar_smooth(h)
+        x = np.asarray(h)
+        first = np.where(gas_controller._peak_mask(x[:-2], x[1:-1], x[2:]), x[:-2], x[1:-1])
+        chained += expected[1:-1] != first.tolist()
+        if smooth_peak_h2s_batch(h).tolist() != expected:
+            errors.append(f"smooth chain#{k} {h}")
+    return errors, chained
+
+
+def check_stacked(rnd, stacks):
+    """세션 스택 (행마다 다른 end, 작은 block_elems). :return: 불일치 설명 리스트"""
+    errors = []
+    for k in range(stacks):
+        n = rnd.randint(3, 60)
+        shape = rnd.choice(((rnd.randint(1, 40),), (rnd.randint(1, 6), rnd.randint(1, 8))))
+        rows = int(np.prod(shape))
+        volts = [generate_voltages(rnd, n) for _ in range(rows)]
+        ppm = [generate_ppm(rnd, v) for v in volts]
+        ends = [rnd.randint(0, n + 2) for _ in range(rows)]
+        block = rnd.choice((1, n, 3 * n + 1, 32768))
+        fb = filter_batch(np.reshape(volts, shape + (n,)), block_elems=block).reshape(rows, n)
+        sb = smooth_peak_h2s_batch(np.reshape(ppm, shape + (n,)), np.reshape(ends, shape),
+                                   block_elems=block).reshape(rows, n)
+        for r in range(rows):
+            if fb[r].tolist() != scalar_filter(volts[r]):
+                errors.append(f"filter stack#{k} shape={shape} row={r} block_elems={block}")
+            if sb[r].tolist() != scalar_smooth(ppm[r], ends[r]):
+                errors.append(f"smooth stack#{k} shape={shape} row={r} end={ends[r]} block_elems={block}")
+        # 스칼라 end 는 모든 행에 같은 값
+        end = random_end(rnd, n)
+        sb = smooth_peak_h2s_batch(np.reshape(ppm, shape + (n,)), end).reshape(rows, n)
+        if any(sb[r].tolist() != scalar_smooth(ppm[r], end) for r in range(rows)):
+            errors.append(f"smooth stack#{k} shape={shape} end={end} (스칼라)")
+    return errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="filter_batch / smooth_peak_h2s_batch 와 스칼라 원본의 동등성 검사")
+    parser.add_argument("--traces", type=int, default=3000, help="난수·피크 연쇄 trace 개수 (각각)")
+    parser.add_argument("--stacks", type=int, default=300, help="세션 스택 개수")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    # smooth_peak_h2s 의 debug 로그 (피크 제거마다) 는 검사 중 끔
+    logging.disable(logging.DEBUG)
+    rnd = random.Random(args.seed)
+    errors = check_random(rnd, args.traces)
+    chain_errors, chained = check_chains(rnd, args.traces)
+    errors += chain_errors
+    errors += check_stacked(rnd, args.stacks)
+    logging.disable(logging.NOTSET)
+
+    for error in errors[:10]:
+        print(f"[check_batch] 불일치 {error}")
+    print(f"[check_batch] trace {args.traces}개 + 피크 연쇄 {args.traces}개 (재판정 필요 {chained}개) "
+          f"+ 세션 스택 {args.stacks}개, 불일치 {len(errors)}개")
+    if errors:
+        print("[check_batch] 실패", file=sys.stderr)
+        return 1
+    print("[check_batch] OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
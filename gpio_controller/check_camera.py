@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+"""
+CaptureWorker 슬롯 결과·카메라 명령 타임아웃 검사 (FakeCameraBackend / 가짜 명령, 하드웨어 불필요).
+- kill-group: run_camera_command 로 SIGTERM 을 무시하고 손자 프로세스를 fork 하는 명령 실행 → timed_out=True,
+  returncode=-9 (SIGTERM → CAMERA_KILL_GRACE_SEC 후 SIGKILL), 그룹 프로세스 생존 없음, stderr tail 보존,
+  duration_sec ≈ timeout + CAMERA_KILL_GRACE_SEC (POSIX 전용).
+- timeout: 촬영 지연 > CAMERA_CAPTURE_TIMEOUT_SEC → 슬롯마다 ok=False, timed_out=True, capture_sec ≈ 상한,
+  다음 슬롯은 앞 슬롯 상한만큼 queue_wait_sec 누적, latency_sec = queue_wait_sec + capture_sec.
+- normal: 정상 촬영 → ok=True, timed_out=False, 파일 존재, 지연 필드 일관성.
+- queue-full: 큐 크기 1 에서 촬영 중 요청 2개 추가 → 마지막 요청 submit=False, "capture queue full" 실패 기록.
+- burst: 선명도가 다른 프레임 연속 촬영 → 최고 점수 프레임만 남고 나머지 삭제 (Pillow/NumPy 필요, 없으면 생략).
+- preprocess: ROI crop·축소 후 bytes_before/bytes_after 가 실제 파일 크기와 일치, 커지는 재인코딩은 원본 유지 (Pillow 필요).
+검사 중에는 CAMERA_CAPTURE_TIMEOUT_SEC 를 --timeout 으로 줄여 실행 (기본 상한은 수 초).
+
+사용:
+  python check_camera.py
+  python check_camera.py --timeout 1.0
+"""
+import io
+import os
+import sys
+import time
+import signal
+import shutil
+import argparse
+import tempfile
+import contextlib
+
+import camera_backend
+import camera_controller
+from camera_backend import FakeCameraBackend
+from camera_controller import CaptureWorker, preprocess_image
+
+
+# kill-group 검사용 명령: SIGTERM 무시 + 손자 fork (무시 설정은 fork 로 상속) → pid 기록 후 멈춘 카메라처럼 대기
+_STALLED_CAMERA = """
+import os, sys, time, signal
+signal.signal(signal.SIGTERM, signal.SIG_IGN)
+child = os.fork()
+if child == 0:
+    time.sleep(100)
+    os._exit(0)
+with open(sys.argv[1], "w") as f:
+    f.write(f"{os.getpid()} {child}")
+sys.stderr.write("camera stalled\\n")
+sys.stderr.flush()
+time.sleep(100)
+"""
+
+
+class _FrameSequenceCamera(FakeCameraBackend):
+    """촬영할 때마다 frames(JPEG bytes)를 차례로 저장하는 FakeCameraBackend."""
+
+    def __init__(self, frames, delay_sec=0.0):
+        super().__init__(delay_sec=delay_sec)
+        self.frames = list(frames)
+        self._next = 0
+
+    def _frame(self):
+        frame = self.frames[self._next % len(self.frames)]
+        self._next += 1
+        return frame
+
+
+def _noise_jpeg(size, amplitude, seed=0, quality=90):
+    """회색 바탕 + 진폭 amplitude 잡음 JPEG (진폭이 클수록 Laplacian 분산 = 선명도 점수 큼)."""
+    import numpy as np
+    from PIL import Image
+    rnd = np.random.default_rng(seed)
+    px = 128 + rnd.uniform(-amplitude, amplitude, (size[1], size[0], 3))
+    buf = io.BytesIO()
+    Image.fromarray(px.clip(0, 255).astype(np.uint8), "RGB").save(buf, "JPEG", quality=quality)
+    return buf.getvalue()
+
+
+def _run_worker(cwd, requests, maxsize=None, gap_sec=0.0):
+    """
+    CaptureWorker 에 slot 별 촬영 요청을 넣고 (gap_sec 간격) close.
+    :return: (results, submitted) — submitted 는 slot → submit 반환값
+    """
+    worker = CaptureWorker(cwd=cwd, maxsize=maxsize)
+    submitted = {}
+    for slot in requests:
+        submitted[slot] = worker.submit(slot, "FFFFF00001", f"2026010112000{slot}")
+        if gap_sec:
+            time.sleep(gap_sec)
+    return worker.close(), submitted
+
+
+def check_timeout(cwd, timeout, tolerance):
+    camera_backend.set_camera(FakeCameraBackend(delay_sec=timeout * 2))
+    results, _ = _run_worker(cwd, (1, 2, 3))
+    errors = []
+    for k, r in enumerate(results):
+        if r["ok"] or not r["timed_out"] or "timeout" not in (r["error"] or ""):
+            errors.append(f"슬롯 {r['slot']} ok={r['ok']} timed_out={r['timed_out']} error={r['error']}")
+        if not timeout - tolerance <= r["capture_sec"] <= timeout + tolerance:
+            errors.append(f"슬롯 {r['slot']} capture_sec={r['capture_sec']} (상한 {timeout}s)")
+        # 직렬 처리: k 번째 요청은 앞 요청들의 상한만큼 대기
+        if not k * timeout - tolerance <= r["queue_wait_sec"] <= k * (timeout + tolerance):
+            errors.append(f"슬롯 {r['slot']} queue_wait_sec={r['queue_wait_sec']} (예상 {k * timeout:g}s)")
+        if abs(r["latency_sec"] - r["queue_wait_sec"] - r["capture_sec"]) > tolerance:
+            errors.append(f"슬롯 {r['slot']} latency_sec={r['latency_sec']} ≠ 대기+촬영")
+        if os.path.exists(r["path"]):
+            errors.append(f"슬롯 {r['slot']} timeout 인데 파일 존재")
+    if [r["slot"] for r in results] != [1, 2, 3]:
+        errors.append(f"슬롯 결과 {[r['slot'] for r in results]}")
+    return errors
+
+
+def _alive(pid):
+    """pid 가 살아 있는지 (좀비는 종료로 간주: 손자는 init 이 늦게 회수할 수 있음)."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+    except OSError:
+        pass
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+
+
+def check_kill_group(cwd, timeout, grace, tolerance):
+    pid_file = os.path.join(cwd, "pids")
+    saved = camera_backend.CAMERA_KILL_GRACE_SEC
+    camera_backend.CAMERA_KILL_GRACE_SEC = grace
+    try:
+        r = camera_backend.run_camera_command([sys.executable, "-c", _STALLED_CAMERA, pid_file], timeout_sec=timeout)
+    finally:
+        camera_backend.CAMERA_KILL_GRACE_SEC = saved
+    errors = []
+    if r["ok"] or not r["timed_out"] or r["returncode"] != -signal.SIGKILL:
+        errors.append(f"ok={r['ok']} timed_out={r['timed_out']} returncode={r['returncode']} (예상 -9)")
+    if not timeout + grace - 0.05 <= r["duration_sec"] <= timeout + grace + tolerance:
+        errors.append(f"duration_sec={r['duration_sec']} (예상 {timeout + grace:g}s)")
+    if "camera stalled" not in r["stderr_tail"]:
+        errors.append(f"stderr_tail={r['stderr_tail']!r}")
+    try:
+        with open(pid_file) as f:
+            pids = [int(p) for p in f.read().split()]
+    except (OSError, ValueError) as e:
+        return errors + [f"pid 기록 없음 (timeout 전에 명령 미기동?): {e}"]
+    deadline = time.monotonic() + 1.0
+    while any(_alive(p) for p in pids) and time.monotonic() < deadline:
+        time.sleep(0.02)
+    survivors = [p for p in pids if _alive(p)]
+    if survivors:
+        errors.append(f"그룹 프로세스 생존 {survivors}")
+        for p in survivors:
+            try:
+                os.kill(p, signal.SIGKILL)
+            except OSError:
+                pass
+    return errors
+
+
+def check_normal(cwd, delay, tolerance):
+    camera_backend.set_camera(FakeCameraBackend(delay_sec=delay))
+    results, _ = _run_worker(cwd, (1, 2, 3))
+    errors = []
+    for r in results:
+        if not r["ok"] or r["timed_out"] or r["error"] or not os.path.isfile(r["path"]):
+            errors.append(f"슬롯 {r['slot']} ok={r['ok']} timed_out={r['timed_out']} error={r['error']}")
+        if not delay <= r["capture_sec"] <= delay + tolerance:
+            errors.append(f"슬롯 {r['slot']} capture_sec={r['capture_sec']} (지연 {delay}s)")
+        if r["latency_sec"] < r["queue_wait_sec"] + r["capture_sec"] - 0.002:
+            errors.append(f"슬롯 {r['slot']} latency_sec={r['latency_sec']} < 대기+촬영")
+    return errors
+
+
+def check_queue_full(cwd, delay):
+    camera_backend.set_camera(FakeCameraBackend(delay_sec=delay))
+    # 슬롯 1 촬영 중(delay) 슬롯 2 는 큐(크기 1)에, 슬롯 3 은 큐 가득 참
+    results, submitted = _run_worker(cwd, (1, 2, 3), maxsize=1, gap_sec=delay / 5)
+    by_slot = {r["slot"]: r for r in results}
+    errors = []
+    if submitted != {1: True, 2: True, 3: False}:
+        errors.append(f"submit 반환값 {submitted}")
+    if not (by_slot.get(1, {}).get("ok") and by_slot.get(2, {}).get("ok")):
+        errors.append("슬롯 1, 2 촬영 실패")
+    full = by_slot.get(3) or {}
+    if full.get("ok") or full.get("error") != "capture queue full" or full.get("latency_sec") is not None:
+        errors.append(f"슬롯 3 결과 {full}")
+    return errors
+
+
+def check_burst(cwd, amplitudes):
+    frames = [_noise_jpeg((320, 240), a, seed=i) for i, a in enumerate(amplitudes)]
+    camera_backend.set_camera(_FrameSequenceCamera(frames))
+    saved = camera_controller.CAPTURE_BURST_FRAMES
+    camera_controller.CAPTURE_BURST_FRAMES = len(frames)
+    try:
+        results, _ = _run_worker(cwd, (1,))
+    finally:
+        camera_controller.CAPTURE_BURST_FRAMES = saved
+    r = results[0]
+    expected = max(range(len(amplitudes)), key=lambda i: amplitudes[i])
+    errors = []
+    scores = r["sharpness_scores"] or []
+    if not r["ok"] or r["best_frame"] != expected or len(scores) != len(frames):
+        errors.append(f"ok={r['ok']} best_frame={r['best_frame']} (예상 {expected}) scores={scores}")
+    elif r["sharpness"] != max(scores):
+        errors.append(f"sharpness={r['sharpness']} ≠ max(scores)")
+    with open(r["path"], "rb") as f:
+        if f.read() != frames[expected]:
+            errors.append("남은 파일이 최고 점수 프레임이 아님")
+    leftovers = [name for name in os.listdir(cwd) if ".b" in name]
+    if leftovers:
+        errors.append(f"burst 프레임 미삭제 {leftovers}")
+    return errors
+
+
+def check_preprocess(cwd):
+    errors = []
+    # 1) CaptureWorker 경로: IMAGE_PREPROCESS 켜고 큰 프레임 촬영 → 결과의 bytes 필드가 실제 파일 크기와 일치
+    frame = _noise_jpeg((2000, 1500), 20)
+    camera_backend.set_camera(_FrameSequenceCamera([frame]))
+    saved = camera_controller.IMAGE_PREPROCESS, camera_controller.IMAGE_ROI, camera_controller.IMAGE_MAX_SIDE
+    camera_controller.IMAGE_PREPROCESS, camera_controller.IMAGE_ROI, camera_controller.IMAGE_MAX_SIDE = True, "0.25,0.25,0.75,0.75", 400
+    try:
+        results, _ = _run_worker(cwd, (1,))
+    finally:
+        camera_controller.IMAGE_PREPROCESS, camera_controller.IMAGE_ROI, camera_controller.IMAGE_MAX_SIDE = saved
+    r = results[0]
+    pre = r["preprocess"] or {}
+    if r["bytes_before"] != len(frame) or r["bytes_after"] != os.path.getsize(r["path"]):
+        errors.append(f"worker bytes_before={r['bytes_before']}/{len(frame)} bytes_after={r['bytes_after']}/"
+                      f"{os.path.getsize(r['path'])}")
+    if pre.get("size_before") != [2000, 1500] or max(pre.get("size_after") or [0]) != 400:
+        errors.append(f"worker size {pre.get('size_before')} → {pre.get('size_after')} (예상 긴 변 400, ROI 1000x750)")
+    elif abs(pre["size_after"][0] / pre["size_after"][1] - 4 / 3) > 0.02:
+        errors.append(f"worker ROI 비율 {pre['size_after']}")
+
+    # 2) crop/축소 없이 재인코딩만 해서 커지면 원본 유지 (bytes_after == bytes_before, 파일 그대로)
+    path = os.path.join(cwd, "small.jpg")
+    small = _noise_jpeg((200, 150), 60, quality=30)
+    with open(path, "wb") as f:
+        f.write(small)
+    info = preprocess_image(path, roi=(0.0, 0.0, 1.0, 1.0), max_side=400, quality=95, max_bytes=0)
+    with open(path, "rb") as f:
+        kept = f.read() == small
+    if info["bytes_before"] != len(small) or info["bytes_after"] != len(small) or not kept:
+        errors.append(f"재인코딩 원본 유지 실패 bytes {info['bytes_before']}→{info['bytes_after']} 원본 유지={kept}")
+
+    # 3) max_bytes: 상한 이하가 될 때까지 품질 하향, bytes_after 는 실제 파일 크기
+    path = os.path.join(cwd, "capped.jpg")
+    with open(path, "wb") as f:
+        f.write(frame)
+    limit = len(frame) // 8
+    info = preprocess_image(path, roi=(0.0, 0.0, 1.0, 1.0), max_side=800, quality=95, max_bytes=limit)
+    if info["bytes_after"] != os.path.getsize(path):
+        errors.append(f"max_bytes bytes_after={info['bytes_after']} ≠ 파일 {os.path.getsize(path)}")
+    if info["bytes_after"] > limit and info["quality"] > camera_controller.IMAGE_MIN_QUALITY:
+        errors.append(f"max_bytes {limit} 초과 bytes_after={info['bytes_after']} quality={info['quality']}")
+    return errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="CaptureWorker 슬롯 결과(timeout·지연·큐·burst·전처리) 검사 (FakeCameraBackend)")
+    parser.add_argument("--timeout", type=float, default=0.3, help="검사용 CAMERA_CAPTURE_TIMEOUT_SEC")
+    parser.add_argument("--kill-timeout", type=float, default=0.5,
+                        help="kill-group 검사 명령 상한(초, 명령 기동 시간보다 길게)")
+    parser.add_argument("--kill-grace", type=float, default=0.3, help="kill-group 검사용 CAMERA_KILL_GRACE_SEC")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="시간 필드 허용 오차(초, 스케줄링 지연)")
+    args = parser.parse_args(argv)
+
+    try:
+        import numpy  # noqa: F401
+        from PIL import Image  # noqa: F401
+        imaging = True
+    except ImportError:
+        imaging = False
+
+    checks = [
+        ("timeout", lambda cwd: check_timeout(cwd, args.timeout, args.tolerance)),
+        ("normal", lambda cwd: check_normal(cwd, args.timeout / 3, args.tolerance)),
+        ("queue-full", lambda cwd: check_queue_full(cwd, args.timeout / 2)),
+    ]
+    if hasattr(os, "killpg"):
+        checks.insert(0, ("kill-group", lambda cwd: check_kill_group(cwd, args.kill_timeout, args.kill_grace,
+                                                                      args.tolerance)))
+    else:
+        print("[check_camera] POSIX 아님 → kill-group 검사 생략")
+    if imaging:
+        checks.append(("burst", lambda cwd: check_burst(cwd, (8.0, 40.0, 2.0, 20.0))))
+        checks.append(("preprocess", check_preprocess))
+    else:
+        print("[check_camera] Pillow/NumPy 없음 → burst, preprocess 검사 생략")
+
+    saved_timeout = camera_backend.CAMERA_CAPTURE_TIMEOUT_SEC
+    camera_backend.CAMERA_CAPTURE_TIMEOUT_SEC = args.timeout
+    previous = camera_backend.set_camera(None)
+    failures = 0
+    try:
+        for name, check in checks:
+            cwd = tempfile.mkdtemp(prefix="check_camera_")
+            try:
+                # CaptureWorker 슬롯별 stderr 로그는 숨김
+                with contextlib.redirect_stderr(io.StringIO()):
+                    errors = check(cwd)
+            except Exception as e:
+                errors = [f"예외 {type(e).__name__}: {e}"]
+            finally:
+                shutil.rmtree(cwd, ignore_errors=True)
+            failures += bool(errors)
+            print(f"[check_camera] {name}: {'OK' if not errors else '실패'}")
+            for error in errors:
+                print(f"[check_camera]   {error}")
+    finally:
+        camera_backend.CAMERA_CAPTURE_TIMEOUT_SEC = saved_timeout
+        camera_backend.set_camera(previous)
+
+    if failures:
+        print("[check_camera] 실패", file=sys.stderr)
+        return 1
+    print("[check_camera] OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
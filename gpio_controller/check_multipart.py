@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+MultipartFileBody 스트리밍 메모리 검사 (하드웨어·외부 서버 불필요).
+- --size-mib 크기 임시 파일을 만들어 tracemalloc 으로 최대 할당량(peak)을 측정. peak 가 chunk_size + --slack-kib 를 넘으면 exit 1
+  → 업로드 경로가 파일 전체(또는 청크 복사본 여러 개)를 메모리에 올리게 바뀌면 CI/배포 전 검출.
+  1) 본문 순회만 (MultipartFileBody.__iter__)
+  2) http_client.request 로 로컬 수신 서버(별도 프로세스, 측정 대상 아님)에 실제 전송
+- 두 경우 모두 보낸 바이트 수가 content_length 와 같고, 내용(SHA-256)이 헤더 + 파일 + trailer 와 일치하는지도 확인.
+
+사용:
+  python check_multipart.py                       # 8MiB, HTTP_UPLOAD_CHUNK_SIZE
+  python check_multipart.py --size-mib 32 --chunk-kib 16
+"""
+import os
+import sys
+import json
+import socket
+import hashlib
+import argparse
+import tempfile
+import tracemalloc
+import multiprocessing
+
+import http_client
+
+
+def _serve_sink(listener, chunk_size):
+    """수신 서버 (자식 프로세스): 요청 본문을 청크 단위로 읽어 SHA-256 만 계산, {"bytes", "sha256"} JSON 응답."""
+    while True:
+        conn, _ = listener.accept()
+        with conn, conn.makefile("rb") as rfile:
+            while True:
+                line = rfile.readline()
+                if not line:
+                    break
+                length = 0
+                while line not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    if name.strip().lower() == "content-length":
+                        length = int(value.strip())
+                    line = rfile.readline()
+                digest = hashlib.sha256()
+                received = 0
+                while received < length:
+                    data = rfile.read(min(chunk_size, length - received))
+                    if not data:
+                        break
+                    digest.update(data)
+                    received += len(data)
+                body = json.dumps({"bytes": received, "sha256": digest.hexdigest()}).encode("utf-8")
+                conn.sendall(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                             b"Content-Length: " + str(len(body)).encode("ascii") + b"\r\n\r\n" + body)
+
+
+def _expected_digest(body):
+    """헤더 + 파일 원본 + trailer 의 SHA-256 (MultipartFileBody 순회와 독립적으로 계산)."""
+    digest = hashlib.sha256(body._head)
+    with open(body.path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    digest.update(body._tail)
+    return digest.hexdigest()
+
+
+def _traced_peak(fn):
+    """fn() 실행 중 tracemalloc peak(bytes). :return: (fn 반환값, peak)"""
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        result = fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, peak - base
+
+
+def check_iter(body):
+    """본문 순회만. :return: (bytes, sha256, peak)"""
+    def _consume():
+        digest = hashlib.sha256()
+        n = 0
+        for chunk in body:
+            digest.update(chunk)
+            n += len(chunk)
+        return n, digest.hexdigest()
+
+    (n, sha), peak = _traced_peak(_consume)
+    return n, sha, peak
+
+
+def check_request(body, url):
+    """로컬 수신 서버로 실제 전송. :return: (bytes, sha256, peak)"""
+    headers = body.headers()
+    # 첫 요청의 1회성 import (encodings.idna 등, 약 200KiB) 는 측정에서 제외: 작은 요청 1회 후 연결은 닫고 새 연결로 측정
+    http_client.request("POST", url, body=b"warm-up", headers={"Content-Length": "7"})
+    http_client.close_all()
+
+    def _send():
+        return http_client.request("POST", url, body=body, headers=headers, endpoint="image_upload")
+
+    resp, peak = _traced_peak(_send)
+    http_client.close_all()
+    if resp.status != 200:
+        raise OSError(f"수신 서버 응답 status={resp.status}")
+    data = json.loads(resp.body)
+    return data["bytes"], data["sha256"], peak
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="MultipartFileBody 스트리밍 업로드 메모리(tracemalloc peak) 검사")
+    parser.add_argument("--size-mib", type=float, default=8.0, help="임시 업로드 파일 크기 (MiB)")
+    parser.add_argument("--chunk-kib", type=int, help="chunk_size (KiB). 기본 HTTP_UPLOAD_CHUNK_SIZE")
+    parser.add_argument("--slack-kib", type=int, default=64,
+                        help="chunk_size 외 허용 할당량 (KiB, 헤더/소켓/응답 객체 등)")
+    parser.add_argument("--no-http", action="store_true", help="로컬 서버 전송 검사 생략 (순회만)")
+    args = parser.parse_args(argv)
+
+    chunk_size = args.chunk_kib * 1024 if args.chunk_kib else http_client.HTTP_UPLOAD_CHUNK_SIZE
+    limit = chunk_size + args.slack_kib * 1024
+    size = int(args.size_mib * 1024 * 1024)
+
+    listener = server = None
+    fd, path = tempfile.mkstemp(prefix="check_multipart_", suffix=".jpg")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            block = os.urandom(1024 * 1024)
+            for offset in range(0, size, len(block)):
+                f.write(block[:size - offset])
+        body = http_client.MultipartFileBody(path, fields={"sharpness": "123.4"}, chunk_size=chunk_size)
+        expected = _expected_digest(body)
+
+        checks = [("iter", lambda: check_iter(body))]
+        if not args.no_http:
+            listener = socket.create_server(("127.0.0.1", 0))
+            server = multiprocessing.Process(target=_serve_sink, args=(listener, chunk_size), daemon=True)
+            server.start()
+            url = f"http://127.0.0.1:{listener.getsockname()[1]}/upload"
+            checks.append(("request", lambda: check_request(body, url)))
+
+        failures = 0
+        for name, check in checks:
+            n, sha, peak = check()
+            ok = n == body.content_length and sha == expected and peak <= limit
+            failures += not ok
+            print(f"[check_multipart] {name}: file={size / 1024 / 1024:.1f}MiB chunk={chunk_size // 1024}KiB "
+                  f"bytes={n}/{body.content_length} sha256={'일치' if sha == expected else '불일치'} "
+                  f"peak={peak / 1024:.1f}KiB (상한 {limit / 1024:.0f}KiB){'' if ok else ' ← 실패'}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.join(1.0)
+        if listener is not None:
+            listener.close()
+        os.remove(path)
+
+    if failures:
+        print("[check_multipart] 실패", file=sys.stderr)
+        return 1
+    print("[check_multipart] OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
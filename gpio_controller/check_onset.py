@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+FecesOnsetDetector ↔ update_feces_st 동등성 검사 (하드웨어 불필요).
+- measure_sequence 호출 패턴 그대로 (idx>1, feces_st==0 동안 smooth_peak_h2s → 판정) 두 구현을 각각 돌려
+  매 샘플 feces_st 를 비교. 하나라도 다르면 exit 1 → 임계값/판정 로직 수정 후 CI/배포 전 검사용.
+- 입력: 난수 생성 trace (--traces 개, 기준선 잡음·계단·스파이크·드리프트 혼합) + 녹화 trace 파일 (.hemtrace/CSV/JSON, replay.load_trace).
+
+사용:
+  python check_onset.py                       # 생성 trace 3000개
+  python check_onset.py --traces 500 tmp/traces/*.hemtrace
+"""
+import io
+import sys
+import random
+import argparse
+import contextlib
+
+import gas_controller
+from gas_controller import FecesOnsetDetector, smooth_peak_h2s, update_feces_st
+
+
+def generate_trace(rnd, n=None):
+    """H2S PPM 시계열 1개 (기준선 잡음 + 임의 시점 계단/스파이크/드리프트)."""
+    n = n or rnd.randint(5, 260)
+    base = rnd.uniform(-0.05, 0.3)
+    noise = rnd.choice((0.0005, 0.002, 0.004, 0.008))
+    onset = rnd.randint(0, n)
+    step = rnd.choice((0.0, 0.005, 0.01, 0.03, 0.1))
+    drift = rnd.choice((0.0, 0.0002, -0.0002))
+    trace = []
+    for i in range(n):
+        v = base + drift * i + rnd.gauss(0, noise)
+        if i >= onset:
+            v += step * min(1.0, (i - onset + 1) / rnd.choice((1, 3, 10)))
+        if rnd.random() < 0.03:
+            v += rnd.choice((-1, 1)) * rnd.uniform(0.005, 0.05)
+        trace.append(v)
+    return trace
+
+
+def voltages_to_h2s_ppm(voltages):
+    """녹화 전압 → H2S PPM (GasPipeline.step 과 같은 필터·변환, smooth/판정 제외)."""
+    b = a = 0.0
+    out = []
+    for h2s_v, _ in voltages:
+        if gas_controller.legacy_filter is not None:
+            filtered, b, a = gas_controller.legacy_filter(h2s_v, b, a)
+        else:
+            filtered, b, _ = gas_controller.filter_voltage(h2s_v, b)
+        out.append(gas_controller.voltage_to_ppm_h2s(filtered))
+    return out
+
+
+def compare(trace, bm=None):
+    """
+    :return: (mismatch, feces_st) — mismatch 는 None(일치) 또는 첫 불일치 (idx, update_feces_st 값, FecesOnsetDetector 값)
+    """
+    ref = list(trace)
+    new = list(trace)
+    # 레거시 measure_sequence 초기값 (noise_1_list = [0], noise_5_list = [0.0] * 4)
+    noise_1, noise_5 = [0], [0.0] * 4
+    feces_ref = 0
+    detector = FecesOnsetDetector(bm)
+    for idx in range(len(trace)):
+        if idx <= 1:
+            continue
+        if feces_ref == 0:
+            smooth_peak_h2s(ref, idx - 1)
+            feces_ref, noise_1, noise_5 = update_feces_st(idx, ref, noise_1, noise_5, feces_ref, bm)
+        if detector.feces_st == 0:
+            smooth_peak_h2s(new, idx - 1)
+            detector.update(idx, new)
+        if feces_ref != detector.feces_st:
+            return (idx, feces_ref, detector.feces_st), feces_ref
+    return None, feces_ref
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="FecesOnsetDetector 와 update_feces_st 의 feces_st 동등성 검사")
+    parser.add_argument("files", nargs="*", help="녹화 trace (.hemtrace/CSV/JSON)")
+    parser.add_argument("--traces", type=int, default=3000, help="생성 trace 개수")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    cases = []
+    rnd = random.Random(args.seed)
+    for k in range(args.traces):
+        cases.append((f"generated#{k}", generate_trace(rnd)))
+    if args.files:
+        from replay import load_trace
+        for path in args.files:
+            voltages, _, _ = load_trace(path)
+            cases.append((path, voltages_to_h2s_ppm(voltages)))
+
+    failures = 0
+    detected = 0
+    # 두 구현 모두 10샘플마다 stderr 진행 로그 → 검사 중에는 숨김
+    with contextlib.redirect_stderr(io.StringIO()):
+        for name, trace in cases:
+            mismatch, feces_st = compare(trace)
+            detected += feces_st != 0
+            if mismatch is None:
+                continue
+            failures += 1
+            if failures <= 10:
+                print(f"[check_onset] 불일치 {name}: idx={mismatch[0]} update_feces_st={mismatch[1]} "
+                      f"FecesOnsetDetector={mismatch[2]}", file=sys.__stdout__)
+    print(f"[check_onset] trace {len(cases)}개 (feces_st 감지 {detected}개), 불일치 {failures}개")
+    if failures:
+        print("[check_onset] 실패", file=sys.stderr)
+        return 1
+    print("[check_onset] OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -27,6 +27,9 @@ DATA_API_DEVICE_STATUS_PATH = os.environ.get(
     "/mqtt/api/v1/device/status",
 ).strip() or "/mqtt/api/v1/device/status"
 
+# 1 이면 디바이스 상태 POST/PATCH 본문에 카메라 상태 "camera" 필드 포함 (camera_backend.probe_camera 캐시 결과)
+DEVICE_STATUS_CAMERA = os.environ.get("DEVICE_STATUS_CAMERA", "1").lower() in ("1", "true", "yes")
+
 # 이미지 분석 결과 전송 API 경로 (image_analysis_table 스키마 포맷)
 DATA_API_IMAGE_ANALYSIS_PATH = os.environ.get(
     "DATA_API_IMAGE_ANALYSIS_PATH",
@@ -38,6 +41,18 @@ DATA_API_IMAGE_ANALYSIS_PATH = os.environ.get(
 # - 환경변수 IMAGE_UPLOAD_URL 으로 오버라이드 가능
 IMAGE_UPLOAD_URL = os.environ.get("IMAGE_UPLOAD_URL", "http://13.209.29.94:5000")
 
+# 측정 종료 후 슬롯 1~3 이미지 동시 업로드 수 (1 이면 기존처럼 순차 업로드)
+UPLOAD_CONCURRENCY = max(1, int(os.environ.get("UPLOAD_CONCURRENCY", "3")))
+
+# 1 이면 슬롯 1~3 을 촬영 직후 측정 중에 업로드 (camera_controller.UploadWorker). 측정 종료 후에는 남은 슬롯만 업로드.
+PIPELINE_UPLOAD = os.environ.get("PIPELINE_UPLOAD", "").lower() in ("1", "true", "yes")
+
+# 슬롯 1~3 을 슬롯 0(NoFeces)과 비교 (camera_controller.image_signature). 오탐 feces_st 로 변화 없는 변기를 찍은 경우 검출.
+# off: 비교 안 함 / flag: payload(slot_similarity)에 기록만 / skip: 변화 없는 슬롯은 업로드 생략
+SLOT_SIMILARITY_ACTION = os.environ.get("SLOT_SIMILARITY_ACTION", "flag").strip().lower()
+# 유사도(0~1, 1 - 바뀐 블록 비율)가 이 값 이상이면 변화 없음(unchanged). 0.99 = 화면의 1% 미만 변화
+SLOT_SIMILARITY_THRESHOLD = float(os.environ.get("SLOT_SIMILARITY_THRESHOLD", "0.99"))
+
 # 이미지 분석 결과 확인 경로 suffix (서버에서 분석 후 결과 조회 시)
 # 형식: {IMAGE_ANALYSIS_RESULT_BASE}/{gas_id}/upload/{test_id}
 IMAGE_ANALYSIS_RESULT_BASE = os.environ.get(
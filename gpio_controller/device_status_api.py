@@ -2,16 +2,18 @@
 """
 디바이스 상태 API 호출 (gpio 작업 시 ready → detecting → measuring → completed 갱신).
 - DATA_API_URL 기준으로 GET(생성 여부 조회), POST(최초 생성), PATCH(상태 갱신) 호출.
+- StopWatcher: 측정 루프와 별도 스레드에서 stop 폴링 (루프는 메모리 플래그만 확인).
+- DeviceStatusClient: 상태 전환을 sender 스레드로 비동기 전송 (중복 생략·최신 상태 병합·backoff 재시도).
+- set_status_extra(): POST/PATCH 본문에 덧붙일 필드 등록 (예: main 이 카메라 상태 "camera" 등록).
 """
 import os
 import sys
 import json
-import urllib.request
-import urllib.error
+import threading
 import urllib.parse
-import ssl
 
 import config
+import http_client
 
 # 상태 순서: ready → detecting → measuring → completed (캡처 시점에 fail 사용)
 # stop: 외부에서 측정 중단 지시 시 사용 (gpio_controller가 GET으로 확인 후 루프 탈출)
@@ -22,24 +24,43 @@ STATUS_COMPLETED = "completed"
 STATUS_FAIL = "fail"
 STATUS_STOP = "stop"
 
+# StopWatcher 폴링 주기(초). 측정 루프 주기(1초)와 무관하게 동작.
+STOP_POLL_INTERVAL_SEC = float(os.environ.get("STOP_POLL_INTERVAL_SEC", "1.0"))
 
-def _request(method, url, body=None, timeout=10):
-    headers = {"Content-Type": "application/json"}
-    req = urllib.request.Request(url, data=body, method=method, headers=headers)
-    ctx = ssl.create_default_context()
-    if url.startswith("https://"):
-        ctx.check_hostname = False
-        ctx.verify_mode = ssl.CERT_NONE
-    try:
-        with urllib.request.urlopen(req, timeout=timeout, context=ctx) as resp:
-            return resp.status, json.loads(resp.read().decode())
-    except urllib.error.HTTPError as e:
+# DeviceStatusClient 재시도 backoff(초): 실패 시 BASE 부터 2배씩, MAX 까지.
+STATUS_RETRY_BASE_SEC = float(os.environ.get("STATUS_RETRY_BASE_SEC", "1.0"))
+STATUS_RETRY_MAX_SEC = float(os.environ.get("STATUS_RETRY_MAX_SEC", "30.0"))
+
+
+# 상태 본문 추가 필드: name → callable() (전송 시점 값). 예외/None 이면 해당 필드 생략.
+_status_extras = {}
+
+
+def set_status_extra(name, provider):
+    """POST/PATCH 본문에 name 필드 추가 (provider=None 이면 제거). 같은 name 재등록 시 교체."""
+    if provider is None:
+        _status_extras.pop(name, None)
+    else:
+        _status_extras[name] = provider
+
+
+def _status_body(gas_id, status):
+    body = {"gas_id": gas_id, "status": status}
+    for name, provider in list(_status_extras.items()):
         try:
-            body = e.read().decode()
-            data = json.loads(body) if body else None
-        except Exception:
-            data = None
-        return e.code, data
+            value = provider()
+        except Exception as e:
+            print(f"[device_status_api] 추가 필드 {name} 생략: {e}", file=sys.stderr)
+            continue
+        if value is not None:
+            body[name] = value
+    return json.dumps(body).encode("utf-8")
+
+
+def _request(method, url, body=None, timeout=None):
+    """http_client 공용 풀 사용. 4xx/5xx 는 (code, body) 반환, 연결 실패는 예외."""
+    try:
+        return http_client.request_json(method, url, body, timeout=timeout, endpoint="device_status")
     except Exception as e:
         print(f"[device_status_api] 요청 실패 {method} {url}: {e}", file=sys.stderr)
         raise
@@ -78,7 +99,7 @@ def create_device_status(api_base_url, gas_id, status=STATUS_READY):
     if not api_base_url or not gas_id:
         return None, None
     url = f"{api_base_url.rstrip('/')}{config.DATA_API_DEVICE_STATUS_PATH}"
-    body = json.dumps({"gas_id": gas_id, "status": status}).encode("utf-8")
+    body = _status_body(gas_id, status)
     try:
         return _request("POST", url, body=body)
     except Exception:
@@ -93,21 +114,9 @@ def update_device_status(api_base_url, gas_id, status):
     if not api_base_url or not gas_id or not status:
         return None, None
     url = f"{api_base_url.rstrip('/')}{config.DATA_API_DEVICE_STATUS_PATH}"
-    body = json.dumps({"gas_id": gas_id, "status": status}).encode("utf-8")
-    req = urllib.request.Request(url, data=body, method="PATCH", headers={"Content-Type": "application/json"})
-    ctx = ssl.create_default_context()
-    if url.startswith("https://"):
-        ctx.check_hostname = False
-        ctx.verify_mode = ssl.CERT_NONE
+    body = _status_body(gas_id, status)
     try:
-        with urllib.request.urlopen(req, timeout=10, context=ctx) as resp:
-            return resp.status, json.loads(resp.read().decode())
-    except urllib.error.HTTPError as e:
-        try:
-            data = json.loads(e.read().decode())
-        except Exception:
-            data = None
-        return e.code, data
+        return _request("PATCH", url, body=body)
     except Exception as e:
         print(f"[device_status_api] PATCH 실패: {e}", file=sys.stderr)
         return None, None
@@ -129,3 +138,142 @@ def ensure_ready_then_set(api_base_url, gas_id, next_status):
         # 없으면 생성 후 갱신
         create_device_status(api_base_url, gas_id, STATUS_READY)
         update_device_status(api_base_url, gas_id, next_status)
+
+
+class StopWatcher:
+    """
+    백그라운드 스레드에서 get_current_status 를 폴링하여 stop 수신 시 stop_event 설정.
+    - 측정 루프는 stop_event.is_set() / stop_event.wait(sec) 만 사용 → HTTP 지연이 샘플 주기에 영향 없음.
+    - stop_event 를 외부에서 넘기면 해당 Event 를 공유 (다른 경로의 취소 신호와 합침).
+    """
+
+    def __init__(self, api_base_url, gas_id, interval_sec=None, stop_event=None):
+        self.api_base_url = api_base_url
+        self.gas_id = gas_id
+        self.interval_sec = interval_sec if interval_sec is not None else STOP_POLL_INTERVAL_SEC
+        self.stop_event = stop_event if stop_event is not None else threading.Event()
+        self._halt = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="stop-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._halt.is_set() and not self.stop_event.is_set():
+            try:
+                if get_current_status(self.api_base_url, self.gas_id) == STATUS_STOP:
+                    print("[device_status_api] StopWatcher: status=stop 수신", file=sys.stderr)
+                    self.stop_event.set()
+                    break
+            except Exception as e:
+                print(f"[device_status_api] StopWatcher 조회 실패(무시): {e}", file=sys.stderr)
+            self._halt.wait(self.interval_sec)
+
+    def stopped(self):
+        return self.stop_event.is_set()
+
+    def close(self):
+        """폴링 스레드 종료 (진행 중인 GET 은 기다리지 않음, daemon 스레드)."""
+        self._halt.set()
+
+
+class DeviceStatusClient:
+    """
+    디바이스 상태 갱신 전용 sender 스레드. 측정 루프는 set_status() 로 원하는 상태만 기록 (non-blocking).
+    - 병합: 전송 전 여러 번 set_status() 되면 마지막 상태 하나만 전송.
+    - 중복 생략: 서버가 마지막으로 확인(2xx)한 상태와 같으면 PATCH 생략.
+    - 재시도: 네트워크 실패/5xx 시 STATUS_RETRY_BASE_SEC 부터 지수 backoff. 대기 중 새 상태가 오면 즉시 재시도.
+    - 첫 전송 전 1회 ensure_ready_then_set 과 동일하게 GET → (미생성 시) POST ready.
+    - flush()/close(): 프로세스 종료 직전 남은 상태 전송을 제한 시간 동안 대기.
+    """
+
+    def __init__(self, api_base_url, gas_id, ensure=True):
+        self.api_base_url = api_base_url
+        self.gas_id = gas_id
+        self._cond = threading.Condition()
+        self._pending = None
+        self._acked = None
+        self._ensured = not ensure
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="device-status-sender", daemon=True)
+        self._thread.start()
+
+    def set_status(self, status):
+        """상태 전환 요청 (즉시 반환). 아직 전송되지 않은 이전 요청은 이 상태로 대체."""
+        if not status:
+            return
+        with self._cond:
+            self._pending = status
+            self._cond.notify_all()
+
+    def _send(self, status):
+        """
+        1회 전송 시도.
+        :return: True(확인됨) / False(재시도 필요) / None(4xx 등 재시도 무의미 → 폐기)
+        """
+        if not self._ensured:
+            code, body = get_device_status(self.api_base_url, self.gas_id)
+            if code is None:
+                return False
+            if not (isinstance(body, dict) and body.get("exists")):
+                create_device_status(self.api_base_url, self.gas_id, STATUS_READY)
+            self._ensured = True
+        code, _ = update_device_status(self.api_base_url, self.gas_id, status)
+        if code is None or code >= 500 or code in (408, 429):
+            return False
+        if 200 <= code < 300:
+            return True
+        print(f"[device_status_api] PATCH {status} 거부 status={code} → 재시도 안 함", file=sys.stderr)
+        return None
+
+    def _run(self):
+        delay = STATUS_RETRY_BASE_SEC
+        while True:
+            with self._cond:
+                while self._pending is None and not self._closed:
+                    self._cond.wait()
+                if self._pending is None:
+                    return
+                status = self._pending
+                if status == self._acked:
+                    self._pending = None
+                    self._cond.notify_all()
+                    continue
+            try:
+                result = self._send(status)
+            except Exception as e:
+                print(f"[device_status_api] 상태 전송 예외 {status}: {e}", file=sys.stderr)
+                result = False
+            with self._cond:
+                if result is not False:
+                    if result:
+                        self._acked = status
+                    if self._pending == status:
+                        self._pending = None
+                    self._cond.notify_all()
+                    delay = STATUS_RETRY_BASE_SEC
+                    continue
+                if self._closed:
+                    return
+                print(f"[device_status_api] 상태 {status} 전송 실패 → {delay:.1f}s 후 재시도", file=sys.stderr)
+                self._cond.wait(delay)
+                delay = min(delay * 2, STATUS_RETRY_MAX_SEC)
+
+    def flush(self, timeout=None):
+        """
+        대기 중 상태가 전송(또는 폐기)될 때까지 대기.
+        :return: bool - 남은 상태 없이 완료되었는지
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: self._pending is None, timeout)
+
+    def close(self, timeout=None):
+        """flush(timeout) 후 sender 스레드 종료. 전송 못 한 상태는 버림."""
+        done = self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        return done
@@ -1,62 +1,215 @@
+import os
+import sys
+import threading
 import board
 import digitalio
 from PIL import Image,ImageDraw,ImageFont
 import adafruit_ssd1306
 
+WIDTH = 128
+HEIGHT = 64
+BORDER = 5
+OLED_ADDR = 0x3c
+FONT_PATH = '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+# 측정 진행 화면 최대 갱신 주기(Hz). 0 이면 진행 화면 사용 안 함.
+PROGRESS_DISPLAY_HZ = float(os.environ.get('PROGRESS_DISPLAY_HZ', '2'))
+
+# SSD1306 명령 (부분 갱신용)
+SET_COL_ADDR = 0x21
+SET_PAGE_ADDR = 0x22
+
+try:
+	_TRANSPOSE = Image.Transpose.TRANSPOSE
+except AttributeError:
+	_TRANSPOSE = Image.TRANSPOSE
+
+
+class DisplayManager:
+	"""
+	SSD1306 OLED 1개를 프로세스 전체에서 공유.
+	- I2C / SSD1306_I2C 는 첫 사용 시 1회만 생성.
+	- 글꼴(ImageFont)과 텍스트 bbox 는 캐시, 1-bit 프레임버퍼(Image)는 1개를 지우고 재사용.
+	- push(): 직전 전송 내용과 달라진 페이지(8행 단위) 구간만 I2C 로 전송. 드라이버 내부 구조가 다르면 show() 로 전체 전송.
+	"""
+
+	def __init__(self, width=WIDTH, height=HEIGHT, addr=OLED_ADDR):
+		self.width = width
+		self.height = height
+		self.addr = addr
+		self.pages = height // 8
+		self.oled = None
+		self.image = Image.new('1', (width, height))
+		self.draw = ImageDraw.Draw(self.image)
+		self.lock = threading.RLock()
+		self._fonts = {}
+		self._bboxes = {}
+		self._shown = None
+
+	def _open(self):
+		if self.oled is None:
+			i2c = board.I2C()
+			self.oled = adafruit_ssd1306.SSD1306_I2C(self.width, self.height, i2c, addr=self.addr)
+			#self.oled = adafruit_ssd1306.SSD1306_I2C(self.width,self.height,i2c,addr = self.addr,reset = oled_reset)
+			self._shown = None
+		return self.oled
+
+	def font(self, size):
+		font = self._fonts.get(size)
+		if font is None:
+			font = ImageFont.truetype(FONT_PATH, size)
+			self._fonts[size] = font
+		return font
+
+	def text_size(self, text, size):
+		"""(width, height) — getbbox 결과 캐시 (getsize 는 Pillow 10 에서 제거됨)."""
+		key = (size, text)
+		wh = self._bboxes.get(key)
+		if wh is None:
+			bbox = self.font(size).getbbox(text)
+			wh = (bbox[2] - bbox[0], bbox[3] - bbox[1])
+			self._bboxes[key] = wh
+		return wh
+
+	def clear(self):
+		self.draw.rectangle((0, 0, self.width, self.height), outline=0, fill=0)
+
+	def text_centered(self, text, size, dy=0):
+		"""가로 중앙, 세로 중앙+dy 에 text 그리기."""
+		w, h = self.text_size(text, size)
+		self.draw.text(
+			(self.width//2 - w//2, self.height//2 - h//2 + dy),
+			text,
+			font = self.font(size),
+			fill = 255,
+		)
+
+	def text_at(self, xy, text, size):
+		self.draw.text(xy, text, font = self.font(size), fill = 255)
+
+	def _blit(self, oled):
+		"""프레임버퍼 Image → oled.buffer. 페이지(MVLSB) 변환을 PIL 로 처리 (oled.image() 의 픽셀 단위 루프 대체)."""
+		buf = getattr(oled, 'buffer', None)
+		w = self.width
+		if getattr(oled, 'rotation', 0) or buf is None or len(buf) != self.pages * w + 1:
+			oled.image(self.image)
+			return False
+		# 전치 후 1;R(LSB 먼저) 로 묶으면 열 x 의 8바이트 = 페이지 0..7 의 세로 8픽셀
+		packed = self.image.transpose(_TRANSPOSE).tobytes('raw', '1;R')
+		for p in range(self.pages):
+			buf[1 + p*w:1 + (p+1)*w] = packed[p::self.pages]
+		return True
+
+	def push(self):
+		"""그린 프레임버퍼를 OLED 에 반영 (변경된 페이지 구간만 전송)."""
+		with self.lock:
+			oled = self._open()
+			if not self._blit(oled) or getattr(oled, 'page_addressing', False) or not hasattr(oled, 'i2c_device'):
+				oled.show()
+				self._shown = None
+				return
+			buf = oled.buffer
+			w = self.width
+			if self._shown is None:
+				dirty = list(range(self.pages))
+			else:
+				dirty = [p for p in range(self.pages) if buf[1 + p*w:1 + (p+1)*w] != self._shown[1 + p*w:1 + (p+1)*w]]
+			if not dirty:
+				return
+			p0, p1 = dirty[0], dirty[-1]
+			for cmd in (SET_COL_ADDR, 0, w - 1, SET_PAGE_ADDR, p0, p1):
+				oled.write_cmd(cmd)
+			data = bytearray(1 + (p1 - p0 + 1) * w)
+			data[0] = 0x40  # Co=0, D/C=1 (데이터)
+			data[1:] = buf[1 + p0*w:1 + (p1+1)*w]
+			with oled.i2c_device:
+				oled.i2c_device.write(data)
+			self._shown = bytes(buf)
+
+	def show_lines(self, text_1, text_2):
+		with self.lock:
+			self.clear()
+			self.text_centered(text_1, 24, -15)
+			self.text_centered(text_2, 26, 10)
+			self.push()
+
+	def reset(self):
+		with self.lock:
+			self.clear()
+			self.push()
+
+
+class ProgressDisplay:
+	"""
+	측정 진행 화면 스레드. progress(gas_controller.MeasurementProgress).snapshot 을 최대 hz 로 읽어
+	값이 바뀌었을 때만 다시 그림 → PIL 렌더링·I2C 전송이 측정 루프에 들어가지 않음.
+	화면: 제목(gas_id+test_id) / 감지 대기 또는 남은 시간 / H2S·VOCs ppm
+	"""
+
+	def __init__(self, progress, title, hz=None, display=None):
+		self.progress = progress
+		self.title = title
+		self.hz = PROGRESS_DISPLAY_HZ if hz is None else hz
+		self.display = display or get_display()
+		self._halt = threading.Event()
+		self._thread = None
+
+	def start(self):
+		if self.hz > 0 and self._thread is None:
+			self._thread = threading.Thread(target=self._run, name='progress-display', daemon=True)
+			self._thread.start()
+		return self
+
+	def render(self, snapshot):
+		idx, feces_st, h2s_ppm, vocs_ppm, remaining_sec = snapshot
+		if feces_st:
+			status = 'MEAS %ds left' % max(0, round(remaining_sec))
+		else:
+			status = 'DETECT #%d' % idx
+		d = self.display
+		with d.lock:
+			d.clear()
+			d.text_at((0, 0), self.title, 14)
+			d.text_at((0, 18), status, 16)
+			d.text_at((0, 38), 'H2S %.2f' % h2s_ppm, 12)
+			d.text_at((0, 51), 'VOC %.2f' % vocs_ppm, 12)
+			d.push()
+
+	def _run(self):
+		period = 1.0 / self.hz
+		last = None
+		while not self._halt.wait(period):
+			snapshot = self.progress.snapshot
+			if snapshot is None or snapshot == last:
+				continue
+			last = snapshot
+			try:
+				self.render(snapshot)
+			except Exception as e:
+				print('[display_function] 진행 화면 갱신 실패 → 중단: %s' % e, file=sys.stderr)
+				return
+
+	def close(self, timeout=1.0):
+		self._halt.set()
+		if self._thread is not None:
+			self._thread.join(timeout)
+
+
+_display = None
+_display_lock = threading.Lock()
+
+
+def get_display():
+	"""프로세스 공용 DisplayManager."""
+	global _display
+	with _display_lock:
+		if _display is None:
+			_display = DisplayManager()
+		return _display
+
+
 def SSD1306_DISPLAY(GAS_ID,FILENAME):
-	#oled_reset = digitalio.DigitalInOut(board.D4)
-	
-	WIDTH = 128
-	HEIGHT =64
-	BORDER=5
-	
-	i2c = board.I2C()
-	oled = adafruit_ssd1306.SSD1306_I2C(WIDTH,HEIGHT,i2c,addr = 0x3c)
-	#oled = adafruit_ssd1306.SSD1306_I2C(WIDTH,HEIGHT,i2c,addr = 0x3c,reset = oled_reset)
-	
-	oled.fill(0)
-	oled.show()
-	
-	image = Image.new('1',(oled.width,oled.height))
-	
-	draw = ImageDraw.Draw(image)
-	draw.rectangle(
-		(BORDER,BORDER,oled.width-BORDER-1,oled.height-BORDER-1),
-		outline=0,
-		fill=0,
-	)
-	
-	#font = ImageFont.load_default()
-	font_1 = ImageFont.truetype('/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',24)
-	font_2 = ImageFont.truetype('/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',26)
-	
-	text_1 = GAS_ID
-	text_2 = FILENAME
-	
-	bbox_1 = font_1.getbbox(text_1)
-	bbox_2 = font_2.getbbox(text_2)
-	(font_width_1,font_height_1) = font_1.getsize(text_1)
-	(font_width_2,font_height_2) = font_2.getsize(text_2)
-	(font_width_1,font_height_1)=bbox_1[2]-bbox_1[0],bbox_1[3]-bbox_1[1]
-	(font_width_2,font_height_2)=bbox_2[2]-bbox_2[0],bbox_2[3]-bbox_2[1]
-	draw.text(
-		(oled.width//2 - font_width_1//2,oled.height//2-
-		font_height_1//2 - 15),
-		text_1,
-		font = font_1,
-		fill = 255,
-	)
-	draw.text(
-		(oled.width//2 - font_width_2//2,oled.height//2-
-		font_height_2//2 + 10),
-		text_2,
-		font = font_2,
-		fill = 255,
-	)
+	get_display().show_lines(GAS_ID, FILENAME)
 
-	oled.image(image)
-	oled.show()
-	
 """
 def SSD1306_DISPLAY(FILENAME):
 	#oled_reset = digitalio.DigitalInOut(board.D4)
@@ -100,14 +253,4 @@ def SSD1306_DISPLAY(FILENAME):
 	oled.show()
 """
 def Reset_Display():
-	WIDTH = 128
-	HEIGHT =64
-	BORDER=5
-
-	i2c = board.I2C()
-	oled = adafruit_ssd1306.SSD1306_I2C(WIDTH,HEIGHT,i2c,addr = 0x3c)
-	#oled = adafruit_ssd1306.SSD1306_I2C(WIDTH,HEIGHT,i2c,addr = 0x3c,reset = oled_reset)
-
-	oled.fill(0)
-	oled.show()
-
+	get_display().reset()
@@ -11,10 +11,13 @@
 
 """
 import gc
+import importlib.util
 import logging
 import os
 import sys
+import threading
 import time
+from array import array
 from datetime import datetime
 from collections import OrderedDict
 
@@ -31,36 +34,51 @@ try:
 except ImportError:
     config = None
 
+try:
+    import voltage_trace
+except ImportError:
+    voltage_trace = None
+
 try:
     from device_status_api import (
-        ensure_ready_then_set,
-        update_device_status,
-        get_current_status,
         STATUS_DETECTING,
         STATUS_MEASURING,
         STATUS_FAIL,
         STATUS_STOP,
         STATUS_READY,
+        StopWatcher,
+        DeviceStatusClient,
     )
 except ImportError:
-    ensure_ready_then_set = update_device_status = get_current_status = None
+    StopWatcher = DeviceStatusClient = None
     STATUS_DETECTING = "detecting"
     STATUS_MEASURING = "measuring"
     STATUS_FAIL = "fail"
     STATUS_STOP = "stop"
     STATUS_READY = "ready"
 
-try:
-    import numpy as np
-    _HAS_NUMPY = True
-except ImportError:
-    _HAS_NUMPY = False
+# numpy 는 종료 후 계산(compute_exposure) 첫 호출 시 import → 명령 수신 후 측정 루프 진입까지 import 비용 없음
+_HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+np = None
+_np_trapz = None
+
+
+def _numpy():
+    """numpy 지연 import (최초 1회). :return: numpy 모듈"""
+    global np, _np_trapz
+    if np is None:
+        import numpy
+        _np_trapz = getattr(numpy, "trapezoid", None) or numpy.trapz  # numpy 2.x 에서 trapz → trapezoid
+        np = numpy
+    return np
 
 # ----- 레거시 상수 -----
 BM_TIME = int(os.environ.get("BM_TIME", "8"))           # baseline 구간 길이 (샘플 수)
 END_TR = int(os.environ.get("END_TR", "180"))           # feces_st + end_tr 에서 측정 종료 (샘플 수, 1Hz 시 180초=3분)
 SHORT_TR = int(os.environ.get("SHORT_TR", "135"))      # 10+2
 LONG_TR = int(os.environ.get("LONG_TR", "20"))         # 5+2
+# 측정 종료 시 남은 device status 전송 대기 상한(초). sender 스레드가 재시도 중이어도 이 시간 후 진행.
+STATUS_FLUSH_TIMEOUT_SEC = float(os.environ.get("STATUS_FLUSH_TIMEOUT_SEC", "5.0"))
 # 루프 주기(초): 1.0 이면 1샘플/초 → 8샘플=8초 베이스라인, 180샘플=3분 측정. 0이면 sleep 없음(최대 속도).
 MEASURE_LOOP_INTERVAL_SEC = float(os.environ.get("MEASURE_LOOP_INTERVAL_SEC", "1.0"))
 FAN_PIN = int(os.environ.get("FAN_PIN", "12"))
@@ -132,6 +150,73 @@ def smooth_peak_h2s(H2S_raw_ppm, idx):
             log.debug("smooth_peak_h2s: idx=%s peak removed (%.4f -> %.4f)", idx, b, a)
 
 
+def _peak_mask(a, b, c):
+    """smooth_peak_h2s 판정 (배열 연산): b 가 극값이고 양옆 차이 < STABLE_THRE 이며 피크 크기 > 0.005."""
+    np = _numpy()
+    return (((b - a) * (c - b) < 0) & (np.abs(c - a) < STABLE_THRE)
+            & (np.abs(b - a) * np.abs(b - c) > 0.005 * 0.005))
+
+
+def smooth_peak_h2s_batch(H2S_raw_ppm, end=None, block_elems=32768):
+    """
+    smooth_peak_h2s 의 numpy 배치 버전: for i in range(1, end): smooth_peak_h2s(arr, i) 와 동일한 결과 (입력은 수정 안 함).
+    i 의 판정은 이미 처리된 arr[i-1] 에 의존(순차) → Jacobi 고정점 반복:
+    1회차는 원본 값으로 전 구간 판정, 이후에는 직전 회차에 값이 바뀐 위치의 오른쪽 이웃만 재판정 (피크 연쇄는 짧아 보통 1~2회).
+    1회차 후보: 피크 조건(|b-a|·|b-c| > 0.005², |c-a| < STABLE_THRE)이면 양쪽 차이가 모두 min_step 초과 → 차분으로 먼저 거름.
+    :param H2S_raw_ppm: PPM 시계열 (마지막 축 = 샘플, 세션 스택 가능)
+    :param end: 처리할 i 상한(미포함). 스칼라 또는 세션별 배열 (measure_sequence 는 feces_st 감지 idx 까지만 적용). None 이면 끝까지.
+    :return: float64 배열
+    """
+    np = _numpy()
+    x = np.asarray(H2S_raw_ppm, dtype=float)
+    shape = x.shape
+    n = shape[-1] if x.ndim else 0
+    if n < 3:
+        return x.copy()
+    x = x.reshape(-1, n)
+    y = x.copy()
+    # smooth_peak_h2s 도 idx < 1 or idx + 1 >= len 이면 생략
+    limit = np.full(len(x), n - 1) if end is None else np.minimum(np.broadcast_to(end, shape[:-1]).reshape(-1), n - 1)
+    # p·q > 0.005², |p-q| <= |c-a| < STABLE_THRE 이면 min(p, q) > (sqrt(T² + 4·0.005²) - T) / 2. 반올림 여유 1%.
+    min_step = 0.99 * ((STABLE_THRE ** 2 + 4 * 0.005 * 0.005) ** 0.5 - STABLE_THRE) / 2
+
+    block = max(1, block_elems // n)
+    t = np.empty((min(block, len(x)), n - 1))
+    m = np.empty(t.shape, dtype=bool)
+    found = []
+    for s in range(0, len(x), block):
+        xx = x[s:s + block]
+        k = len(xx)
+        np.subtract(xx[:, 1:], xx[:, :-1], out=t[:k])
+        np.abs(t[:k], out=t[:k])
+        np.greater(t[:k], min_step, out=m[:k])
+        cand = m[:k, :-1] & m[:k, 1:]
+        r, i = np.divmod(np.flatnonzero(cand), n - 2)
+        found.append((r + s, i + 1))
+    rows = np.concatenate([r for r, _ in found])
+    idxs = np.concatenate([i for _, i in found])
+    keep = idxs < limit[rows]
+    rows, idxs = rows[keep], idxs[keep]
+    a = x[rows, idxs - 1]
+    hit = _peak_mask(a, x[rows, idxs], x[rows, idxs + 1])
+    rows, idxs = rows[hit], idxs[hit]
+    y[rows, idxs] = a[hit]
+
+    for _ in range(n):
+        # 값이 바뀐 위치의 오른쪽 이웃만 재판정
+        nxt = idxs + 1
+        keep = nxt < limit[rows]
+        rows, nxt = rows[keep], nxt[keep]
+        if rows.size == 0:
+            break
+        a, b = y[rows, nxt - 1], x[rows, nxt]
+        val = np.where(_peak_mask(a, b, x[rows, nxt + 1]), a, b)
+        changed = val != y[rows, nxt]
+        y[rows, nxt] = val
+        rows, idxs = rows[changed], nxt[changed]
+    return y.reshape(shape)
+
+
 def update_feces_st(idx, H2S_raw_ppm, noise_1_list, noise_5_list, feces_st, BM_time=None):
     """
     feces_st 갱신: noise_1 / noise_5 임계값 초과 시 feces_st = idx-2 설정 (한 번만).
@@ -210,10 +295,83 @@ def update_feces_st(idx, H2S_raw_ppm, noise_1_list, noise_5_list, feces_st, BM_t
     return feces_st, noise_1_list, noise_5_list
 
 
+class FecesOnsetDetector:
+    """
+    update_feces_st 의 스트리밍 버전 (샘플당 O(1), 고정 크기 상태).
+    - noise_1_list / noise_5_list 전체를 보관하지 않고 running max 만 유지.
+    - update_feces_st 와 동일한 feces_st 판정 (레거시 quirk 포함: noise_1 저임계 분기는 temp_stt-2).
+    - idx 는 2부터 1씩 증가하며 매 샘플 호출된다고 가정 (measure_sequence 호출 패턴과 동일).
+
+    update_feces_st 대응:
+    - max(noise_1_list[0:temp_stt-2]) == 초기값 0 과 idx-2 까지의 noise_1 최대값 → 최근 2개는 대기 후 반영.
+    - max(noise_5_list[0:cur_5])      == 초기값 0 과 직전 idx 까지의 noise_5 최대값.
+    """
+
+    def __init__(self, BM_time=None):
+        self.bm = BM_time if BM_time is not None else BM_TIME
+        self.feces_st = 0
+        self.noise_1 = 0.0       # 마지막 noise_1 (로그/진행 표시용)
+        self.noise_5 = 0.0       # 마지막 noise_5
+        self._n1_max = 0.0       # noise_1_list[0:temp_stt-2] 최대값
+        self._n1_prev = 0.0      # noise_1(idx-1): 다음 샘플에서 _n1_prev2 로 이동
+        self._n1_prev2 = 0.0     # noise_1(idx-2): 이번 판정 전에 _n1_max 에 반영
+        self._n5_max = 0.0       # noise_5_list[0:cur_5] 최대값
+
+    def update(self, idx, H2S_raw_ppm):
+        """
+        idx 샘플 반영 후 feces_st 반환 (0이면 미감지). 감지 후에는 상태 변경 없이 feces_st 그대로 반환.
+        :param idx: 현재 인덱스
+        :param H2S_raw_ppm: H2S PPM 시계열 (인덱싱만 사용: idx, idx-1, idx-5)
+        """
+        if self.feces_st != 0 or idx <= 1:
+            return self.feces_st
+        temp_stt = idx - 1
+        if temp_stt < 2:
+            return self.feces_st
+
+        n1 = abs(H2S_raw_ppm[idx] - H2S_raw_ppm[idx - 1])
+        # 레거시: idx>4 일 때만 noise_5 append, 그 전에는 초기 0 이 '현재' 값
+        n5 = abs(H2S_raw_ppm[idx] - H2S_raw_ppm[idx - 5]) if idx > 4 else 0.0
+        if self._n1_prev2 > self._n1_max:
+            self._n1_max = self._n1_prev2
+        self._n1_prev2, self._n1_prev = self._n1_prev, n1
+        self.noise_1, self.noise_5 = n1, n5
+
+        if idx > self.bm:
+            feces_st = 0
+            max_n1_prev = self._n1_max
+            if max_n1_prev > 0.006:
+                if n1 > max_n1_prev * 1.2:
+                    feces_st = idx - 2
+            else:
+                if n1 > NOISE_1_THRESHOLD:
+                    feces_st = temp_stt - 2
+
+            max_n5_prev = self._n5_max
+            if max_n5_prev > NOISE_5_THRESHOLD_HIGH:
+                if n5 > max_n5_prev * 1.2:
+                    feces_st = idx - 2
+            else:
+                if n5 > NOISE_5_THRESHOLD:
+                    feces_st = idx - 2
+
+            if feces_st != 0:
+                self.feces_st = feces_st
+                log.info("FecesOnsetDetector: feces_st detected idx=%s -> feces_st=%s (noise_1=%.4f noise_5=%.4f)", idx, feces_st, n1, n5)
+                print(f"[gpio_controller] [update_feces_st] 감지됨 idx={idx} -> feces_st={feces_st} (noise_1={n1:.4f} noise_5={n5:.4f})", file=sys.stderr)
+            elif idx % 10 == 0:
+                print(f"[gpio_controller] [update_feces_st] 판정 후 유지 idx={idx} feces_st=0 (noise_1={n1:.4f} noise_5={n5:.4f}, 임계값 n1>{NOISE_1_THRESHOLD} n5>{NOISE_5_THRESHOLD})", file=sys.stderr)
+
+        if n5 > self._n5_max:
+            self._n5_max = n5
+        return self.feces_st
+
+
 def _trapz(y, x):
     """사다리꼴 적분. numpy 없으면 수동 계산."""
     if _HAS_NUMPY:
-        result = float(np.trapz(y, x))
+        _numpy()
+        result = float(_np_trapz(y, x))
     else:
         s = 0.0
         for i in range(1, len(y)):
@@ -227,9 +385,9 @@ def compute_exposure(H2S_raw_ppm_shift, VOCs_raw_ppm_shift, Time_shift, BM_time=
     """
     시프트된 구간에서 오프셋 PPM · 절대값 적분 · 비율 계산.
     레거시 MainCode.py 358~377행과 동일: 오프셋 = raw[i] - raw[BM_time], 베이스라인 = raw[BM_time].
-    :param H2S_raw_ppm_shift: feces_st-BM_time 부터의 H2S PPM 리스트
-    :param VOCs_raw_ppm_shift: 동일 길이 VOCs PPM 리스트
-    :param Time_shift: 동일 길이 시간 리스트 (초)
+    :param H2S_raw_ppm_shift: feces_st-BM_time 부터의 H2S PPM 시퀀스 (리스트 또는 SampleStore memoryview)
+    :param VOCs_raw_ppm_shift: 동일 길이 VOCs PPM 시퀀스
+    :param Time_shift: 동일 길이 시간 시퀀스 (초). trapz 는 간격만 사용하므로 0 기준 시프트 여부 무관.
     :param BM_time: BM_time (기본 모듈 상수)
     :return: dict with h2s_abs_exposure, vocs_abs_exposure, total_abs_exposure,
              h2s_ratio_value_pct, vocs_ratio_value_pct, H2S_offseted_ppm_abs, VOCs_offseted_ppm_abs,
@@ -253,13 +411,19 @@ def compute_exposure(H2S_raw_ppm_shift, VOCs_raw_ppm_shift, Time_shift, BM_time=
         }
 
     if _HAS_NUMPY:
-        time_arr = np.array(Time_shift, dtype=float)
-        h2s_off = np.array([0.0] * bm + [H2S_raw_ppm_shift[i] - H2S_raw_ppm_shift[bm] for i in range(bm, n)], dtype=float)
-        vocs_off = np.array([0.0] * bm + [VOCs_raw_ppm_shift[i] - VOCs_raw_ppm_shift[bm] for i in range(bm, n)], dtype=float)
+        _numpy()
+        # memoryview(array('d')) 는 np.asarray 로 복사 없이 참조
+        time_arr = np.asarray(Time_shift, dtype=float)
+        h2s_arr = np.asarray(H2S_raw_ppm_shift, dtype=float)
+        vocs_arr = np.asarray(VOCs_raw_ppm_shift, dtype=float)
+        h2s_off = h2s_arr - h2s_arr[bm]
+        vocs_off = vocs_arr - vocs_arr[bm]
+        h2s_off[:bm] = 0.0
+        vocs_off[:bm] = 0.0
         h2s_abs = np.abs(h2s_off)
         vocs_abs = np.abs(vocs_off)
-        h2s_exp = float(np.trapz(h2s_abs, time_arr))
-        vocs_exp = float(np.trapz(vocs_abs, time_arr))
+        h2s_exp = float(_np_trapz(h2s_abs, time_arr))
+        vocs_exp = float(_np_trapz(vocs_abs, time_arr))
     else:
         h2s_off = [0.0] * bm + [H2S_raw_ppm_shift[i] - H2S_raw_ppm_shift[bm] for i in range(bm, n)]
         vocs_off = [0.0] * bm + [VOCs_raw_ppm_shift[i] - VOCs_raw_ppm_shift[bm] for i in range(bm, n)]
@@ -297,6 +461,46 @@ def compute_exposure(H2S_raw_ppm_shift, VOCs_raw_ppm_shift, Time_shift, BM_time=
     }
 
 
+def compute_exposure_batch(H2S_raw_ppm_shift, VOCs_raw_ppm_shift, Time_shift, BM_time=None):
+    """
+    compute_exposure 의 numpy 배치 버전 (재채점용). 같은 길이의 세션 여러 개를 (세션 수, 샘플 수) 배열로 한 번에 계산.
+    세션별 compute_exposure 와 같은 연산 순서 → 같은 값 (trapz 는 행 단위 합).
+    :return: dict — compute_exposure 의 스칼라 키(h2s_abs_exposure ... vocs_baseline_ppm)별 (세션 수,) 배열
+    """
+    np = _numpy()
+    bm = BM_time if BM_time is not None else BM_TIME
+    h2s = np.atleast_2d(np.asarray(H2S_raw_ppm_shift, dtype=float))
+    vocs = np.atleast_2d(np.asarray(VOCs_raw_ppm_shift, dtype=float))
+    t = np.atleast_2d(np.asarray(Time_shift, dtype=float))
+    k, n = h2s.shape
+    if n <= bm:
+        zeros = np.zeros(k)
+        return {key: zeros.copy() for key in ("h2s_abs_exposure", "vocs_abs_exposure", "total_abs_exposure",
+                                               "h2s_ratio_value_pct", "vocs_ratio_value_pct",
+                                               "h2s_baseline_ppm", "vocs_baseline_ppm")}
+    h2s_base = h2s[:, bm]
+    vocs_base = vocs[:, bm]
+    h2s_abs = np.abs(h2s - h2s_base[:, None])
+    vocs_abs = np.abs(vocs - vocs_base[:, None])
+    h2s_abs[:, :bm] = 0.0
+    vocs_abs[:, :bm] = 0.0
+    h2s_exp = _np_trapz(h2s_abs, t, axis=-1)
+    vocs_exp = _np_trapz(vocs_abs, t, axis=-1)
+    total = h2s_exp + vocs_exp
+    with np.errstate(divide="ignore", invalid="ignore"):
+        h2s_ratio = np.where(total != 0, 100.0 * h2s_exp / total, 0.0)
+        vocs_ratio = np.where(total != 0, 100.0 * vocs_exp / total, 0.0)
+    return {
+        "h2s_abs_exposure": h2s_exp,
+        "vocs_abs_exposure": vocs_exp,
+        "total_abs_exposure": total,
+        "h2s_ratio_value_pct": h2s_ratio,
+        "vocs_ratio_value_pct": vocs_ratio,
+        "h2s_baseline_ppm": h2s_base.copy(),
+        "vocs_baseline_ppm": vocs_base.copy(),
+    }
+
+
 def build_measurement_json(gas_id, test_id, success, wifi_connection,
                            H2S_raw_ppm_shift, VOCs_raw_ppm_shift, Time_shift,
                            calc_result, gas_version="GV.1.1"):
@@ -458,6 +662,22 @@ def init_adc():
         return None
 
 
+_adc = None
+_adc_lock = threading.Lock()
+
+
+def get_adc():
+    """
+    프로세스 공용 ADC 핸들. 첫 호출에서 init_adc(), 이후 재사용 (main.py --serve 데몬에서 세션 간 유지).
+    초기화 실패(None)는 캐시하지 않음 → 다음 호출에서 재시도.
+    """
+    global _adc
+    with _adc_lock:
+        if _adc is None:
+            _adc = init_adc()
+        return _adc
+
+
 def read_adc_voltages(adc, ch_h2s=1, ch_vocs=2, ch_switch=8):
     """ADC 채널 전압 읽기. adc가 None이면 (0,0,0) 반환."""
     if adc is None:
@@ -479,7 +699,203 @@ def read_adc_voltages(adc, ch_h2s=1, ch_vocs=2, ch_switch=8):
 MEASURE_SEQUENCE_MAX_ITER = int(os.environ.get("MEASURE_SEQUENCE_MAX_ITER", "500"))
 
 
-def measure_sequence(gas_id, test_id, capture_callback=None, simulation=False, pwm=None, api_base=None):
+class SampleStore:
+    """
+    measure_sequence 시계열 저장소. array('d') 를 MEASURE_SEQUENCE_MAX_ITER 크기로 사전 할당 (루프 1회당 1샘플).
+    - h2s / vocs: 필터 후 PPM.
+    - time: 레거시 TIME 과 동일한 누적 처리 시간(초, 소수 둘째 자리). time.monotonic() 기준 float 로 보관, 문자열 변환 없음.
+    - h2s()/vocs()/time() 는 현재 길이까지의 memoryview 반환 (복사 없음, smooth_peak_h2s 의 제자리 수정 가능).
+    """
+
+    def __init__(self, capacity=None):
+        self.capacity = capacity if capacity is not None else MEASURE_SEQUENCE_MAX_ITER
+        self._h2s = array("d", bytes(8 * self.capacity))
+        self._vocs = array("d", bytes(8 * self.capacity))
+        self._time = array("d", bytes(8 * self.capacity))
+        self.n = 0
+
+    def __len__(self):
+        return self.n
+
+    def append(self, h2s_ppm, vocs_ppm):
+        """PPM 1샘플 추가. 시간은 루프 끝에서 stamp() 로 기록."""
+        i = self.n
+        if i >= self.capacity:
+            raise IndexError(f"SampleStore full (capacity={self.capacity})")
+        self._h2s[i] = h2s_ppm
+        self._vocs[i] = vocs_ppm
+        self.n = i + 1
+
+    def stamp(self, elapsed_sec):
+        """마지막 샘플의 누적 시간 기록 (레거시 TIME 과 동일하게 소수 둘째 자리 반올림)."""
+        t = round(elapsed_sec, 2)
+        self._time[self.n - 1] = t
+        return t
+
+    def h2s(self, start=0):
+        return memoryview(self._h2s)[start:self.n]
+
+    def vocs(self, start=0):
+        return memoryview(self._vocs)[start:self.n]
+
+    def time(self, start=0):
+        return memoryview(self._time)[start:self.n]
+
+
+class MeasurementProgress:
+    """
+    측정 루프 → 표시 스레드(display_function.ProgressDisplay) 진행 상황 전달.
+    루프는 publish() 로 새 tuple 을 통째로 대입(원자적)하고 읽는 쪽은 snapshot 만 읽음 → lock 없음, 루프 대기 없음.
+    snapshot: (idx, feces_st, h2s_ppm, vocs_ppm, remaining_sec) — remaining_sec 는 feces_st 감지 전 None. 시작 전 None.
+    """
+
+    __slots__ = ("snapshot",)
+
+    def __init__(self):
+        self.snapshot = None
+
+    def publish(self, idx, feces_st, h2s_ppm, vocs_ppm, remaining_sec):
+        self.snapshot = (idx, feces_st, h2s_ppm, vocs_ppm, remaining_sec)
+
+
+class MeasurementStopped(Exception):
+    """measure_sequence 가 stop 신호(stop_event)로 조기 종료됨. device status 는 ready 로 복구된 상태."""
+
+
+class GasPipeline:
+    """
+    measure_sequence 의 신호 처리부 (ADC·팬·sleep·HTTP·캡처 없음, 순수 계산).
+    실측 루프와 replay.py 가 같은 코드를 사용 → 녹화된 전압 trace 로 동일한 결과 dict 재현.
+
+    사용: 샘플마다 step(h2s_v, vocs_v) → stamp(elapsed_total) → done() 이면 종료. 루프 후 finish().
+    - step: 필터(utils.filter 또는 filter_voltage) → PPM → SampleStore append → smooth_peak_h2s → FecesOnsetDetector.
+    - stamp: 레거시 TIME (누적 처리 시간, 초). 실측은 루프 처리 시간 합, replay 는 trace 에 기록된 값.
+    - finish: 시프트·오프셋·trapz·비율 계산 → measure_sequence 결과 dict. 측정 구간 무효면 None.
+    """
+
+    def __init__(self, capacity=None, BM_time=None, end_tr=None, use_legacy_filter=None):
+        self.bm = BM_time if BM_time is not None else BM_TIME
+        self.end_tr = end_tr if end_tr is not None else END_TR
+        self.use_legacy_filter = (legacy_filter is not None) if use_legacy_filter is None else use_legacy_filter
+        self.samples = SampleStore(capacity)
+        self.detector = FecesOnsetDetector(self.bm)
+        self.idx = -1          # 마지막 step 의 인덱스
+        self.feces_st = 0
+        self.elapsed_total = 0.0
+        self._H2S_a = self._H2S_b = self._VOCs_a = self._VOCs_b = 0.0
+
+    def step(self, h2s_v, vocs_v):
+        """
+        전압 1샘플 처리.
+        :return: (H2S_RAW_PPM, VOCs_RAW_PPM, detected) — detected: 이번 샘플에서 feces_st 가 처음 감지됨
+        """
+        self.idx = idx = self.idx + 1
+        if self.use_legacy_filter:
+            H2S_filtered_v, self._H2S_b, self._H2S_a = legacy_filter(h2s_v, self._H2S_b, self._H2S_a)
+            VOCs_filtered_v, self._VOCs_b, self._VOCs_a = legacy_filter(vocs_v, self._VOCs_b, self._VOCs_a)
+        else:
+            H2S_filtered_v, self._H2S_b, _ = filter_voltage(h2s_v, self._H2S_b)
+            VOCs_filtered_v, self._VOCs_b, _ = filter_voltage(vocs_v, self._VOCs_b)
+
+        H2S_RAW_PPM = (float(H2S_filtered_v) - VOLTAGE_OFFSET) * 1e6 / H2S_DIVISOR if H2S_DIVISOR else 0.0
+        VOCs_RAW_PPM = (float(VOCs_filtered_v) - VOLTAGE_OFFSET) * 1e6 / VOCS_DIVISOR if VOCS_DIVISOR else 0.0
+        self.samples.append(H2S_RAW_PPM, VOCs_RAW_PPM)
+
+        # smooth_peak_h2s, update_feces_st (feces_st==0이고 idx>1일 때만)
+        detected = False
+        if self.feces_st == 0 and idx > 1:
+            H2S_raw_ppm = self.samples.h2s()
+            smooth_peak_h2s(H2S_raw_ppm, idx - 1)
+            self.feces_st = self.detector.update(idx, H2S_raw_ppm)
+            detected = self.feces_st != 0
+        return H2S_RAW_PPM, VOCs_RAW_PPM, detected
+
+    def stamp(self, elapsed_total):
+        """마지막 샘플의 누적 시간 기록. :return: 반올림된 누적 시간 (다음 stamp 의 기준)"""
+        self.elapsed_total = self.samples.stamp(elapsed_total)
+        return self.elapsed_total
+
+    def done(self):
+        """idx == feces_st + end_tr 이면 True (측정 종료)."""
+        return self.feces_st != 0 and self.idx == self.feces_st + self.end_tr
+
+    def remaining_samples(self):
+        """종료까지 남은 샘플 수. feces_st 감지 전 None."""
+        return self.feces_st + self.end_tr - self.idx if self.feces_st else None
+
+    def finish(self):
+        """
+        종료 후 계산. 시프트 구간 = [feces_st-BM_time .. 끝], 베이스라인 = raw_ppm_shift[BM_time].
+        :return: measure_sequence 결과 dict, 측정 구간 무효(feces_st 미감지/데이터 부족)면 None
+        """
+        feces_st, bm, samples = self.feces_st, self.bm, self.samples
+        if feces_st == 0 or feces_st < bm or feces_st + self.end_tr > len(samples):
+            log.warning("[GPIO] 측정 구간 무효 (feces_st=%s bm=%s len=%s)", feces_st, bm, len(samples))
+            return None
+
+        # 시프트 구간 [feces_st-BM_time:] 은 SampleStore 의 memoryview 그대로 compute_exposure 에 전달 (복사 없음)
+        shift_st = feces_st - bm
+        H2S_view, VOCs_view, Time_view = samples.h2s(shift_st), samples.vocs(shift_st), samples.time(shift_st)
+        log.debug("GasPipeline.finish: shift range shift_len=%s", len(H2S_view))
+
+        calc_result = compute_exposure(H2S_view, VOCs_view, Time_view, bm)
+
+        # 결과 dict 용 리스트는 종료 후 1회만 생성 (Time_shift 는 시프트 시작 0초 기준)
+        # Time_shift 는 레거시와 같은 "%.2f" 문자열 (build_measurement_json 의 "time[sec]" 가 기존 보관 JSON 과 동일)
+        H2S_raw_ppm_shift = H2S_view.tolist()
+        VOCs_raw_ppm_shift = VOCs_view.tolist()
+        t0 = Time_view[0]
+        Time_shift = [f"{t - t0:.2f}" for t in Time_view]
+        del H2S_view, VOCs_view, Time_view
+        n = len(H2S_raw_ppm_shift)
+        last_h2s = H2S_raw_ppm_shift[-1] if n else 0.0
+        last_vocs = VOCs_raw_ppm_shift[-1] if n else 0.0
+        time_sec = float(Time_shift[-1]) if Time_shift else 0.0
+
+        # h2s_offset_ppm / vocs_offset_ppm: 베이스라인 기준값 (오프셋 시 빼는 raw[BM_time]). MainCode.py 364~365행 대응.
+        h2s_baseline = calc_result.get("h2s_baseline_ppm", 0.0)
+        vocs_baseline = calc_result.get("vocs_baseline_ppm", 0.0)
+
+        return {
+            "gas_version": "GV.1.1",
+            "h2s_abs_exposure": calc_result["h2s_abs_exposure"],
+            "h2s_offset_ppm": h2s_baseline,
+            "h2s_ppm": last_h2s,
+            "h2s_ratio_value_pct": calc_result["h2s_ratio_value_pct"],
+            "sort": n,
+            "success": "Y",
+            "time_sec": time_sec,
+            "total_abs_exposure": calc_result["total_abs_exposure"],
+            "vocs_abs_exposure": calc_result["vocs_abs_exposure"],
+            "vocs_offset_ppm": vocs_baseline,
+            "vocs_ppm": last_vocs,
+            "vocs_ratio_value_pct": calc_result["vocs_ratio_value_pct"],
+            "H2S_raw_ppm_shift": H2S_raw_ppm_shift,
+            "VOCs_raw_ppm_shift": VOCs_raw_ppm_shift,
+            "Time_shift": Time_shift,
+            "calc_result": calc_result,
+        }
+
+
+def replay_trace(voltages, times=None, BM_time=None, end_tr=None, use_legacy_filter=None):
+    """
+    녹화된 전압 trace 로 measure_sequence 결과 재계산 (하드웨어·대기 없음).
+    :param voltages: (h2s_v, vocs_v) 시퀀스 (read_adc_voltages 순서)
+    :param times: 샘플별 누적 시간(초) 시퀀스 — 실측 SampleStore.time 값. None 이면 MEASURE_LOOP_INTERVAL_SEC 간격 가정.
+    :return: (result, pipeline) — result 는 measure_sequence 와 동일한 dict, 무효 구간이면 None
+    """
+    pipeline = GasPipeline(max(len(voltages), 1), BM_time, end_tr, use_legacy_filter)
+    interval = MEASURE_LOOP_INTERVAL_SEC or 1.0
+    for i, (h2s_v, vocs_v) in enumerate(voltages):
+        pipeline.step(h2s_v, vocs_v)
+        pipeline.stamp(times[i] if times is not None else (i + 1) * interval)
+        if pipeline.done():
+            break
+    return pipeline.finish(), pipeline
+
+
+def measure_sequence(gas_id, test_id, capture_callback=None, simulation=False, pwm=None, api_base=None, stop_event=None,
+                     status_client=None, progress=None):
     """
     명령어 기반 1회 실행. 레거시 MainCode와 동일한 처리 순서로 동작.
 
@@ -494,11 +910,18 @@ def measure_sequence(gas_id, test_id, capture_callback=None, simulation=False, p
        compute_exposure에서 오프셋 = raw[i]-raw[BM_time], trapz 적분·비율 계산.
 
     순서: ADC 읽기 → utils.filter(또는 filter_voltage) → H2S/VOCs PPM append
-          → smooth_peak_h2s → update_feces_st → idx==feces_st+end_tr 시 종료
+          → smooth_peak_h2s → FecesOnsetDetector.update(update_feces_st 스트리밍 판정) → idx==feces_st+end_tr 시 종료
           → 시프트·오프셋·trapz·비율 계산.
+          신호 처리는 GasPipeline(step/stamp/done/finish) 으로 분리 → replay.py 가 녹화 trace 로 동일 결과 재현.
     - capture_callback(slot, data_file_name, image_time_str): slot 1,2,3 촬영 시점에 호출.
     - pwm: 외부에서 넘기면 루프 시작 시 idx==0에서 fan_stop 후 무시하고, ADC 진입 시 내부에서 fan_start. None이면 내부에서 전부 제어.
     - api_base: None이면 config.DATA_API_URL 사용. device status(detecting/measuring) 갱신 시 사용.
+    - stop_event: 취소 토큰(threading.Event). None이면 api_base 기준 StopWatcher 스레드를 띄워 stop 폴링.
+      루프는 stop_event 만 확인하며 대기는 stop_event.wait() 로 하여 stop 수신 즉시 깨어남.
+    - status_client: DeviceStatusClient. None이면 api_base 기준으로 생성하고 종료 시 STATUS_FLUSH_TIMEOUT_SEC 동안 flush.
+      루프에서는 set_status() 로 상태만 기록 (GET/POST/PATCH 는 sender 스레드에서 수행).
+    - progress: MeasurementProgress. 매 샘플 처리 후 snapshot 갱신 (OLED 진행 화면 스레드가 읽음).
+    - stop 으로 조기 종료 시 MeasurementStopped 예외 (팬 정지·ready 복구 후). 원샷 main 은 exit 0, 데몬은 다음 작업 대기.
     """
     log.info("[GPIO] measure_sequence 시작: gas_id=%s test_id=%s simulation=%s", gas_id, test_id, simulation)
 
@@ -506,7 +929,7 @@ def measure_sequence(gas_id, test_id, capture_callback=None, simulation=False, p
         log.debug("[GPIO] 시뮬레이션 모드 -> measure_sequence_simulation() 반환")
         return measure_sequence_simulation()
 
-    adc = init_adc()
+    adc = get_adc()
     if adc is None:
         print("[gpio_controller] measure_sequence: ADC 초기화 실패(ABE_helpers/ADCPi 미사용) -> 가스 루프 생략, 시뮬 결과 반환. 이 경우 슬롯 1,2,3 촬영 없음(0번만 촬영됨).", file=sys.stderr)
         log.warning("[GPIO] measure_sequence: ADC 초기화 실패(ABE_helpers/ADCPi 미사용) -> 가스 루프 생략, 시뮬 결과 반환. 이 경우 슬롯 1,2,3 촬영 없음(0번만 촬영됨).")
@@ -517,12 +940,8 @@ def measure_sequence(gas_id, test_id, capture_callback=None, simulation=False, p
 
     data_file_name = f"{gas_id}{test_id}"
     log.info("[GPIO] data_file_name=%s use_legacy_filter=%s CAPTURE_IDX_OFFSETS=%s", data_file_name, legacy_filter is not None, CAPTURE_IDX_OFFSETS)
-    use_legacy_filter = legacy_filter is not None
-    H2S_raw_ppm, VOCs_raw_ppm = [], []
-    TIME = []
-    noise_1_list = [0]
-    noise_5_list = [0.0] * 4
-    H2S_a, H2S_b, VOCs_a, VOCs_b = 0.0, 0.0, 0.0, 0.0
+    pipeline = GasPipeline(MEASURE_SEQUENCE_MAX_ITER, BM_TIME, END_TR)
+    elapsed_total = 0.0
     idx = 0
     feces_st = 0
     bm = BM_TIME
@@ -536,21 +955,49 @@ def measure_sequence(gas_id, test_id, capture_callback=None, simulation=False, p
     status_measuring_sent = False
     stop_requested = False
 
+    # device status: sender 스레드로 비동기 전송 (루프는 set_status 만 호출)
+    own_status_client = False
+    if status_client is None and api_base and DeviceStatusClient is not None:
+        status_client = DeviceStatusClient(api_base, gas_id)
+        own_status_client = True
+
+    # 원시 전압 trace (replay.py 재현용). 열기 실패 시 None → 기록 없이 측정
+    trace = None
+    if voltage_trace is not None:
+        trace = voltage_trace.open_trace(data_file_name, {
+            "gas_id": gas_id,
+            "test_id": test_id,
+            "bm_time": bm,
+            "end_tr": end_tr,
+            "max_iter": MEASURE_SEQUENCE_MAX_ITER,
+            "loop_interval_sec": MEASURE_LOOP_INTERVAL_SEC,
+            "capture_idx_offsets": list(CAPTURE_IDX_OFFSETS),
+            "legacy_filter": pipeline.use_legacy_filter,
+            "noise_1_threshold": NOISE_1_THRESHOLD,
+            "noise_5_threshold": NOISE_5_THRESHOLD,
+            "noise_5_threshold_high": NOISE_5_THRESHOLD_HIGH,
+            "stable_thre": STABLE_THRE,
+        })
+
+    # stop 신호: 외부 토큰 또는 StopWatcher(백그라운드 폴링). 루프 안에서는 HTTP 호출 없이 플래그만 확인.
+    stop_watcher = None
+    if stop_event is None:
+        if api_base and StopWatcher is not None:
+            stop_watcher = StopWatcher(api_base, gas_id).start()
+            stop_event = stop_watcher.stop_event
+        else:
+            stop_event = threading.Event()
+
     try:
         for _ in range(MEASURE_SEQUENCE_MAX_ITER):
-            # device status 폴링: stop 수신 시 루프 탈출 후 프로세스 종료 (subscriber가 PATCH stop 후 재시작)
-            if api_base and get_current_status is not None:
-                try:
-                    current = get_current_status(api_base, gas_id)
-                    if current == STATUS_STOP:
-                        stop_requested = True
-                        log.info("[GPIO] device status=stop 수신 → 측정 루프 조기 종료")
-                        print("[gpio_controller] [GPIO] device status=stop 수신, 측정 루프 조기 종료", file=sys.stderr)
-                        break
-                except Exception as e:
-                    log.debug("[GPIO] device status 조회 실패(무시): %s", e)
+            # stop 수신 시 루프 탈출 후 프로세스 종료 (subscriber가 PATCH stop 후 재시작)
+            if stop_event.is_set():
+                stop_requested = True
+                log.info("[GPIO] device status=stop 수신 → 측정 루프 조기 종료")
+                print("[gpio_controller] [GPIO] device status=stop 수신, 측정 루프 조기 종료", file=sys.stderr)
+                break
 
-            start_time = time.time()
+            start_time = time.monotonic()
 
             # 1) idx==0: fan_stop 후 ADC 읽기 진입 시 fan_start
             if idx == 0:
@@ -568,22 +1015,10 @@ def measure_sequence(gas_id, test_id, capture_callback=None, simulation=False, p
 
             # 2) idx > BM_TIME(8): device status → detecting (1회)
             if idx > bm and not status_detecting_sent:
-                if api_base and ensure_ready_then_set is not None:
-                    try:
-                        ensure_ready_then_set(api_base, gas_id, STATUS_DETECTING)
-                        log.info("[GPIO] Device status 갱신: detecting (idx>BM_TIME)")
-                        print("[SCENARIO] 7. Device status 갱신: detecting (gas_controller)", file=sys.stderr)
-                        # INSERT_YOUR_CODE
-                        time.sleep(8)
-                        if api_base and get_current_status is not None:
-                            try:
-                                if get_current_status(api_base, gas_id) == STATUS_STOP:
-                                    stop_requested = True
-                                    break
-                            except Exception:
-                                pass
-                    except Exception as e:
-                        log.warning("[GPIO] device status detecting 전송 실패: %s", e)
+                if status_client is not None:
+                    status_client.set_status(STATUS_DETECTING)
+                    log.info("[GPIO] Device status 갱신 요청: detecting (idx>BM_TIME)")
+                    print("[SCENARIO] 7. Device status 갱신: detecting (gas_controller)", file=sys.stderr)
                 status_detecting_sent = True
 
             # 3) idx >= 20: fan_stop, device status → measuring (1회), 이후 루프 계속
@@ -591,48 +1026,32 @@ def measure_sequence(gas_id, test_id, capture_callback=None, simulation=False, p
                 if pwm is not None:
                     fan_stop(pwm)
                     pwm = None
-                if api_base and update_device_status is not None:
-                    try:
-                        update_device_status(api_base, gas_id, STATUS_MEASURING)
-                        log.info("[GPIO] Device status 갱신: measuring (idx>=20)")
-                        print("[SCENARIO] 8. Device status 갱신: measuring (gas_controller)", file=sys.stderr)
-                    except Exception as e:
-                        log.warning("[GPIO] device status measuring 전송 실패: %s", e)
+                if status_client is not None:
+                    status_client.set_status(STATUS_MEASURING)
+                    log.info("[GPIO] Device status 갱신 요청: measuring (idx>=20)")
+                    print("[SCENARIO] 8. Device status 갱신: measuring (gas_controller)", file=sys.stderr)
                 status_measuring_sent = True
 
             # 4) ADC 읽기
-            h2s_v, vocs_v, _ = read_adc_voltages(adc)
+            h2s_v, vocs_v, switch_v = read_adc_voltages(adc)
+            read_time = time.monotonic()
             if idx == 0:
                 log.info("[GPIO] 첫 ADC 읽기: H2S=%.4fV VOCs=%.4fV", h2s_v, vocs_v)
                 print("[gpio_controller] [GPIO] 가스 루프 1회차 ADC 읽기 완료 (이후 약 1초/샘플로 진행, feces_st 감지 시 슬롯 1,2,3 촬영)", file=sys.stderr)
                 print(f"[gpio_controller] [ADC] idx=0 H2S={h2s_v:.4f}V VOCs={vocs_v:.4f}V", file=sys.stderr)
 
-            # 2) utils.filter 또는 filter_voltage → 필터 출력
-            if use_legacy_filter:
-                H2S_filtered_v, H2S_b, H2S_a = legacy_filter(h2s_v, H2S_b, H2S_a)
-                VOCs_filtered_v, VOCs_b, VOCs_a = legacy_filter(vocs_v, VOCs_b, VOCs_a)
-            else:
-                H2S_filtered_v, H2S_b, _ = filter_voltage(h2s_v, H2S_b)
-                VOCs_filtered_v, VOCs_b, _ = filter_voltage(vocs_v, VOCs_b)
-            
-            # 3) H2S_RAW_PPM / VOCs_RAW_PPM append
-            H2S_RAW_PPM = (float(H2S_filtered_v) - VOLTAGE_OFFSET) * 1e6 / H2S_DIVISOR if H2S_DIVISOR else 0.0
-            VOCs_RAW_PPM = (float(VOCs_filtered_v) - VOLTAGE_OFFSET) * 1e6 / VOCS_DIVISOR if VOCS_DIVISOR else 0.0
-            H2S_raw_ppm.append(H2S_RAW_PPM)
-            VOCs_raw_ppm.append(VOCs_RAW_PPM)
+            # 2~5) 필터 → PPM append → smooth_peak_h2s → update_feces_st (GasPipeline.step, replay 와 동일 코드)
+            H2S_RAW_PPM, VOCs_RAW_PPM, detected = pipeline.step(h2s_v, vocs_v)
+            feces_st = pipeline.feces_st
 
             # ADC 로그: 10샘플마다 전압·PPM 출력 (idx 0은 위에서 이미 출력)
             if idx > 0 and idx % 10 == 0:
                 print(f"[gpio_controller] [ADC] idx={idx} H2S={h2s_v:.4f}V VOCs={vocs_v:.4f}V -> PPM H2S={H2S_RAW_PPM:.4f} VOCs={VOCs_RAW_PPM:.4f}", file=sys.stderr)
 
-            # 4) smooth_peak_h2s, 5) update_feces_st (feces_st==0이고 idx>1일 때만)
-            if feces_st == 0 and idx > 1:
-                temp_stt = idx - 1
-                smooth_peak_h2s(H2S_raw_ppm, temp_stt)
-                feces_st, noise_1_list, noise_5_list = update_feces_st(idx, H2S_raw_ppm, noise_1_list, noise_5_list, feces_st, bm)
-                if feces_st != 0:
-                    print("[GPIO] feces_st 감지: idx=%s -> feces_st=%s (이후 idx=%s,%s,%s에서 슬롯 1,2,3 촬영)", idx, feces_st, feces_st + CAPTURE_IDX_OFFSETS[0], feces_st + CAPTURE_IDX_OFFSETS[1], feces_st + CAPTURE_IDX_OFFSETS[2])
-                    time.sleep(0.5)
+            trace_flags = voltage_trace.FLAG_DETECTED if trace is not None and detected else 0
+            if detected:
+                print("[GPIO] feces_st 감지: idx=%s -> feces_st=%s (이후 idx=%s,%s,%s에서 슬롯 1,2,3 촬영)", idx, feces_st, feces_st + CAPTURE_IDX_OFFSETS[0], feces_st + CAPTURE_IDX_OFFSETS[1], feces_st + CAPTURE_IDX_OFFSETS[2])
+                time.sleep(0.5)
 
             # Feces 슬롯 1,2,3 촬영 시점 (idx == feces_st + CAPTURE_IDX_OFFSETS[0|1|2] 일 때, 기본 30/60/120)
             if capture_callback and feces_st != 0:
@@ -641,124 +1060,82 @@ def measure_sequence(gas_id, test_id, capture_callback=None, simulation=False, p
                         image_time_str = datetime.now().strftime("%Y%m%d%H%M%S")
                         log.info("[GPIO] 캡처 요청 slot=%s idx=%s (feces_st+offset=%s) image_time=%s", slot_one_based, idx, offset, image_time_str)
                         capture_callback(slot_one_based, data_file_name, image_time_str)
+                        if trace is not None:
+                            trace_flags |= voltage_trace.FLAG_CAPTURE
                         break
             elif idx == MEASURE_SEQUENCE_MAX_ITER:
-                if api_base and update_device_status is not None:
-                    try:
-                        update_device_status(api_base, gas_id, STATUS_FAIL)
-                        log.info("[GPIO] Device status 갱신: fail (캡처 시점 slot=%s)", slot_one_based)
-                    except Exception as e:
-                        log.warning("[GPIO] device status fail 전송 실패: %s", e)
-
-            end_time = time.time()
-            if idx == 0:
-                TIME.append(f"{end_time - start_time:.2f}")
-            else:
-                TIME.append(f"{float(TIME[idx - 1]) + end_time - start_time:.2f}")
+                if status_client is not None:
+                    status_client.set_status(STATUS_FAIL)
+                    log.info("[GPIO] Device status 갱신 요청: fail (idx=%s)", idx)
+
+            end_time = time.monotonic()
+            elapsed_total = pipeline.stamp(elapsed_total + end_time - start_time)
+            if trace is not None:
+                trace.append(idx, trace_flags, start_time, read_time, h2s_v, vocs_v, switch_v, end_time - start_time, elapsed_total)
+            if progress is not None:
+                remaining = pipeline.remaining_samples()
+                remaining_sec = remaining * MEASURE_LOOP_INTERVAL_SEC if remaining is not None else None
+                progress.publish(idx, feces_st, H2S_RAW_PPM, VOCs_RAW_PPM, remaining_sec)
 
             # 6) idx == feces_st + end_tr 시 종료
-            if feces_st != 0 and idx == feces_st + end_tr:
+            if pipeline.done():
                 log.info("[GPIO] 측정 루프 종료 조건: idx=%s feces_st=%s end_tr=%s", idx, feces_st, end_tr)
                 break
             idx += 1
 
             # 진행 로그: 초반(1,5,10) 및 10샘플마다 stderr 출력 (idx 60 이후에도 70,80,90... 계속 출력되도록 idx<=60 제거)
             if idx == 1 or idx == 5 or idx == 10:
-                log.info("[GPIO] 루프 진행 idx=%s feces_st=%s H2S=%.4f VOCs=%.4f (정상 동작 중)", idx, feces_st, H2S_raw_ppm[-1] if H2S_raw_ppm else 0, VOCs_raw_ppm[-1] if VOCs_raw_ppm else 0)
+                log.info("[GPIO] 루프 진행 idx=%s feces_st=%s H2S=%.4f VOCs=%.4f (정상 동작 중)", idx, feces_st, H2S_RAW_PPM, VOCs_RAW_PPM)
                 print(f"[gpio_controller] [GPIO] 가스 루프 진행 idx={idx} feces_st={feces_st} (정상)", file=sys.stderr)
             elif idx > 0 and idx % 10 == 0:
                 print(f"[gpio_controller] [GPIO] 가스 루프 진행 idx={idx} feces_st={feces_st}", file=sys.stderr)
-                log.info("[GPIO] 루프 진행 idx=%s feces_st=%s H2S=%.4f VOCs=%.4f", idx, feces_st, H2S_raw_ppm[-1] if H2S_raw_ppm else 0, VOCs_raw_ppm[-1] if VOCs_raw_ppm else 0)
+                log.info("[GPIO] 루프 진행 idx=%s feces_st=%s H2S=%.4f VOCs=%.4f", idx, feces_st, H2S_RAW_PPM, VOCs_RAW_PPM)
             elif idx > 0 and idx % 50 == 0:
-                log.info("[GPIO] 루프 진행 idx=%s feces_st=%s H2S_last=%.4f VOCs_last=%.4f", idx, feces_st, H2S_raw_ppm[-1] if H2S_raw_ppm else 0, VOCs_raw_ppm[-1] if VOCs_raw_ppm else 0)
+                log.info("[GPIO] 루프 진행 idx=%s feces_st=%s H2S_last=%.4f VOCs_last=%.4f", idx, feces_st, H2S_RAW_PPM, VOCs_RAW_PPM)
             elif idx > 0 and idx % 200 == 0:
                 log.debug("[GPIO] 루프 진행 idx=%s feces_st=%s", idx, feces_st)
 
             # 루프 주기: 1Hz(1초/샘플) 목표. elapsed 보정으로 매 iteration을 MEASURE_LOOP_INTERVAL_SEC(1초)에 맞춤.
             # (고정 time.sleep(1)은 처리시간+1초가 되어 주기가 늘어나므로 사용하지 않음. elapsed>1초면 sleep 없음 → 주기 초과 시 로그)
             if MEASURE_LOOP_INTERVAL_SEC > 0:
-                elapsed = time.time() - start_time
+                elapsed = time.monotonic() - start_time
                 sleep_sec = MEASURE_LOOP_INTERVAL_SEC - elapsed
                 if sleep_sec > 0:
-                    time.sleep(sleep_sec)
-                    if api_base and get_current_status is not None:
-                        try:
-                            if get_current_status(api_base, gas_id) == STATUS_STOP:
-                                stop_requested = True
-                                break
-                        except Exception:
-                            pass
+                    if stop_event.wait(sleep_sec):
+                        stop_requested = True
+                        break
                 elif idx > 0 and idx % 50 == 0:
                     print("[GPIO] 루프 주기 초과 idx=%s elapsed=%.2fs (API/캡처 지연 시 전체 측정 시간 증가)", idx, elapsed)
     finally:
+        if stop_watcher is not None:
+            stop_watcher.close()
+        if trace is not None:
+            trace.close()
+            log.info("[GPIO] 전압 trace 기록 %s (%s samples)", trace.path, trace.records)
         if pwm is not None:
             fan_stop(pwm)
             log.info("[GPIO] 팬 PWM 정지 완료")
-        log.info("[GPIO] 측정 루프 종료 idx=%s len(H2S_raw_ppm)=%s", idx, len(H2S_raw_ppm))
-        if stop_requested:
-            if api_base and update_device_status is not None:
-                try:
-                    update_device_status(api_base, gas_id, STATUS_READY)
-                    log.info("[GPIO] stop 종료 전 device status → ready (재실행 대기)")
-                    print("[gpio_controller] [GPIO] stop 종료 전 device status → ready (재실행 대기)", file=sys.stderr)
-                except Exception as e:
-                    log.warning("[GPIO] device status ready 전송 실패: %s", e)
-            sys.exit(0)
-
-    # 종료 후: 시프트·오프셋·trapz·비율 계산
-    if feces_st == 0 or feces_st < bm or feces_st + end_tr > len(H2S_raw_ppm):
-        log.warning("[GPIO] 측정 구간 무효 (feces_st=%s bm=%s len=%s) -> 시뮬 결과 반환", feces_st, bm, len(H2S_raw_ppm))
-        return measure_sequence_simulation()
-
-    # TIME과 H2S_raw_ppm 길이 불일치 시 (루프 중 예외 등) 시뮬 반환하여 list index out of range 방지
-    if len(TIME) != len(H2S_raw_ppm):
-        log.warning("[GPIO] TIME/H2S_raw_ppm 길이 불일치 (TIME=%s H2S=%s) -> 시뮬 결과 반환", len(TIME), len(H2S_raw_ppm))
-        return measure_sequence_simulation()
-
-    H2S_raw_ppm_shift, VOCs_raw_ppm_shift, Time_shift = [], [], []
-    for i in range(feces_st - bm, len(H2S_raw_ppm)):
-        H2S_raw_ppm_shift.append(H2S_raw_ppm[i])
-        VOCs_raw_ppm_shift.append(VOCs_raw_ppm[i])
-        Time_shift.append(f"{float(TIME[i]) - float(TIME[feces_st - bm]):.2f}")
-    log.debug("measure_sequence: shift range built shift_len=%s", len(H2S_raw_ppm_shift))
-
-    # 대용량 리스트 조기 해제 후 GC (ref MainCode 352~355행). 1~2GB RAM 환경 완화.
-    del H2S_raw_ppm, VOCs_raw_ppm, TIME, noise_1_list, noise_5_list
-    gc.collect()
-    time.sleep(0.1)
-
-    calc_result = compute_exposure(H2S_raw_ppm_shift, VOCs_raw_ppm_shift, [float(x) for x in Time_shift], bm)
+        log.info("[GPIO] 측정 루프 종료 idx=%s len(samples)=%s", idx, len(pipeline.samples))
+        if stop_requested and status_client is not None:
+            status_client.set_status(STATUS_READY)
+            log.info("[GPIO] stop 종료 전 device status → ready (재실행 대기)")
+            print("[gpio_controller] [GPIO] stop 종료 전 device status → ready (재실행 대기)", file=sys.stderr)
+        if own_status_client:
+            if not status_client.close(STATUS_FLUSH_TIMEOUT_SEC):
+                log.warning("[GPIO] device status 전송 미완료 (%.1fs 초과) → 생략하고 진행", STATUS_FLUSH_TIMEOUT_SEC)
+    if stop_requested:
+        raise MeasurementStopped(f"idx={idx}")
+
+    # 종료 후: 시프트·오프셋·trapz·비율 계산 (GasPipeline.finish)
+    result = pipeline.finish()
+    del pipeline
     gc.collect()
-    n = len(H2S_raw_ppm_shift)
-    last_h2s = H2S_raw_ppm_shift[-1] if n else 0.0
-    last_vocs = VOCs_raw_ppm_shift[-1] if n else 0.0
-    time_sec = float(Time_shift[-1]) if Time_shift else 0.0
-
-    # h2s_offset_ppm / vocs_offset_ppm: 베이스라인 기준값 (오프셋 시 빼는 raw[BM_time]). MainCode.py 364~365행 대응.
-    h2s_baseline = calc_result.get("h2s_baseline_ppm", 0.0)
-    vocs_baseline = calc_result.get("vocs_baseline_ppm", 0.0)
-
-    print("measure_sequence done: sort=%s time_sec=%.2f h2s_ppm=%.4f vocs_ppm=%.4f total_abs_exposure=%.4f",n, time_sec, last_h2s, last_vocs, calc_result["total_abs_exposure"])
+    if result is None:
+        log.warning("[GPIO] 측정 구간 무효 -> 시뮬 결과 반환")
+        return measure_sequence_simulation()
 
-    return {
-        "gas_version": "GV.1.1",
-        "h2s_abs_exposure": calc_result["h2s_abs_exposure"],
-        "h2s_offset_ppm": h2s_baseline,
-        "h2s_ppm": last_h2s,
-        "h2s_ratio_value_pct": calc_result["h2s_ratio_value_pct"],
-        "sort": n,
-        "success": "Y",
-        "time_sec": time_sec,
-        "total_abs_exposure": calc_result["total_abs_exposure"],
-        "vocs_abs_exposure": calc_result["vocs_abs_exposure"],
-        "vocs_offset_ppm": vocs_baseline,
-        "vocs_ppm": last_vocs,
-        "vocs_ratio_value_pct": calc_result["vocs_ratio_value_pct"],
-        "H2S_raw_ppm_shift": H2S_raw_ppm_shift,
-        "VOCs_raw_ppm_shift": VOCs_raw_ppm_shift,
-        "Time_shift": Time_shift,
-        "calc_result": calc_result,
-    }
+    print("measure_sequence done: sort=%s time_sec=%.2f h2s_ppm=%.4f vocs_ppm=%.4f total_abs_exposure=%.4f",result["sort"], result["time_sec"], result["h2s_ppm"], result["vocs_ppm"], result["total_abs_exposure"])
+    return result
 
 
 def measure_sequence_simulation():
@@ -798,7 +1175,7 @@ def measure_once():
     실제 하드웨어 연동 시 init_adc() + read_adc_voltages() → filter_voltage → voltage_to_ppm_* 사용.
     :return: dict - DB 스키마와 동일한 키 (gas_id, test_id 제외).
     """
-    adc = init_adc()
+    adc = get_adc()
     if adc is None:
         return measure_once_simulation()
 
@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+"""
+공용 HTTP 전송 계층 (표준 라이브러리 http.client 기반).
+- 호스트별 keep-alive 연결 풀: 한 측정 세션에서 같은 API 서버/이미지 서버로 수십 회 요청 → TCP/TLS 핸드셰이크 1회로 재사용.
+- SSL 컨텍스트 캐시: 요청마다 ssl.create_default_context() 생성하지 않음.
+- 엔드포인트별 timeout: timeout_for("device_status") 등. 환경변수 HTTP_TIMEOUT_<ENDPOINT>_SEC 로 오버라이드.
+- device_status_api / main / camera_controller / utils 의 API 호출은 모두 request() 사용.
+- 이미지 업로드는 MultipartFileBody 로 파일을 청크 단위 스트리밍 (파일 전체를 메모리에 올리지 않음).
+"""
+import os
+import json
+import ssl
+import threading
+import http.client
+import urllib.parse
+
+# 호스트별 유휴(keep-alive) 연결 최대 보관 수
+HTTP_POOL_MAXSIZE = int(os.environ.get("HTTP_POOL_MAXSIZE", "4"))
+
+# 파일 스트리밍 업로드 청크 크기(bytes). 업로드 1건의 최대 메모리 사용량 ≈ 이 값.
+HTTP_UPLOAD_CHUNK_SIZE = int(os.environ.get("HTTP_UPLOAD_CHUNK_SIZE", str(64 * 1024)))
+
+# 엔드포인트별 기본 timeout(초). 기존 호출부의 timeout 값과 동일.
+_DEFAULT_TIMEOUTS = {
+    "device_status": 10.0,
+    "measurement": 15.0,
+    "image_analysis": 15.0,
+    "image_upload": 30.0,
+    "image_result": 30.0,
+    "default": 15.0,
+}
+HTTP_TIMEOUTS = {
+    name: float(os.environ.get(f"HTTP_TIMEOUT_{name.upper()}_SEC", str(sec)))
+    for name, sec in _DEFAULT_TIMEOUTS.items()
+}
+
+# keep-alive 연결이 서버 측에서 끊겼을 때 나는 예외 (재사용 연결이면 새 연결로 1회 재시도)
+_STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.BadStatusLine,
+    BrokenPipeError,
+    ConnectionResetError,
+    ConnectionAbortedError,
+)
+
+
+def timeout_for(endpoint):
+    """엔드포인트 이름 → timeout(초). 미등록 이름은 default."""
+    return HTTP_TIMEOUTS.get(endpoint, HTTP_TIMEOUTS["default"])
+
+
+_ssl_contexts = {}
+_ssl_lock = threading.Lock()
+
+
+def _ssl_context(verify_tls):
+    """verify_tls 별로 1개씩 생성해 재사용. verify_tls=False 는 기존 API 호출부와 동일하게 인증서 검증 생략."""
+    with _ssl_lock:
+        ctx = _ssl_contexts.get(verify_tls)
+        if ctx is None:
+            ctx = ssl.create_default_context()
+            if not verify_tls:
+                ctx.check_hostname = False
+                ctx.verify_mode = ssl.CERT_NONE
+            _ssl_contexts[verify_tls] = ctx
+        return ctx
+
+
+class Response:
+    """응답 (본문은 모두 읽은 상태, 연결은 풀에 반납됨)."""
+
+    __slots__ = ("status", "headers", "body")
+
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    @property
+    def text(self):
+        return self.body.decode("utf-8", errors="replace")
+
+    def json(self):
+        """JSON 본문 파싱. 본문이 비어 있으면 None. 형식 오류 시 ValueError."""
+        if not self.body:
+            return None
+        return json.loads(self.body.decode())
+
+
+class _ConnectionPool:
+    """(scheme, host, port, verify_tls) 별 유휴 연결 보관. 스레드 안전."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key, timeout):
+        """:return: (connection, reused: bool)"""
+        with self._lock:
+            idle = self._idle.get(key)
+            conn = idle.pop() if idle else None
+        if conn is not None:
+            conn.timeout = timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(timeout)
+            return conn, True
+        scheme, host, port, verify_tls = key
+        if scheme == "https":
+            conn = http.client.HTTPSConnection(host, port, timeout=timeout, context=_ssl_context(verify_tls))
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=timeout)
+        return conn, False
+
+    def release(self, key, conn):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.maxsize:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def clear(self):
+        with self._lock:
+            conns = [c for idle in self._idle.values() for c in idle]
+            self._idle.clear()
+        for c in conns:
+            try:
+                c.close()
+            except Exception:
+                pass
+
+
+_pool = _ConnectionPool(HTTP_POOL_MAXSIZE)
+
+
+def _replayable(body):
+    """재시도 시 같은 본문을 다시 보낼 수 있는지 (bytes 또는 재순회 가능한 iterable)."""
+    if body is None or isinstance(body, (bytes, bytearray, memoryview, str)):
+        return True
+    try:
+        return iter(body) is not body
+    except TypeError:
+        return False
+
+
+def request(method, url, body=None, headers=None, timeout=None, endpoint="default", verify_tls=False):
+    """
+    HTTP 요청 1회 (풀 연결 재사용).
+    :param body: bytes 또는 bytes 청크 iterable (iterable 이면 headers 에 Content-Length 지정)
+    :param timeout: 초. None 이면 timeout_for(endpoint)
+    :param verify_tls: https 인증서 검증 여부 (기본 False, 기존 API 호출부와 동일)
+    :return: Response — 4xx/5xx 도 예외 없이 Response 로 반환 (status 로 판단)
+    :raises OSError, http.client.HTTPException: 연결/전송 실패
+    """
+    parts = urllib.parse.urlsplit(url)
+    scheme = (parts.scheme or "http").lower()
+    if scheme not in ("http", "https") or not parts.hostname:
+        raise ValueError(f"지원하지 않는 URL: {url}")
+    port = parts.port or (443 if scheme == "https" else 80)
+    key = (scheme, parts.hostname, port, bool(verify_tls))
+    target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+    if timeout is None:
+        timeout = timeout_for(endpoint)
+    hdrs = {"Connection": "keep-alive"}
+    if headers:
+        hdrs.update(headers)
+
+    conn, reused = _pool.acquire(key, timeout)
+    try:
+        try:
+            conn.request(method, target, body=body, headers=hdrs)
+            resp = conn.getresponse()
+        except _STALE_CONNECTION_ERRORS:
+            # 서버가 유휴 연결을 닫은 경우: 새 연결로 1회 재시도
+            conn.close()
+            if not reused or not _replayable(body):
+                raise
+            conn, reused = _pool.acquire(key, timeout)
+            while reused:
+                conn.close()
+                conn, reused = _pool.acquire(key, timeout)
+            conn.request(method, target, body=body, headers=hdrs)
+            resp = conn.getresponse()
+        data = resp.read()
+    except (OSError, http.client.HTTPException):
+        conn.close()
+        raise
+    if resp.will_close:
+        conn.close()
+    else:
+        _pool.release(key, conn)
+    return Response(resp.status, resp.getheaders(), data)
+
+
+def request_json(method, url, payload=None, timeout=None, endpoint="default", verify_tls=False, headers=None):
+    """
+    JSON 요청/응답 헬퍼.
+    :param payload: dict 등 (json.dumps) 또는 이미 인코딩된 bytes
+    :return: (status, parsed_json_or_None). 2xx 는 JSON 파싱 실패 시 ValueError, 그 외는 파싱 실패 시 None.
+    """
+    body = payload if payload is None or isinstance(payload, (bytes, bytearray)) else json.dumps(payload).encode("utf-8")
+    hdrs = {"Content-Type": "application/json"}
+    if headers:
+        hdrs.update(headers)
+    resp = request(method, url, body=body, headers=hdrs, timeout=timeout, endpoint=endpoint, verify_tls=verify_tls)
+    if 200 <= resp.status < 300:
+        return resp.status, resp.json()
+    try:
+        return resp.status, resp.json()
+    except ValueError:
+        return resp.status, None
+
+
+class MultipartFileBody:
+    """
+    multipart/form-data 1파일 스트리밍 본문 (ref/servlet.py: 'file' 키 수신, boundary 는 요청마다 난수).
+    - 헤더 → 파일 청크(chunk_size, 버퍼 1개 재사용) → trailer 순으로 순회. 파일 전체를 메모리에 올리지 않음.
+    - content_length: 생성 시 파일 크기로 미리 계산 → Content-Length 헤더에 사용.
+    - 순회할 때마다 파일을 처음부터 다시 읽음 → request() 의 stale 연결 재시도 가능.
+    - 순회 중 파일 크기가 바뀌면 OSError (Content-Length 불일치 전송 방지).
+    - fields: 파일 앞에 붙일 텍스트 필드 dict (예: 선명도 점수 메타데이터).
+    """
+
+    def __init__(self, path, filename=None, field_name="file", content_type="image/jpeg", chunk_size=None,
+                 fields=None):
+        self.path = path
+        self.chunk_size = chunk_size or HTTP_UPLOAD_CHUNK_SIZE
+        filename = filename or os.path.basename(path)
+        boundary = "----WebKitFormBoundary" + os.urandom(16).hex()
+        text_parts = "".join(
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+            f"{value}\r\n"
+            for name, value in (fields or {}).items()
+        )
+        self._head = (
+            text_parts +
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="{field_name}"; filename="{filename}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n"
+        ).encode("utf-8")
+        self._tail = f"\r\n--{boundary}--\r\n".encode("utf-8")
+        self.file_size = os.path.getsize(path)
+        self.content_length = len(self._head) + self.file_size + len(self._tail)
+        self.content_type = f"multipart/form-data; boundary={boundary}"
+
+    def headers(self):
+        return {"Content-Type": self.content_type, "Content-Length": str(self.content_length)}
+
+    def __iter__(self):
+        yield self._head
+        buf = bytearray(self.chunk_size)
+        view = memoryview(buf)
+        remaining = self.file_size
+        with open(self.path, "rb", buffering=0) as f:
+            while remaining > 0:
+                n = f.readinto(view[:min(self.chunk_size, remaining)])
+                if not n:
+                    raise OSError(f"업로드 중 파일 크기 변경: {self.path}")
+                remaining -= n
+                # 소비자(http.client sendall)는 다음 청크 요청 전에 전송을 마치므로 버퍼 재사용 가능
+                yield view[:n]
+            if f.read(1):
+                raise OSError(f"업로드 중 파일 크기 변경: {self.path}")
+        yield self._tail
+
+
+def close_all():
+    """풀의 유휴 연결 모두 닫기 (프로세스 종료/네트워크 전환 시)."""
+    _pool.clear()
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+main.py 콜드 스타트 import 예산 검사 (시뮬레이션 모드 기준).
+- `python -X importtime -c "import main"` 을 새 프로세스로 RUNS 회 실행, main 누적 import 시간(최소값)을 예산과 비교.
+- 하드웨어/무거운 모듈(numpy, PIL, board, adafruit_ssd1306, RPi.GPIO 등)이 import 시점에 로드되면 실패 (첫 사용 시 로드해야 함).
+- 예산 초과 또는 금지 모듈 로드 시 exit 1 → CI/배포 전 검사용.
+
+사용:
+  python import_budget.py                 # 기본 예산 IMPORT_BUDGET_MS (ms)
+  python import_budget.py --budget-ms 120 --runs 7
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+# main 누적 import 시간 예산(ms). 라즈베리파이 4 기준 여유 포함. 개발 PC 에서는 --budget-ms 로 낮춰 사용.
+IMPORT_BUDGET_MS = float(os.environ.get("IMPORT_BUDGET_MS", "250"))
+IMPORT_BUDGET_RUNS = int(os.environ.get("IMPORT_BUDGET_RUNS", "5"))
+
+# import main 만으로 로드되면 안 되는 모듈 (실측 경로/첫 사용 시 지연 import)
+LAZY_MODULES = (
+    "numpy",
+    "PIL",
+    "board",
+    "digitalio",
+    "adafruit_ssd1306",
+    "RPi",
+    "picamera2",
+    "display_function",
+    "concurrent.futures",
+)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _child_env():
+    env = dict(os.environ)
+    env["GPIO_SIMULATION"] = "1"
+    env.pop("PYTHONPROFILEIMPORTTIME", None)
+    return env
+
+
+def measure_import_ms(module="main"):
+    """
+    새 프로세스에서 -X importtime 으로 module import 1회.
+    :return: (누적 ms, [(누적 ms, 이름)] module 직속 하위 import 목록)
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=HERE, env=_child_env(), capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} 실패:\n{proc.stderr[-2000:]}")
+    total_us = None
+    children = []
+    # 형식: "import time: self [us] | cumulative | <들여쓰기>name" (하위 모듈이 부모보다 먼저 출력됨)
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line.split("|")
+        try:
+            cumulative = int(parts[1])
+        except ValueError:
+            continue
+        name = parts[2]
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        name = name.strip()
+        if depth == 1:
+            children.append((cumulative / 1000.0, name))
+        elif depth == 0:
+            if name == module:
+                total_us = cumulative
+                break
+            children = []
+    if total_us is None:
+        raise RuntimeError(f"importtime 출력에서 {module} 을 찾지 못함")
+    return total_us / 1000.0, sorted(children, reverse=True)
+
+
+def eager_lazy_modules(module="main"):
+    """import module 후 sys.modules 에 올라온 LAZY_MODULES 목록."""
+    code = f"import sys, json, {module}; print(json.dumps(sorted(sys.modules)))"
+    proc = subprocess.run([sys.executable, "-c", code], cwd=HERE, env=_child_env(), capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} 실패:\n{proc.stderr[-2000:]}")
+    loaded = set(json.loads(proc.stdout.strip().splitlines()[-1]))
+    return [m for m in LAZY_MODULES if m in loaded]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="main.py import 시간 예산 검사 (-X importtime)")
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=IMPORT_BUDGET_RUNS)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--top", type=int, default=8, help="느린 직속 import 출력 개수")
+    args = parser.parse_args(argv)
+
+    samples = [measure_import_ms(args.module) for _ in range(max(1, args.runs))]
+    best_ms, children = min(samples, key=lambda s: s[0])
+    print(f"[import_budget] import {args.module}: 최소 {best_ms:.1f}ms / 예산 {args.budget_ms:.1f}ms "
+          f"(runs={len(samples)}, 전체 {', '.join(f'{s[0]:.1f}' for s in samples)})")
+    for ms, name in children[:args.top]:
+        print(f"[import_budget]   {ms:8.1f}ms  {name}")
+
+    ok = True
+    eager = eager_lazy_modules(args.module)
+    if eager:
+        ok = False
+        print(f"[import_budget] 실패: import 시점에 로드된 지연 대상 모듈 {eager}", file=sys.stderr)
+    if best_ms > args.budget_ms:
+        ok = False
+        print(f"[import_budget] 실패: 예산 초과 {best_ms:.1f}ms > {args.budget_ms:.1f}ms", file=sys.stderr)
+    if ok:
+        print("[import_budget] OK")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,13 +4,21 @@ gpio_controller 진입점.
 - MQTT command/start(measurement/start) 수신 시 1회 실행 (스위치 대체).
 - 실측: 명령어 1회 수신 시, 레거시와 동일 처리 순서(ADC→filter→PPM append→smooth_peak→update_feces_st→종료 후 시프트·trapz)로 1회 실행. NoFeces(0) 1장 → 가스 루프 → Feces 1,2,3 촬영 → 슬롯 1,2,3만 저장·전송 → measurement API 1회.
 - 시뮬레이션: 더미 가스 + 더미 이미지 분석 후 API 1회.
+- 실행 방식: 원샷(기본, 환경변수 MQTT_PAYLOAD) 또는 데몬(--serve, JSON-lines 명령으로 세션 반복, SessionService 참고).
 
-Sleep: time.sleep(1)은 실측 경로(else 블록)에만 있음(팬 안정화, 디스플레이, 0번 촬영 후 각 1초). 시뮬레이션 경로에는 sleep 없어 즉시 진행됨.
+Sleep: 실측 경로(else 블록)의 0번 촬영 후 대기만 남음 (카메라 백엔드 settle_sec: libcamera-still 3초, picamera2 warm 세션 0). 디스플레이는 DisplayManager 가 동기 전송하므로 갱신 대기 없음. 시뮬레이션 경로에는 sleep 없어 즉시 진행됨.
+전송: measurement / image_analysis payload 와 업로드 실패 이미지는 outbox(SQLite)에 먼저 기록 후 drainer 스레드가 전송.
+      run_session 은 등록 즉시 반환, device status completed 는 measurement 전송 완료 시 drainer 가 갱신 (Outbox.on_sent).
+      원샷 모드는 종료 전 OUTBOX_FLUSH_TIMEOUT_SEC 까지 전송 대기, 못 보내면 outbox 에 남기고 종료 → 다음 실행 시 이어서 전송.
 API payload: process_sensor_data가 gas_controller 반환값에서 스키마 필드(h2s_offset_ppm, time_sec, vocs_offset_ppm 등)를 그대로 복사. created_at은 전송 직전 main에서 설정. DB에 안 들어가면 API 서버 측 INSERT/매핑 확인 필요.
 """
+import importlib
+import io
 import os
+import queue
 import signal
 import sys
+import threading
 import logging
 
 # 한글 로그 깨짐 방지: stdout/stderr를 UTF-8로 고정 (subprocess/터미널 수신 시 인코딩 일치)
@@ -46,50 +54,122 @@ import json
 import random
 import time
 import gc
-import urllib.request
-import urllib.error
-import ssl
 import re
 from datetime import datetime
 
 import config
+import http_client
+from outbox import (
+    get_outbox,
+    KIND_MEASUREMENT,
+    KIND_IMAGE_ANALYSIS,
+    KIND_IMAGE,
+    OUTBOX_FLUSH_TIMEOUT_SEC,
+    is_retryable,
+)
 from gas_controller import (
-    measure_once as gas_measure_once,
-    measure_once_simulation,
+    MeasurementStopped,
+    MeasurementProgress,
+    get_adc,
     measure_sequence,
     measure_sequence_simulation,
-    fan_start,
     cleanup_gpio as gas_cleanup_gpio,
 )
 from camera_controller import (
     capture_once as camera_capture_once,
     capture_at_slot,
-    upload_captured_slots,
+    CaptureWorker,
+    UploadWorker,
     upload_image_to_server,
-    get_dummy_image_analysis,
+    upload_fields,
+    image_signature,
     fetch_image_analysis_result,
     build_image_analysis_table_payload_for_api,
 )
+from camera_backend import get_camera, close_camera, probe_camera
+from retention import get_retention
 from utils import process_sensor_data, Camera_LED, cleanup_all_led_gpio
-from schema import MEASUREMENT_KEYS
-try:
-    from display_function import SSD1306_DISPLAY, Reset_Display
-except ImportError:
-    def _noop_display(*args, **kwargs):
-        pass
-    SSD1306_DISPLAY = Reset_Display = _noop_display
 from device_status_api import (
-    ensure_ready_then_set,
     update_device_status,
-    STATUS_DETECTING,
-    STATUS_MEASURING,
     STATUS_COMPLETED,
     STATUS_READY,
+    StopWatcher,
+    set_status_extra,
 )
 
+# display_function 은 board/digitalio/PIL/adafruit_ssd1306 을 import 하므로 실측 경로 첫 표시 때 로드
+_display_funcs = None
+
+
+def _noop_display(*args, **kwargs):
+    pass
+
+
+def _display_functions():
+    """(SSD1306_DISPLAY, Reset_Display) 지연 import. 모듈/하드웨어 없으면 no-op."""
+    global _display_funcs
+    if _display_funcs is None:
+        try:
+            from display_function import SSD1306_DISPLAY as show, Reset_Display as reset
+        except ImportError:
+            show = reset = _noop_display
+        _display_funcs = (show, reset)
+    return _display_funcs
+
+
+def _start_progress_display(progress, title):
+    """OLED 측정 진행 화면 스레드 시작. 디스플레이 모듈/하드웨어 없으면 None."""
+    try:
+        from display_function import ProgressDisplay
+        return ProgressDisplay(progress, title).start()
+    except Exception as e:
+        print(f"[gpio_controller] 진행 화면 사용 안 함: {e}", file=sys.stderr)
+        return None
+
+
+def SSD1306_DISPLAY(*args, **kwargs):
+    return _display_functions()[0](*args, **kwargs)
+
+
+def Reset_Display(*args, **kwargs):
+    return _display_functions()[1](*args, **kwargs)
+
+
 # Ctrl+C(SIGINT) 시 device status를 ready로 복구한 뒤 종료하기 위한 값 (main()에서 설정)
 _exit_api_base = None
 _exit_gas_id = None
+# 세션 측정 중 (measurement outbox 등록 전까지). 이전 세션 measurement 가 늦게 전송돼도 진행 중 상태를 completed 로 덮지 않게
+_measuring = threading.Event()
+
+
+def _on_measurement_sent(key, payload):
+    """outbox drainer: measurement 전송 완료(2xx) 시 device status completed 갱신."""
+    if _measuring.is_set():
+        print(f"[gpio_controller] {key} 전송 완료, 다음 세션 측정 중 → device status completed 생략", file=sys.stderr)
+        return
+    code, _ = update_device_status(config.DATA_API_URL, (payload or {}).get("gas_id"), STATUS_COMPLETED)
+    if code is not None:
+        print(f"[SCENARIO] 8. Device status 갱신: completed ({key})", file=sys.stderr)
+
+
+def _start_outbox():
+    """공용 outbox drainer 시작 + measurement 전송 완료 hook 등록. :return: Outbox"""
+    outbox = get_outbox().start()
+    outbox.on_sent(KIND_MEASUREMENT, _on_measurement_sent)
+    return outbox
+
+
+def _flush_outbox(timeout=OUTBOX_FLUSH_TIMEOUT_SEC):
+    """원샷 모드 종료 전: drainer 가 대기 항목을 보낼 시간을 최대 timeout 초 줌 (못 보낸 항목은 다음 실행에서 재전송)."""
+    if not config.DATA_API_URL:
+        return
+    try:
+        outbox = get_outbox()
+        if not outbox.wait(None, timeout):
+            print(f"[gpio_controller] outbox 전송 대기 {timeout}s 초과 → 미전송 {outbox.pending_count()}건 보관 (다음 실행 시 재전송)",
+                  file=sys.stderr)
+    except Exception as e:
+        print(f"[gpio_controller] outbox 전송 대기 실패(무시): {e}", file=sys.stderr)
 
 
 def _sigint_handler(signum, frame):
@@ -130,6 +210,12 @@ def merge_measurement_with_image_analysis(record, camera_data):
         out["image_analysis"] = camera_data["image_analysis"]
     if camera_data.get("result_url"):
         out["image_result_url"] = camera_data["result_url"]
+    # 슬롯별 촬영 지연 (CaptureWorker 결과: 요청 시각 대비 실제 촬영 완료까지)
+    if camera_data.get("capture_latency"):
+        out["capture_latency"] = camera_data["capture_latency"]
+    # 슬롯 1~3 의 슬롯 0(NoFeces) 대비 유사도 (변화 없음 → 오탐 feces_st 의심)
+    if camera_data.get("slot_similarity"):
+        out["slot_similarity"] = camera_data["slot_similarity"]
     return out
 
 
@@ -161,19 +247,12 @@ def send_pending_json_from_folder(json_dir, api_base_url, remove_on_success=True
         except OSError:
             results.append((fn, None))
             continue
-        req = urllib.request.Request(url, data=body.encode("utf-8"), method="POST", headers=headers)
-        ctx = ssl.create_default_context()
-        if url.startswith("https://"):
-            ctx.check_hostname = False
-            ctx.verify_mode = ssl.CERT_NONE
         try:
-            with urllib.request.urlopen(req, timeout=15, context=ctx) as resp:
-                status = resp.status
-                results.append((fn, status))
-                if status in (200, 201) and remove_on_success:
-                    os.remove(file_path)
-        except urllib.error.HTTPError as e:
-            results.append((fn, e.code))
+            resp = http_client.request("POST", url, body=body.encode("utf-8"), headers=headers, endpoint="measurement")
+            status = resp.status
+            results.append((fn, status))
+            if status in (200, 201) and remove_on_success:
+                os.remove(file_path)
         except Exception:
             results.append((fn, None))
     return results
@@ -182,52 +261,81 @@ def send_pending_json_from_folder(json_dir, api_base_url, remove_on_success=True
 def post_measurement(api_base_url, payload):
     path = getattr(config, "DATA_API_MEASUREMENT_PATH", "/mqtt/api/v1/measurement")
     url = f"{api_base_url.rstrip('/')}{path}"
-    body = json.dumps(payload).encode("utf-8")
-    req = urllib.request.Request(
-        url,
-        data=body,
-        method="POST",
-        headers={"Content-Type": "application/json"},
-    )
-    ctx = ssl.create_default_context()
-    if url.startswith("https://"):
-        ctx.check_hostname = False
-        ctx.verify_mode = ssl.CERT_NONE
     try:
-        with urllib.request.urlopen(req, timeout=15, context=ctx) as resp:
-            return resp.status, json.loads(resp.read().decode())
-    except urllib.error.HTTPError as e:
-        # 404 발생 지점: 위 url 로 POST 했을 때 서버가 404 반환 (경로/호스트 확인)
-        print(f"[gpio_controller] API 404 요청 URL: {url}", file=sys.stderr)
-        return e.code, None
+        status, data = http_client.request_json("POST", url, payload, endpoint="measurement")
     except Exception as e:
         raise RuntimeError(f"API 요청 실패: {e}") from e
+    if status >= 400:
+        # 404 발생 지점: 위 url 로 POST 했을 때 서버가 404 반환 (경로/호스트 확인)
+        print(f"[gpio_controller] API 404 요청 URL: {url}", file=sys.stderr)
+        return status, None
+    return status, data
 
 
 def post_image_analysis(api_base_url, payload):
     """이미지 분석 결과를 /mqtt/api/v1/image_analysis API로 POST (image_analysis_table 스키마 포맷)."""
     path = getattr(config, "DATA_API_IMAGE_ANALYSIS_PATH", "/mqtt/api/v1/image_analysis")
     url = f"{api_base_url.rstrip('/')}{path}"
-    body = json.dumps(payload).encode("utf-8")
-    req = urllib.request.Request(
-        url,
-        data=body,
-        method="POST",
-        headers={"Content-Type": "application/json"},
-    )
-    ctx = ssl.create_default_context()
-    if url.startswith("https://"):
-        ctx.check_hostname = False
-        ctx.verify_mode = ssl.CERT_NONE
     try:
-        with urllib.request.urlopen(req, timeout=15, context=ctx) as resp:
-            return resp.status, json.loads(resp.read().decode())
-    except urllib.error.HTTPError as e:
-        print(f"[gpio_controller] image_analysis API 오류 URL: {url} status: {e.code}", file=sys.stderr)
-        return e.code, None
+        status, data = http_client.request_json("POST", url, payload, endpoint="image_analysis")
     except Exception as e:
         print(f"[gpio_controller] image_analysis API 요청 실패: {e}", file=sys.stderr)
         return None, None
+    if status >= 400:
+        print(f"[gpio_controller] image_analysis API 오류 URL: {url} status: {status}", file=sys.stderr)
+        return status, None
+    return status, data
+
+
+def enqueue_measurement(outbox, api_base_url, payload, key):
+    """measurement payload 를 outbox 에 기록 (전송은 drainer). :return: key"""
+    path = getattr(config, "DATA_API_MEASUREMENT_PATH", "/mqtt/api/v1/measurement")
+    return outbox.enqueue(KIND_MEASUREMENT, f"{api_base_url.rstrip('/')}{path}", payload, key=key)
+
+
+def enqueue_image_analysis(outbox, api_base_url, payload, key):
+    """image_analysis payload 를 outbox 에 기록 (전송은 drainer). :return: key"""
+    path = getattr(config, "DATA_API_IMAGE_ANALYSIS_PATH", "/mqtt/api/v1/image_analysis")
+    return outbox.enqueue(KIND_IMAGE_ANALYSIS, f"{api_base_url.rstrip('/')}{path}", payload, key=key)
+
+
+def upload_slot_images(slots, image_times, data_file_name, base, outbox=None, fields_by_slot=None):
+    """
+    슬롯 이미지를 IMAGE_UPLOAD_URL 로 업로드. 최대 config.UPLOAD_CONCURRENCY 개 동시 전송.
+    - 재시도 대상 실패(네트워크 오류, 5xx, 408, 429 — outbox.is_retryable)는 SD spool 로 옮겨 outbox 에 넘겨 이후 재전송.
+    - fields_by_slot: {slot: 추가 multipart 필드} (burst 선명도 점수 등)
+    :return: upload_results - [(slot, ok, filename, resp)] (slots 순서 유지)
+    """
+    def _upload(slot):
+        if slot >= len(image_times):
+            print(f"[gpio_controller] [업로드] 슬롯 {slot} 건너뜀: image_times 미존재 (가스 루프에서 capture_callback 미호출 가능성)", file=sys.stderr)
+            return (slot, False, None, "image_times 미존재")
+        image_time_str = image_times[slot]
+        filename = f"{data_file_name}-{image_time_str}-{slot}.jpg"
+        path = os.path.join(base, filename)
+        if not os.path.isfile(path):
+            print(f"[gpio_controller] [업로드] 슬롯 {slot} 건너뜀: 파일 없음 path={path}", file=sys.stderr)
+            return (slot, False, filename, "파일 없음")
+        fields = (fields_by_slot or {}).get(slot) or None
+        ok, resp, status = upload_image_to_server(path, filename, fields=fields)
+        if ok and status == 200:
+            print(f"[gpio_controller] [업로드] HONG_URL(IMAGE_UPLOAD_URL) 전송 성공 (status=200) 슬롯={slot} filename={filename}", file=sys.stderr)
+        elif outbox is not None and is_retryable(status):
+            # 재시도 대상 실패: staging 정리(discard_session) 전에 SD spool 로 옮기고 outbox 에 넘겨 이후 재전송 (전송 후 파일 삭제)
+            spool_path = get_retention().retain(path)
+            outbox.enqueue(KIND_IMAGE, config.IMAGE_UPLOAD_URL.rstrip("/"),
+                           {"filename": filename, "fields": fields, "remove_file": True},
+                           file_path=spool_path, key=f"{KIND_IMAGE}:{filename}")
+            print(f"[gpio_controller] [업로드] 슬롯 {slot} 전송 실패 status={status} → outbox 등록 (재전송 대기)", file=sys.stderr)
+        print(f"[gpio_controller] [업로드] 슬롯 {slot} filename={filename} ok={ok}", file=sys.stderr)
+        return (slot, ok, filename, resp)
+
+    workers = min(config.UPLOAD_CONCURRENCY, len(slots))
+    if workers <= 1:
+        return [_upload(slot) for slot in slots]
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="upload") as pool:
+        return list(pool.map(_upload, slots))
 
 
 def normalize_gas_id(device_id):
@@ -274,13 +382,18 @@ def generate_random_sensor_record():
     }
 
 
-def main():
-    device_id = os.environ.get("DEVICE_ID", "FFFFF")
-    payload_str = os.environ.get("MQTT_PAYLOAD", "{}")
-    try:
-        mqtt_payload = json.loads(payload_str)
-    except json.JSONDecodeError:
-        mqtt_payload = {}
+def run_session(mqtt_payload, device_id=None, stop_event=None):
+    """
+    측정 세션 1회 (원샷 main() / --serve 데몬 공용).
+    :param mqtt_payload: start 명령 payload dict (profile_id, gas_id, test_id, simulation, file_done)
+    :param device_id: payload 에 gas_id 가 없을 때 사용 (기본 환경변수 DEVICE_ID)
+    :param stop_event: threading.Event — 데몬 stop 메시지로 set. None 이면 measure_sequence 가 device status API 폴링.
+    :return: 0 성공 (outbox 사용 시 measurement 등록 완료, 전송은 drainer) / 1 직접 전송 실패
+    :raises MeasurementStopped: stop 으로 측정 중단 (device status 는 ready 로 복구됨)
+    """
+    if device_id is None:
+        device_id = os.environ.get("DEVICE_ID", "FFFFF")
+    mqtt_payload = mqtt_payload or {}
 
     # 시뮬레이션 모드: 환경변수 GPIO_SIMULATION 또는 payload 의 simulation/test 플래그
     use_simulation = os.environ.get("GPIO_SIMULATION", "").lower() in ("1", "true", "yes")
@@ -302,14 +415,14 @@ def main():
     global _exit_api_base, _exit_gas_id
     _exit_api_base = api_base
     _exit_gas_id = gas_id
-    try:
-        signal.signal(signal.SIGINT, _sigint_handler)
-    except (ValueError, OSError):
-        pass
-    try:
-        signal.signal(signal.SIGTERM, _sigint_handler)
-    except (ValueError, OSError):
-        pass
+    # outbox drainer: 이전 실행에서 못 보낸 항목을 측정 중 백그라운드로 전송
+    outbox = None
+    if api_base:
+        try:
+            outbox = _start_outbox()
+        except Exception as e:
+            print(f"[gpio_controller] outbox 초기화 실패(직접 전송으로 진행): {e}", file=sys.stderr)
+    _measuring.set()
     print(f"[SCENARIO] 6. gpio_controller: PWM fan → gas_controller + camera_controller (레거시 순서) | simulation={use_simulation}", file=sys.stderr)
     # 디바이스 상태: gas_controller 내부에서 detecting/measuring 갱신 (idx>BM_TIME, idx>=20)
     # if api_base:
@@ -341,18 +454,31 @@ def main():
         # 시뮬: image_analysis_table 스키마 포맷 더미를 /mqtt/api/v1/image_analysis 로 전송 (7번: camera 데이터 API, 1회만 호출)
         if api_base:
             try:
-                print("[gpio_controller] post_image_analysis 호출 (시뮬 1회)", file=sys.stderr)
                 ia_payload = build_image_analysis_table_payload_for_api(gas_id, test_id)
-                status_ia, _ = post_image_analysis(api_base, ia_payload)
-                if status_ia in (200, 201):
-                    print("[SCENARIO] 7. image_analysis API 전송 완료 (camera 데이터)", file=sys.stderr)
+                if outbox is not None:
+                    print("[gpio_controller] image_analysis outbox 등록 (시뮬 1회)", file=sys.stderr)
+                    enqueue_image_analysis(outbox, api_base, ia_payload,
+                                           key=f"{KIND_IMAGE_ANALYSIS}:{gas_id}{test_id}:{ia_payload['input_datetime']}")
+                else:
+                    print("[gpio_controller] post_image_analysis 호출 (시뮬 1회)", file=sys.stderr)
+                    status_ia, _ = post_image_analysis(api_base, ia_payload)
+                    if status_ia in (200, 201):
+                        print("[SCENARIO] 7. image_analysis API 전송 완료 (camera 데이터)", file=sys.stderr)
             except Exception as e:
                 print(f"[gpio_controller] image_analysis API 전송 실패: {e}", file=sys.stderr)
     
     # 여기서부터 실제 구동(프로덕션 모드)
     else:
         data_file_name = f"{gas_id}{test_id}"
-        cwd = getattr(config, "GPIO_CONTROLLER_DIR", os.path.dirname(os.path.abspath(__file__)))
+        # 세션 전 카메라 상태 확인 (촬영 없이 열거, 캐시) → 이상 시 경고만 하고 측정은 진행 (가스 데이터는 유효)
+        _enable_camera_status()
+        cam = probe_camera()
+        if not cam["ok"]:
+            print(f"[gpio_controller] 카메라 상태 이상({cam['error']}) → 촬영 실패 가능", file=sys.stderr)
+
+        # 촬영 파일은 tmpfs staging 에서 처리 (SD 쓰기 없음). 재전송 필요한 것만 spool 로, 나머지는 세션 종료 시 삭제
+        retention = get_retention()
+        cwd = retention.staging_dir
 
         # 팬 제어: gas_controller.measure_sequence 내부에서 idx==0 시 fan_stop 후 ADC 진입 시 fan_start, idx>=20 시 fan_stop
         # print("[gpio_controller] [GPIO] 팬 PWM 시작 시도", file=sys.stderr)
@@ -364,28 +490,65 @@ def main():
             SSD1306_DISPLAY(gas_id, test_id)
         except Exception as e:
             print(f"[gpio_controller] SSD1306_DISPLAY 오류(무시): {e}", file=sys.stderr)
-        time.sleep(1)  # 디스플레이 갱신 대기
 
         file_done = mqtt_payload.get("file_done", False) in (True, 1, "1", "true", "yes")
         Camera_LED("OFF" if file_done else "ON")
 
         image_time_0 = datetime.now().strftime("%Y%m%d%H%M%S")
         print(f"[gpio_controller] [촬영] 슬롯 0 (NoFeces) 촬영 시작 data_file_name={data_file_name} image_time={image_time_0}", file=sys.stderr)
-        capture_at_slot(data_file_name, image_time_0, 0, cwd=cwd)
+        ok0, path0 = capture_at_slot(data_file_name, image_time_0, 0, cwd=cwd)
         image_times = [image_time_0]
         print(f"[gpio_controller] [촬영] 슬롯 0 촬영 완료. image_times len={len(image_times)}", file=sys.stderr)
+        # 슬롯 0 기준 signature: 슬롯 1~3 유사도 비교용 (변화 없는 슬롯 flag / skip)
+        reference_signature = None
+        if ok0 and config.SLOT_SIMILARITY_ACTION in ("flag", "skip"):
+            try:
+                reference_signature = image_signature(path0)
+            except Exception as e:
+                print(f"[gpio_controller] [촬영] 슬롯 0 signature 계산 실패(유사도 비교 생략): {e}", file=sys.stderr)
 
-        time.sleep(3)  # 0번 슬롯 촬영 후 대기 (libcamera 정리 등)
+        time.sleep(get_camera().settle_sec)  # 0번 슬롯 촬영 후 대기 (libcamera-still 정리 등, warm 백엔드는 0)
         gc.collect()
         
+        # 슬롯 1,2,3 촬영은 CaptureWorker 스레드에서 실행 (가스 루프는 요청만 넣고 바로 다음 샘플로 진행)
+        # PIPELINE_UPLOAD: 촬영 완료 즉시 측정 중에 대역 제한 업로드 (루프 종료 시점엔 슬롯 3 만 남음)
+        uploader = UploadWorker() if config.PIPELINE_UPLOAD else None
+        capture_worker = CaptureWorker(cwd=cwd, uploader=uploader, reference_signature=reference_signature)
+
         def _on_capture(slot, d, t):
             print(f"[gpio_controller] [촬영] capture_callback 호출 slot={slot} data_file_name={d} image_time={t}", file=sys.stderr)
-            capture_at_slot(d, t, slot, cwd=cwd)
             image_times.append(t)
-            print(f"[gpio_controller] [촬영] 슬롯 {slot} 촬영 완료. image_times len={len(image_times)}", file=sys.stderr)
+            capture_worker.submit(slot, d, t)
+            print(f"[gpio_controller] [촬영] 슬롯 {slot} 촬영 요청 등록. image_times len={len(image_times)}", file=sys.stderr)
+
+        # 데몬: stop 메시지(stop_event)와 device status API 의 stop 폴링을 같은 토큰으로 합침
+        stop_watcher = None
+        if stop_event is not None and api_base:
+            stop_watcher = StopWatcher(api_base, gas_id, stop_event=stop_event).start()
+
+        # OLED 진행 화면: 측정 루프는 progress.snapshot 만 갱신, 렌더링·I2C 는 표시 스레드에서 (최대 PROGRESS_DISPLAY_HZ)
+        progress = MeasurementProgress()
+        progress_display = _start_progress_display(progress, data_file_name)
 
         print("[gpio_controller] [GPIO] measure_sequence 진입 (가스 루프에서 feces_st 감지 시 슬롯 1,2,3 촬영)", file=sys.stderr)
-        gas_data = measure_sequence(gas_id, test_id, capture_callback=_on_capture, simulation=False, pwm=None, api_base=api_base)
+        try:
+            gas_data = measure_sequence(gas_id, test_id, capture_callback=_on_capture, simulation=False, pwm=None,
+                                        api_base=api_base, stop_event=stop_event, progress=progress)
+        except BaseException:
+            # stop(MeasurementStopped)·ADC 오류 등 모든 예외: 진행 중인 촬영/업로드 스레드와 staging 파일 정리 후 전파
+            # (데몬은 프로세스가 유지되므로 스레드·tmpfs 파일이 남으면 세션마다 누적)
+            capture_worker.close()
+            if uploader is not None:
+                uploader.close()
+            retention.discard_session(data_file_name)
+            raise
+        finally:
+            if stop_watcher is not None:
+                stop_watcher.close()
+            if progress_display is not None:
+                progress_display.close()
+        # 업로드 전에 남은 촬영 완료 대기
+        capture_results = capture_worker.close()
 
         # if api_base:
         #     try:
@@ -403,26 +566,28 @@ def main():
             print(f"[gpio_controller] Reset_Display 오류(무시): {e}", file=sys.stderr)
 
         # 2) 슬롯 1,2,3을 Hong 서버(config.IMAGE_UPLOAD_URL)로 업로드 — camera_controller.upload_image_to_server 사용
-        upload_results = []
-        base = cwd or getattr(config, "GPIO_CONTROLLER_DIR", os.path.dirname(os.path.abspath(__file__)))
-        print(f"[gpio_controller] [업로드] 슬롯 1,2,3 업로드 시도. image_times len={len(image_times)} base={base}", file=sys.stderr)
-        for slot in (1, 2, 3):
-            if slot >= len(image_times):
-                print(f"[gpio_controller] [업로드] 슬롯 {slot} 건너뜀: image_times 미존재 (가스 루프에서 capture_callback 미호출 가능성)", file=sys.stderr)
-                upload_results.append((slot, False, None, "image_times 미존재"))
-                continue
-            image_time_str = image_times[slot]
-            filename = f"{data_file_name}-{image_time_str}-{slot}.jpg"
-            path = os.path.join(base, filename)
-            if not os.path.isfile(path):
-                print(f"[gpio_controller] [업로드] 슬롯 {slot} 건너뜀: 파일 없음 path={path}", file=sys.stderr)
-                upload_results.append((slot, False, filename, "파일 없음"))
-                continue
-            ok, resp, status = upload_image_to_server(path, filename)
-            if ok and status == 200:
-                print(f"[gpio_controller] [업로드] HONG_URL(IMAGE_UPLOAD_URL) 전송 성공 (status=200) 슬롯={slot} filename={filename}", file=sys.stderr)
-            print(f"[gpio_controller] [업로드] 슬롯 {slot} filename={filename} ok={ok}", file=sys.stderr)
-            upload_results.append((slot, ok, filename, resp))
+        base = cwd
+        print(f"[gpio_controller] [업로드] 슬롯 1,2,3 업로드 시도 (동시 {config.UPLOAD_CONCURRENCY}). image_times len={len(image_times)} base={base}", file=sys.stderr)
+        upload_t0 = time.monotonic()
+        try:
+            pipelined = {r[0]: r for r in uploader.close()} if uploader is not None else {}
+            # SLOT_SIMILARITY_ACTION=skip: 슬롯 0 과 변화 없는 슬롯은 업로드하지 않음
+            skipped = {r["slot"]: (r["slot"], False, None, "unchanged vs slot 0") for r in capture_results
+                       if r.get("unchanged") and config.SLOT_SIMILARITY_ACTION == "skip"}
+            remaining = tuple(s for s in (1, 2, 3) if s not in skipped and not (s in pipelined and pipelined[s][1]))
+            if skipped:
+                print(f"[gpio_controller] [업로드] 슬롯 0 과 변화 없음 → 업로드 생략 슬롯={sorted(skipped)}", file=sys.stderr)
+            if pipelined:
+                print(f"[gpio_controller] [업로드] 측정 중 업로드 완료 슬롯={sorted(s for s in pipelined if pipelined[s][1])}, 남은 슬롯={remaining}", file=sys.stderr)
+            fields_by_slot = {r["slot"]: upload_fields(r) for r in capture_results}
+            uploaded = {r[0]: r for r in upload_slot_images(remaining, image_times, data_file_name, base, outbox=outbox,
+                                                            fields_by_slot=fields_by_slot)}
+            upload_results = [uploaded.get(s) or pipelined.get(s) or skipped.get(s) or (s, False, None, "not uploaded")
+                              for s in (1, 2, 3)]
+            print(f"[gpio_controller] [업로드] 슬롯 1,2,3 업로드 종료 ({time.monotonic() - upload_t0:.2f}s)", file=sys.stderr)
+        finally:
+            # 업로드 완료·생략·슬롯 0 이미지 삭제 (재전송 대상은 이미 spool 로 이동됨). 업로드 중 예외여도 staging 정리
+            print(f"[gpio_controller] [업로드] staging 정리: {retention.discard_session(data_file_name)}개 삭제", file=sys.stderr)
         last_upload_ok = None
         for _slot, ok, _fn, resp in upload_results:
             if ok and isinstance(resp, dict):
@@ -430,6 +595,16 @@ def main():
         analysis = fetch_image_analysis_result(gas_id, test_id)
         camera_data = {
             "upload_response": last_upload_ok,
+            "capture_latency": [
+                {k: r[k] for k in ("slot", "ok", "queue_wait_sec", "capture_sec", "latency_sec", "timed_out", "returncode",
+                                   "sharpness", "bytes_before", "bytes_after")}
+                for r in capture_results
+            ],
+            "slot_similarity": [
+                {"slot": r["slot"], "similarity": r["similarity"], "unchanged": r["unchanged"],
+                 "uploaded": r["slot"] not in skipped}
+                for r in capture_results if r.get("similarity") is not None
+            ],
             "image_analysis": analysis,
             "result_url": getattr(config, "IMAGE_ANALYSIS_RESULT_BASE", "image-analysis")
             + f"/{gas_id}/upload/{test_id}",
@@ -445,6 +620,7 @@ def main():
         record["test_id"] = test_id
         record = merge_measurement_with_image_analysis(record, camera_data)
 
+    _measuring.clear()
     if not api_base:
         print("[gpio_controller] DATA_API_URL 없음, API 전송 생략", file=sys.stderr)
         return 0
@@ -457,6 +633,13 @@ def main():
         print(f"[gpio_controller] measurement payload 키: {list(record.keys())}", file=sys.stderr)
         print(f"[gpio_controller] h2s_offset_ppm={record.get('h2s_offset_ppm')} time_sec={record.get('time_sec')} vocs_offset_ppm={record.get('vocs_offset_ppm')} created_at={record.get('created_at')}", file=sys.stderr)
 
+    if outbox is not None:
+        print("[SCENARIO] 7. measurement API 전송 (gas 데이터, outbox 경유)", file=sys.stderr)
+        # 등록(fsync) 되면 성공: 전송·재시도와 device status completed 는 drainer 가 처리 (_on_measurement_sent)
+        key = enqueue_measurement(outbox, api_base, record, key=f"{KIND_MEASUREMENT}:{gas_id}{test_id}:{record['created_at']}")
+        print(f"[gpio_controller] measurement outbox 등록 완료 key={key} (대기 {outbox.pending_count()}건)", file=sys.stderr)
+        return 0
+
     try:
         print("[SCENARIO] 7. measurement API 전송 (gas 데이터)", file=sys.stderr)
         status, result = post_measurement(api_base, record)
@@ -476,7 +659,294 @@ def main():
         return 1
 
 
+def camera_status():
+    """디바이스 상태 본문용 카메라 상태 (probe_camera 캐시, TTL 지나면 재확인)."""
+    status = probe_camera()
+    return {k: status[k] for k in ("ok", "backend", "cameras", "error", "checked_at")}
+
+
+def _enable_camera_status():
+    """실측 경로에서만: 디바이스 상태 전송에 camera 필드 포함 (config.DEVICE_STATUS_CAMERA)."""
+    if config.DEVICE_STATUS_CAMERA:
+        set_status_extra("camera", camera_status)
+
+
+def sweep_capture_files():
+    """기동 시 1회: 강제 종료된 이전 실행이 남긴 촬영 이미지 정리 (outbox 전송 대기 이미지는 유지)."""
+    try:
+        keep = get_outbox().pending_files()
+    except Exception as e:
+        print(f"[gpio_controller] outbox 조회 실패 → spool 은 임시 파일만 정리: {e}", file=sys.stderr)
+        keep = None
+    try:
+        get_retention().sweep(keep)
+    except Exception as e:
+        print(f"[gpio_controller] 촬영 파일 정리 실패(무시): {e}", file=sys.stderr)
+
+
+def main():
+    """원샷 모드: 환경변수 DEVICE_ID / MQTT_PAYLOAD 로 1세션 실행 후 종료 (subscriber 기본 실행 방식)."""
+    device_id = os.environ.get("DEVICE_ID", "FFFFF")
+    payload_str = os.environ.get("MQTT_PAYLOAD", "{}")
+    try:
+        mqtt_payload = json.loads(payload_str)
+    except json.JSONDecodeError:
+        mqtt_payload = {}
+    try:
+        signal.signal(signal.SIGINT, _sigint_handler)
+    except (ValueError, OSError):
+        pass
+    try:
+        signal.signal(signal.SIGTERM, _sigint_handler)
+    except (ValueError, OSError):
+        pass
+    sweep_capture_files()
+    try:
+        return run_session(mqtt_payload, device_id)
+    except MeasurementStopped:
+        # stop 수신: ready 복구 완료 → 정상 종료 (subscriber 가 다음 start 에서 재실행)
+        return 0
+    finally:
+        _measuring.clear()
+        close_camera()
+        _flush_outbox()
+
+
+class SessionService:
+    """
+    --serve 데몬: JSON-lines 명령으로 측정 세션을 순차 실행 (동시에 1세션).
+    import·ADC·HTTP 연결·outbox 가 프로세스에 유지되어 start 명령 → 첫 ADC 샘플까지 콜드 스타트 없음.
+
+    명령 (1줄 1 JSON):
+      {"cmd": "start", "id": "...", "payload": {gas_id, test_id, profile_id, ...}}
+      {"cmd": "stop"}      진행 중 세션에 stop 전달 (SIGTERM 대신)
+      {"cmd": "status"}
+      {"cmd": "shutdown"}
+    이벤트 (1줄 1 JSON): {"event": "ready" | "accepted" | "busy" | "started" | "finished" | "stopped" | "error"
+                              | "stopping" | "idle" | "status", "id": ..., ...}
+    """
+
+    def __init__(self, device_id=None):
+        self.device_id = device_id or os.environ.get("DEVICE_ID", "FFFFF")
+        self._jobs = queue.Queue()
+        self._lock = threading.Lock()
+        self._current = None   # 접수~종료 중인 작업 dict (id, payload, emit, stop_event)
+        self._seq = 0
+        self._shutdown = threading.Event()
+
+    def handle(self, msg, emit):
+        """명령 1건 처리 (reader 스레드에서 호출, 즉시 반환). emit(dict): 응답/이벤트 출력."""
+        cmd = (msg.get("cmd") or "").lower() if isinstance(msg, dict) else ""
+        if cmd == "start":
+            with self._lock:
+                if self._current is not None or self._shutdown.is_set():
+                    emit({"event": "busy", "id": msg.get("id"), "current": self._current and self._current["id"]})
+                    return
+                self._seq += 1
+                job = {
+                    "id": msg.get("id") if msg.get("id") is not None else self._seq,
+                    "payload": msg.get("payload") or {},
+                    "emit": emit,
+                    "stop_event": threading.Event(),
+                }
+                self._current = job
+            self._jobs.put(job)
+            emit({"event": "accepted", "id": job["id"]})
+        elif cmd == "stop":
+            with self._lock:
+                job = self._current
+            if job is None:
+                emit({"event": "idle"})
+                return
+            job["stop_event"].set()
+            emit({"event": "stopping", "id": job["id"]})
+        elif cmd == "status":
+            with self._lock:
+                job = self._current
+            event = {"event": "status", "busy": job is not None, "id": job and job["id"]}
+            if os.environ.get("GPIO_SIMULATION", "").lower() not in ("1", "true", "yes"):
+                event["camera"] = camera_status()
+            emit(event)
+        elif cmd == "shutdown":
+            self.shutdown()
+            emit({"event": "shutdown"})
+        else:
+            emit({"event": "error", "error": f"unknown cmd: {cmd or msg!r}"})
+
+    def shutdown(self):
+        """진행 중 세션에 stop 전달 후 serve_forever 종료."""
+        self._shutdown.set()
+        with self._lock:
+            job = self._current
+        if job is not None:
+            job["stop_event"].set()
+        self._jobs.put(None)
+
+    def warm_up(self):
+        """데몬 기동 시 1회: 촬영 파일 정리, ADC·카메라·outbox 준비, 지연 import 모듈 미리 로드 (첫 start 에서 초기화 지연 없게)."""
+        sweep_capture_files()
+        if os.environ.get("GPIO_SIMULATION", "").lower() not in ("1", "true", "yes"):
+            get_adc()
+            try:
+                get_camera()   # picamera2 warm 세션: 세션 간 센서 설정·AF 유지
+            except Exception as e:
+                print(f"[gpio_controller] 카메라 초기화 실패(첫 촬영 시 재시도): {e}", file=sys.stderr)
+            _enable_camera_status()
+            print(f"[gpio_controller] 카메라 상태: {camera_status()}", file=sys.stderr)
+            _display_functions()
+            for name in ("numpy", "PIL.Image", "concurrent.futures"):
+                try:
+                    importlib.import_module(name)
+                except ImportError:
+                    pass
+        if config.DATA_API_URL:
+            try:
+                _start_outbox()
+            except Exception as e:
+                print(f"[gpio_controller] outbox 초기화 실패(무시): {e}", file=sys.stderr)
+
+    def _run_job(self, job):
+        emit = job["emit"]
+        emit({"event": "started", "id": job["id"]})
+        t0 = time.monotonic()
+        try:
+            code = run_session(job["payload"], self.device_id, stop_event=job["stop_event"])
+            event = {"event": "finished", "id": job["id"], "code": code}
+        except MeasurementStopped:
+            event = {"event": "stopped", "id": job["id"]}
+        except Exception as e:
+            import traceback
+            print(f"[gpio_controller] 세션 오류: {e}", file=sys.stderr)
+            traceback.print_exc(file=sys.stderr)
+            event = {"event": "error", "id": job["id"], "error": str(e)}
+        finally:
+            _measuring.clear()
+            with self._lock:
+                self._current = None
+        event["elapsed_sec"] = round(time.monotonic() - t0, 3)
+        emit(event)
+
+    def serve_forever(self):
+        """작업 큐를 메인 스레드에서 순차 처리 (GPIO/카메라 접근을 한 스레드로 유지)."""
+        while not self._shutdown.is_set():
+            job = self._jobs.get()
+            if job is None:
+                break
+            self._run_job(job)
+
+
+def _json_lines_emitter(stream):
+    """스레드 안전 JSON-lines 출력기. 스트림이 닫혔으면 무시 (클라이언트 연결 종료)."""
+    lock = threading.Lock()
+
+    def emit(event):
+        line = json.dumps(event, ensure_ascii=False) + "\n"
+        with lock:
+            try:
+                stream.write(line)
+                stream.flush()
+            except (OSError, ValueError):
+                pass
+    return emit
+
+
+def _read_commands(lines, service, emit):
+    """JSON-lines 명령 읽기 루프. 형식 오류 줄은 error 이벤트로 응답."""
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            msg = json.loads(line)
+        except json.JSONDecodeError as e:
+            emit({"event": "error", "error": f"invalid json: {e}"})
+            continue
+        service.handle(msg, emit)
+
+
+def serve(socket_path=None):
+    """
+    데몬 모드 (main.py --serve [--socket PATH]).
+    - 기본: stdin 에서 명령, stdout 으로 이벤트 (subscriber.js GPIO_DAEMON=1). 로그용 print 는 stderr 로 돌림.
+      stdin EOF(부모 종료) 시 데몬도 종료.
+    - --socket: Unix 소켓에서 연결마다 명령/이벤트 (작업 이벤트는 start 를 보낸 연결로 전달).
+    - SIGTERM/SIGINT: 진행 중 세션 stop 후 종료.
+    """
+    service = SessionService()
+
+    def _on_signal(signum, frame):
+        print(f"[gpio_controller] 데몬 종료 신호({signum}) → 진행 중 세션 stop 후 종료", file=sys.stderr)
+        service.shutdown()
+
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            signal.signal(sig, _on_signal)
+        except (ValueError, OSError):
+            pass
+
+    server = None
+    if socket_path:
+        import socketserver
+
+        class _Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                emit = _json_lines_emitter(io.TextIOWrapper(self.wfile, encoding="utf-8", write_through=True))
+                _read_commands(io.TextIOWrapper(self.rfile, encoding="utf-8", errors="replace"), service, emit)
+
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server = socketserver.ThreadingUnixStreamServer(socket_path, _Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="serve-socket", daemon=True).start()
+        print(f"[gpio_controller] 데몬 대기: unix socket {socket_path}", file=sys.stderr)
+    else:
+        # stdout 은 이벤트 전용 → 다른 모듈의 print(stdout) 가 프로토콜을 깨지 않도록 stderr 로 돌림
+        emit = _json_lines_emitter(sys.stdout)
+        sys.stdout = sys.stderr
+
+        def _stdin_loop():
+            _read_commands(sys.stdin, service, emit)
+            print("[gpio_controller] stdin 종료 → 데몬 종료", file=sys.stderr)
+            service.shutdown()
+        threading.Thread(target=_stdin_loop, name="serve-stdin", daemon=True).start()
+
+    t0 = time.monotonic()
+    service.warm_up()
+    print(f"[gpio_controller] 데몬 준비 완료 ({time.monotonic() - t0:.2f}s)", file=sys.stderr)
+    if server is None:
+        emit({"event": "ready", "pid": os.getpid()})
+    try:
+        service.serve_forever()
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+            try:
+                os.unlink(socket_path)
+            except OSError:
+                pass
+        for cleanup in (gas_cleanup_gpio, cleanup_all_led_gpio, close_camera):
+            try:
+                cleanup()
+            except Exception as e:
+                print(f"[gpio_controller] 데몬 종료: GPIO 정리 예외(무시): {e}", file=sys.stderr)
+        http_client.close_all()
+    return 0
+
+
+def _parse_args(argv):
+    import argparse
+    parser = argparse.ArgumentParser(description="gpio_controller (기본: MQTT_PAYLOAD 로 1회 측정 후 종료)")
+    parser.add_argument("--serve", action="store_true", help="데몬 모드: JSON-lines 명령으로 세션 반복 실행")
+    parser.add_argument("--socket", default=os.environ.get("GPIO_DAEMON_SOCKET") or None,
+                        help="--serve 시 stdin 대신 Unix 소켓 경로에서 명령 수신")
+    return parser.parse_args(argv)
+
+
 if __name__ == "__main__":
+    args = _parse_args(sys.argv[1:])
+    if args.serve:
+        sys.exit(serve(args.socket))
     try:
         sys.exit(main())
     except Exception as e:
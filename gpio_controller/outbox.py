@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+"""
+전송 대기함 (store-and-forward outbox).
+- measurement / image_analysis payload, 업로드 실패 이미지를 SQLite(WAL, synchronous=FULL)에 먼저 기록한 뒤
+  백그라운드 drainer 스레드가 http_client 로 전송. 네트워크 단절·프로세스 종료 시에도 다음 실행에서 이어서 전송.
+- 항목마다 idempotency key(예: measurement:FFFFF00042) → 같은 key 재등록은 무시, 전송 시 Idempotency-Key 헤더로 전달.
+- KIND_IMAGE 항목 payload 에 remove_file=True 면 전송 완료/dead 시 로컬 파일 삭제 (retention spool 정리).
+- 실패 시 OUTBOX_RETRY_BASE_SEC 부터 지수 backoff (최대 OUTBOX_RETRY_MAX_SEC). 4xx(408/429 제외)는 재시도 없이 dead 처리.
+"""
+import os
+import sys
+import json
+import time
+import sqlite3
+import threading
+
+import config
+import http_client
+
+OUTBOX_DB_PATH = os.environ.get(
+    "HEM_OUTBOX_DB",
+    os.path.join(config.GPIO_CONTROLLER_DIR, "tmp", "outbox.sqlite3"),
+)
+OUTBOX_RETRY_BASE_SEC = float(os.environ.get("OUTBOX_RETRY_BASE_SEC", "2.0"))
+OUTBOX_RETRY_MAX_SEC = float(os.environ.get("OUTBOX_RETRY_MAX_SEC", "300.0"))
+# 원샷 main.py 가 프로세스 종료 전 outbox 전송을 기다리는 상한(초). 초과 시 outbox 에 남기고 종료 (다음 실행에서 전송).
+OUTBOX_FLUSH_TIMEOUT_SEC = float(os.environ.get("OUTBOX_FLUSH_TIMEOUT_SEC", "10.0"))
+# 전송 완료/dead 항목 보관 기간(초). Outbox 생성 시 이보다 오래된 항목 삭제.
+OUTBOX_KEEP_DONE_SEC = float(os.environ.get("OUTBOX_KEEP_DONE_SEC", str(7 * 24 * 3600)))
+
+KIND_MEASUREMENT = "measurement"
+KIND_IMAGE_ANALYSIS = "image_analysis"
+KIND_IMAGE = "image"
+
+STATE_PENDING = "pending"
+STATE_SENT = "sent"
+STATE_DEAD = "dead"
+
+
+def is_retryable(status):
+    """
+    전송 결과가 재시도 대상인지 (drainer 와 main.upload_slot_images 공용 규칙).
+    :param status: HTTP status, None(네트워크 오류) 또는 0(파일 없음 등 재시도 무의미)
+    :return: True - 네트워크 오류, 5xx, 408, 429 등 / False - 2xx 성공 또는 dead 처리할 실패 (0, 408/429 외 4xx)
+    """
+    if status is None:
+        return True
+    if 200 <= status < 300 or status == 0:
+        return False
+    return not (400 <= status < 500 and status not in (408, 429))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL,
+    url TEXT NOT NULL,
+    payload BLOB,
+    file_path TEXT,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    done_at REAL,
+    last_status INTEGER,
+    last_error TEXT,
+    response BLOB
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (state, next_attempt);
+"""
+
+
+class Outbox:
+    """
+    SQLite 기반 전송 대기함. 한 프로세스에서 1개 인스턴스를 여러 스레드가 공유 (내부 lock).
+    - enqueue(): 기록(fsync) 후 즉시 반환. drainer 가 동작 중이면 바로 깨움.
+    - start()/stop(): 백그라운드 drainer 스레드.
+    - wait(keys, timeout): 해당 항목이 전송(또는 dead) 처리될 때까지 대기.
+    - on_sent(kind, callback): kind 항목 전송 완료 시 drainer 스레드에서 후속 처리 (device status completed 등).
+    """
+
+    def __init__(self, path=None):
+        self.path = path or OUTBOX_DB_PATH
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=FULL")
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._halt = threading.Event()
+        self._wake = False   # enqueue 후 drainer 가 아직 처리 안 함 (_cond 보호, notify 유실 방지)
+        self._thread = None
+        self._sent_hooks = {}
+        self.prune()
+
+    def on_sent(self, kind, callback):
+        """
+        kind 항목이 전송 완료(2xx)되면 drainer 스레드에서 callback(key, payload) 호출. kind 당 1개 (재등록 시 교체).
+        callback 예외는 로그만 남김 (항목은 이미 sent). callback=None 이면 해제.
+        """
+        with self._lock:
+            if callback is None:
+                self._sent_hooks.pop(kind, None)
+            else:
+                self._sent_hooks[kind] = callback
+
+    # ----- 기록 -----
+    def enqueue(self, kind, url, payload=None, file_path=None, key=None):
+        """
+        전송 항목 등록. 같은 key 가 이미 있으면 무시 (idempotent).
+        :param payload: dict(JSON 전송) 또는 이미지의 경우 업로드 파일명 등 메타 dict
+        :param file_path: KIND_IMAGE 의 로컬 파일 경로
+        :return: key
+        """
+        if key is None:
+            key = f"{kind}:{os.urandom(8).hex()}"
+        blob = json.dumps(payload).encode("utf-8") if payload is not None else None
+        with self._lock:
+            self._db.execute(
+                "INSERT OR IGNORE INTO outbox (key, kind, url, payload, file_path, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, kind, url, blob, file_path, time.time()),
+            )
+        with self._cond:
+            self._wake = True
+            self._cond.notify_all()
+        return key
+
+    def get(self, key):
+        """:return: 항목 dict (state, attempts, last_status, response 등) 또는 None"""
+        with self._lock:
+            row = self._db.execute("SELECT * FROM outbox WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        item = dict(row)
+        if item.get("response"):
+            try:
+                item["response"] = json.loads(item["response"])
+            except ValueError:
+                pass
+        return item
+
+    def pending_count(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM outbox WHERE state = ?", (STATE_PENDING,)).fetchone()[0]
+
+    def pending_files(self):
+        """전송 대기 중인 KIND_IMAGE 항목의 로컬 파일 경로 목록 (retention sweep 에서 유지할 파일)."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT file_path FROM outbox WHERE state = ? AND kind = ? AND file_path IS NOT NULL",
+                (STATE_PENDING, KIND_IMAGE),
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def prune(self, keep_sec=None):
+        """전송 완료/dead 후 keep_sec 지난 항목 삭제."""
+        keep = OUTBOX_KEEP_DONE_SEC if keep_sec is None else keep_sec
+        with self._lock:
+            self._db.execute("DELETE FROM outbox WHERE state != ? AND done_at < ?", (STATE_PENDING, time.time() - keep))
+
+    # ----- 전송 -----
+    def _send(self, row):
+        """1건 전송. :return: (status_code or None, response_bytes, error_str)"""
+        headers = {"Idempotency-Key": row["key"]}
+        if row["kind"] == KIND_IMAGE:
+            meta = json.loads(row["payload"]) if row["payload"] else {}
+            path = row["file_path"]
+            filename = meta.get("filename") or os.path.basename(path)
+            body = http_client.MultipartFileBody(path, filename, fields=meta.get("fields"))
+            headers.update(body.headers())
+            resp = http_client.request("POST", row["url"], body=body, headers=headers,
+                                       endpoint="image_upload", verify_tls=True)
+        else:
+            headers["Content-Type"] = "application/json"
+            resp = http_client.request("POST", row["url"], body=row["payload"], headers=headers, endpoint=row["kind"])
+        return resp.status, resp.body, None
+
+    def drain_once(self, limit=20):
+        """
+        전송 시점이 된 항목을 오래된 순으로 전송.
+        :return: (sent, failed) 건수
+        """
+        now = time.time()
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT * FROM outbox WHERE state = ? AND next_attempt <= ? ORDER BY id LIMIT ?",
+                (STATE_PENDING, now, limit),
+            ).fetchall()
+        sent = failed = 0
+        for row in rows:
+            if self._halt.is_set():
+                break
+            try:
+                status, body, error = self._send(row)
+            except FileNotFoundError as e:
+                status, body, error = 0, None, str(e)   # 파일 없음 → 재시도 무의미
+            except Exception as e:
+                status, body, error = None, None, str(e)
+            attempts = row["attempts"] + 1
+            if status is not None and 200 <= status < 300:
+                state, next_attempt = STATE_SENT, 0
+                sent += 1
+            elif not is_retryable(status):
+                state, next_attempt = STATE_DEAD, 0
+                failed += 1
+                print(f"[outbox] {row['key']} 전송 거부 status={status} {error or ''} → dead", file=sys.stderr)
+            else:
+                state = STATE_PENDING
+                next_attempt = time.time() + min(OUTBOX_RETRY_BASE_SEC * (2 ** (attempts - 1)), OUTBOX_RETRY_MAX_SEC)
+                failed += 1
+                print(f"[outbox] {row['key']} 전송 실패(시도 {attempts}) status={status} {error or ''}", file=sys.stderr)
+            with self._lock:
+                self._db.execute(
+                    "UPDATE outbox SET state = ?, attempts = ?, next_attempt = ?, last_status = ?, last_error = ?, "
+                    "response = ?, done_at = ? WHERE id = ?",
+                    (state, attempts, next_attempt, status, error, body,
+                     time.time() if state != STATE_PENDING else None, row["id"]),
+                )
+            if state != STATE_PENDING and row["kind"] == KIND_IMAGE and row["file_path"]:
+                meta = json.loads(row["payload"]) if row["payload"] else {}
+                if meta.get("remove_file"):
+                    try:
+                        os.remove(row["file_path"])
+                    except OSError:
+                        pass
+            if state == STATE_SENT:
+                self._run_sent_hook(row)
+            with self._cond:
+                self._cond.notify_all()
+        return sent, failed
+
+    def _run_sent_hook(self, row):
+        with self._lock:
+            hook = self._sent_hooks.get(row["kind"])
+        if hook is None:
+            return
+        try:
+            hook(row["key"], json.loads(row["payload"]) if row["payload"] else None)
+        except Exception as e:
+            print(f"[outbox] {row['key']} 전송 후 처리 예외: {e}", file=sys.stderr)
+
+    def _next_due_in(self):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT MIN(next_attempt) FROM outbox WHERE state = ?", (STATE_PENDING,)
+            ).fetchone()
+        if row[0] is None:
+            return None
+        return max(0.0, row[0] - time.time())
+
+    def _run(self):
+        while not self._halt.is_set():
+            try:
+                self.drain_once()
+            except Exception as e:
+                print(f"[outbox] drain 예외: {e}", file=sys.stderr)
+            with self._cond:
+                if self._halt.is_set():
+                    break
+                # drain 중 enqueue 된 항목이 있으면 바로 다시 drain (대기 전에 온 notify 는 유실되므로 flag 로 확인)
+                if self._wake:
+                    self._wake = False
+                    continue
+                # 새 항목 등록(notify) 또는 다음 재시도 시각까지 대기
+                due = self._next_due_in()
+                self._cond.wait(OUTBOX_RETRY_MAX_SEC if due is None else min(due, OUTBOX_RETRY_MAX_SEC))
+                self._wake = False
+
+    def start(self):
+        """drainer 스레드 시작 (이미 동작 중이면 무시)."""
+        if self._thread is None or not self._thread.is_alive():
+            self._halt.clear()
+            self._thread = threading.Thread(target=self._run, name="outbox-drainer", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._halt.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def wait(self, keys, timeout=None):
+        """
+        keys 항목이 모두 pending 이 아닐 때까지 대기 (drainer 동작 중이어야 함).
+        :param keys: 기다릴 key 목록. None 이면 outbox 전체 (pending 항목이 없을 때까지)
+        :return: bool - 모두 전송/종결되었는지
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        def _done():
+            if keys is None:
+                return self.pending_count() == 0
+            return all((self.get(k) or {}).get("state") != STATE_PENDING for k in keys)
+
+        with self._cond:
+            while not _done():
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining if remaining is not None else 1.0)
+        return True
+
+    def close(self):
+        self.stop(timeout=1.0)
+        with self._lock:
+            self._db.close()
+
+
+_default_outbox = None
+_default_lock = threading.Lock()
+
+
+def get_outbox():
+    """프로세스 공용 Outbox (OUTBOX_DB_PATH)."""
+    global _default_outbox
+    with _default_lock:
+        if _default_outbox is None:
+            _default_outbox = Outbox()
+        return _default_outbox
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+녹화된 전압 trace 로 가스 측정 파이프라인 재실행 (하드웨어·팬·sleep·HTTP 없음).
+- gas_controller.GasPipeline (measure_sequence 와 동일 코드) 로 필터 → PPM → smooth_peak_h2s → feces_st → 시프트 → compute_exposure.
+- 샘플별 누적 시간(time_sec)이 trace 에 있으면 measure_sequence 결과 dict 와 동일한 값 재현. 없으면 MEASURE_LOOP_INTERVAL_SEC 간격 가정.
+- 현장 문의 재현, 임계값 변경 후 과거 데이터 재채점용. 결과 dict 는 파일당 JSON 1줄로 stdout 출력 (무효 구간이면 null).
+
+trace 형식:
+- .hemtrace: measure_sequence 가 기록한 원시 전압 trace (voltage_trace). 헤더의 BM_TIME/END_TR/임계값/필터를 기본값으로 사용.
+- CSV: h2s_v,vocs_v[,time_sec] (헤더 줄 있으면 무시)
+- JSON: [[h2s_v, vocs_v(, time_sec)], ...] 또는 {"samples": [...]}
+
+사용:
+  python replay.py tmp/traces/FFFFF00001_20260101120000.hemtrace
+  python replay.py trace.csv                        # 결과 dict JSON
+  python replay.py --summary --noise-1 0.008 a.csv b.json
+"""
+import os
+import io
+import sys
+import csv
+import json
+import time
+import argparse
+import contextlib
+
+import gas_controller
+import voltage_trace
+
+# trace 헤더 메타 키 → gas_controller 임계값 상수
+_THRESHOLD_META = (
+    ("noise_1_threshold", "NOISE_1_THRESHOLD"),
+    ("noise_5_threshold", "NOISE_5_THRESHOLD"),
+    ("noise_5_threshold_high", "NOISE_5_THRESHOLD_HIGH"),
+    ("stable_thre", "STABLE_THRE"),
+)
+
+
+def load_trace(path):
+    """
+    trace 파일 → (voltages, times, meta).
+    :return: voltages - [(h2s_v, vocs_v), ...], times - 샘플별 누적 시간 리스트 또는 None (시간 열 없음),
+             meta - .hemtrace 헤더 메타데이터 (CSV/JSON 은 빈 dict)
+    """
+    if path.endswith(voltage_trace.TRACE_SUFFIX):
+        meta, records = voltage_trace.read_trace(path, use_numpy=False)
+        return [(r[4], r[5]) for r in records], [r[8] for r in records], meta
+    if path.endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            rows = json.load(f)
+        if isinstance(rows, dict):
+            rows = rows.get("samples") or []
+    else:
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            rows = [row for row in csv.reader(f) if row and not row[0].lstrip().startswith("#")]
+        if rows:
+            try:
+                float(rows[0][0])
+            except ValueError:
+                rows = rows[1:]  # 헤더
+    voltages = [(float(r[0]), float(r[1])) for r in rows]
+    times = [float(r[2]) for r in rows] if rows and all(len(r) > 2 for r in rows) else None
+    return voltages, times, {}
+
+
+def _summary(result):
+    """리스트/중첩 dict 를 뺀 스키마 필드만."""
+    return {k: v for k, v in result.items() if not isinstance(v, (list, dict))}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="녹화된 전압 trace 로 measure_sequence 파이프라인 재실행")
+    parser.add_argument("traces", nargs="+", help="trace 파일 (.hemtrace/CSV/JSON)")
+    parser.add_argument("--bm-time", type=int, help="기본: trace 헤더 값, 없으면 BM_TIME")
+    parser.add_argument("--end-tr", type=int, help="기본: trace 헤더 값, 없으면 END_TR")
+    parser.add_argument("--filter", choices=("auto", "legacy", "ema"), default="auto",
+                        help="auto: trace 헤더 값, 없으면 utils.filter 사용 가능 시 legacy (measure_sequence 와 동일)")
+    parser.add_argument("--noise-1", type=float, help="NOISE_1_THRESHOLD 재정의")
+    parser.add_argument("--noise-5", type=float, help="NOISE_5_THRESHOLD 재정의")
+    parser.add_argument("--noise-5-high", type=float, help="NOISE_5_THRESHOLD_HIGH 재정의")
+    parser.add_argument("--stable-thre", type=float, help="STABLE_THRE 재정의 (smooth_peak_h2s)")
+    parser.add_argument("--summary", action="store_true", help="시계열 리스트 없이 스키마 필드만 출력")
+    parser.add_argument("--verbose", action="store_true", help="파이프라인 stderr 로그 표시")
+    args = parser.parse_args(argv)
+
+    if args.filter == "legacy" and gas_controller.legacy_filter is None:
+        parser.error("utils.filter import 실패 → --filter legacy 사용 불가")
+    overrides = dict(zip((name for _, name in _THRESHOLD_META),
+                         (args.noise_1, args.noise_5, args.noise_5_high, args.stable_thre)))
+    defaults = {name: getattr(gas_controller, name) for _, name in _THRESHOLD_META}
+
+    status = 0
+    for path in args.traces:
+        try:
+            voltages, times, meta = load_trace(path)
+        except (OSError, ValueError, IndexError) as e:
+            print(f"[replay] {path}: trace 읽기 실패: {e}", file=sys.stderr)
+            status = 1
+            continue
+        # 임계값은 gas_controller 모듈 상수를 호출 시점에 읽음 → CLI 재정의 > trace 헤더(기록 당시 값) > 현재 값
+        for key, name in _THRESHOLD_META:
+            value = overrides[name]
+            setattr(gas_controller, name, value if value is not None else meta.get(key, defaults[name]))
+        bm_time = args.bm_time if args.bm_time is not None else meta.get("bm_time", gas_controller.BM_TIME)
+        end_tr = args.end_tr if args.end_tr is not None else meta.get("end_tr", gas_controller.END_TR)
+        if args.filter != "auto":
+            use_legacy_filter = args.filter == "legacy"
+        else:
+            use_legacy_filter = meta.get("legacy_filter")
+            if use_legacy_filter and gas_controller.legacy_filter is None:
+                print(f"[replay] {path}: 기록 당시 utils.filter 사용, 현재 import 실패 → filter_voltage 로 대체", file=sys.stderr)
+                use_legacy_filter = False
+        sink = contextlib.nullcontext() if args.verbose else contextlib.redirect_stderr(io.StringIO())
+        t0 = time.perf_counter()
+        with sink:
+            result, pipeline = gas_controller.replay_trace(voltages, times, bm_time, end_tr, use_legacy_filter)
+        elapsed = time.perf_counter() - t0
+        n = pipeline.idx + 1
+        print(f"[replay] {os.path.basename(path)}: samples={n}/{len(voltages)} feces_st={pipeline.feces_st} "
+              f"{elapsed * 1000:.1f}ms ({elapsed * 1e6 / max(n, 1):.0f}us/sample)"
+              f"{'' if times is not None else ' (time 열 없음: 간격 가정)'}", file=sys.stderr)
+        if result is not None and args.summary:
+            result = _summary(result)
+        print(json.dumps(result, ensure_ascii=False))
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
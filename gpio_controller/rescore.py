@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+"""
+보관된 측정 결과 일괄 재채점 (BM_TIME / END_TR / 노이즈 임계값 변경 후 과거 데이터 재계산).
+- 입력: 레거시 JSON (build_measurement_json 형식, data.gasValue 행의 문자열 숫자) 또는 .hemtrace (voltage_trace 원시 전압).
+  디렉터리는 재귀 탐색하며 경로를 하나씩 흘려보냄 → 10만 파일도 목록·내용을 한꺼번에 메모리에 올리지 않음.
+- 파일 RESCORE_CHUNK_FILES 개씩 ProcessPoolExecutor 작업자에게 전달, 진행 중 작업은 작업자 수 × 2 개로 제한 (제출 대기열 상한).
+- JSON: 보관된 시프트 구간(feces_st-BM_time .. feces_st+END_TR)에서 새 BM_TIME/END_TR 창을 잘라
+  같은 길이 세션끼리 묶어 compute_exposure_batch 로 계산. feces_st 는 보관 구간에서 다시 판정할 수 없으므로
+  노이즈 임계값은 반영되지 않음 (창이 보관 구간을 벗어나면 status=short).
+- .hemtrace: replay_trace 로 feces_st 판정부터 다시 계산 → 노이즈 임계값까지 반영.
+- 출력: 세션당 1행 요약. CSV 기본, 출력 경로가 .parquet 이면 pyarrow ParquetWriter (작업 결과마다 row group).
+
+사용:
+  python rescore.py /data/archive --out rescore.csv
+  python rescore.py /data/archive tmp/traces --bm-time 10 --end-tr 150 --noise-1 0.008 --out rescore.parquet
+"""
+import os
+import io
+import sys
+import csv
+import json
+import time
+import argparse
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import gas_controller
+import voltage_trace
+from replay import load_trace
+
+RESCORE_CHUNK_FILES = int(os.environ.get("RESCORE_CHUNK_FILES", "256"))
+ARCHIVE_SUFFIXES = (".json", voltage_trace.TRACE_SUFFIX)
+
+COLUMNS = (
+    "path", "gas_id", "test_id", "status", "sort", "time_sec",
+    "h2s_abs_exposure", "vocs_abs_exposure", "total_abs_exposure",
+    "h2s_ratio_value_pct", "vocs_ratio_value_pct", "h2s_offset_ppm", "vocs_offset_ppm",
+    "old_h2s_abs_exposure", "old_vocs_abs_exposure", "old_total_abs_exposure",
+)
+_INT_COLUMNS = ("sort",)
+_STR_COLUMNS = ("path", "gas_id", "test_id", "status")
+
+# 보관 calc_vals 키 → 출력 열
+_OLD_CALC_VALS = (
+    ("H2S_abs_exposure", "old_h2s_abs_exposure"),
+    ("VOCs_abs_exposure", "old_vocs_abs_exposure"),
+    ("Total_abs_exposure", "old_total_abs_exposure"),
+)
+# compute_exposure_batch 키 → 출력 열
+_BATCH_KEYS = (
+    ("h2s_abs_exposure", "h2s_abs_exposure"),
+    ("vocs_abs_exposure", "vocs_abs_exposure"),
+    ("total_abs_exposure", "total_abs_exposure"),
+    ("h2s_ratio_value_pct", "h2s_ratio_value_pct"),
+    ("vocs_ratio_value_pct", "vocs_ratio_value_pct"),
+    ("h2s_baseline_ppm", "h2s_offset_ppm"),
+    ("vocs_baseline_ppm", "vocs_offset_ppm"),
+)
+_THRESHOLDS = ("NOISE_1_THRESHOLD", "NOISE_5_THRESHOLD", "NOISE_5_THRESHOLD_HIGH", "STABLE_THRE")
+
+
+def iter_archive(paths):
+    """paths(파일/디렉터리)에서 재채점 대상 파일 경로를 하나씩 생성 (디렉터리는 재귀, 이름순)."""
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        stack = [path]
+        while stack:
+            directory = stack.pop()
+            try:
+                entries = sorted(os.scandir(directory), key=lambda e: e.name, reverse=True)
+            except OSError as e:
+                print(f"[rescore] 디렉터리 읽기 실패 {directory}: {e}", file=sys.stderr)
+                continue
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.endswith(ARCHIVE_SUFFIXES):
+                    yield entry.path
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _row(path, **values):
+    row = dict.fromkeys(COLUMNS)
+    row["path"] = path
+    row.update(values)
+    return row
+
+
+def load_archive(path):
+    """
+    레거시 JSON 1개 → (meta, H2S, VOCs, Time). 숫자는 문자열 → float.
+    :return: meta - gas_id, test_id, old_* (보관 calc_vals)
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        doc = json.load(f)
+    rows = doc["data"]["gasValue"]
+    h2s = [float(r["H2S[ppm]"]) for r in rows]
+    vocs = [float(r["VOCs[ppm]"]) for r in rows]
+    times = [float(r["time[sec]"]) for r in rows]
+    calc_vals = doc.get("calc_vals") or {}
+    meta = {"gas_id": doc.get("gas_id"), "test_id": doc.get("test_id")}
+    for key, column in _OLD_CALC_VALS:
+        try:
+            meta[column] = float(calc_vals[key])
+        except (KeyError, TypeError, ValueError):
+            meta[column] = None
+    return meta, h2s, vocs, times
+
+
+def _rescore_trace(path, params):
+    voltages, times, meta = load_trace(path)
+    with contextlib.redirect_stderr(io.StringIO()):
+        result, pipeline = gas_controller.replay_trace(voltages, times, params["bm_time"], params["end_tr"],
+                                                       meta.get("legacy_filter"))
+    base = {"gas_id": meta.get("gas_id"), "test_id": meta.get("test_id")}
+    if result is None:
+        return _row(path, status="no_onset" if pipeline.feces_st == 0 else "short", **base)
+    return _row(path, status="ok", sort=result["sort"], time_sec=result["time_sec"],
+                **{column: result[column] for _, column in _BATCH_KEYS}, **base)
+
+
+def rescore_chunk(paths, params):
+    """
+    작업자 프로세스: 파일 묶음 재채점. JSON 은 창 길이가 같은 세션끼리 compute_exposure_batch 1회.
+    :param params: bm_time, end_tr, archived_bm_time, thresholds(dict, None 은 현재 값 유지)
+    :return: COLUMNS 순서 tuple 리스트 (입력 순서)
+    """
+    for name, value in params["thresholds"].items():
+        if value is not None:
+            setattr(gas_controller, name, value)
+    bm, end_tr, fst = params["bm_time"], params["end_tr"], params["archived_bm_time"]
+    rows = [None] * len(paths)
+    groups = {}  # 창 길이 → [(i, meta, h2s, vocs, times)]
+    for i, path in enumerate(paths):
+        try:
+            if path.endswith(voltage_trace.TRACE_SUFFIX):
+                rows[i] = _rescore_trace(path, params)
+                continue
+            meta, h2s, vocs, times = load_archive(path)
+        except (OSError, ValueError, KeyError, TypeError, IndexError) as e:
+            rows[i] = _row(path, status=f"error: {type(e).__name__}: {e}")
+            continue
+        # 보관 구간 = [feces_st - archived_bm .. feces_st + END_TR] → 새 창 [feces_st - bm .. feces_st + end_tr]
+        start, stop = fst - bm, fst + end_tr + 1
+        if start < 0 or stop > len(h2s):
+            rows[i] = _row(path, status="short", sort=len(h2s), **meta)
+            continue
+        groups.setdefault(stop - start, []).append((i, meta, h2s[start:stop], vocs[start:stop], times[start:stop]))
+
+    for items in groups.values():
+        calc = gas_controller.compute_exposure_batch([it[2] for it in items], [it[3] for it in items],
+                                                     [it[4] for it in items], bm)
+        for j, (i, meta, _, _, times) in enumerate(items):
+            rows[i] = _row(paths[i], status="ok", sort=len(times), time_sec=round(times[-1] - times[0], 2),
+                           **{column: float(calc[key][j]) for key, column in _BATCH_KEYS}, **meta)
+    return [tuple(row[c] for c in COLUMNS) for row in rows]
+
+
+class CsvSink:
+    def __init__(self, path):
+        self._f = open(path, "w", encoding="utf-8", newline="")
+        self._writer = csv.writer(self._f)
+        self._writer.writerow(COLUMNS)
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._f.close()
+
+
+class ParquetSink:
+    """pyarrow 선택 의존성 (없으면 생성 시 ImportError)."""
+
+    def __init__(self, path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self._pa = pa
+        self._schema = pa.schema([
+            (c, pa.string() if c in _STR_COLUMNS else pa.int64() if c in _INT_COLUMNS else pa.float64())
+            for c in COLUMNS
+        ])
+        self._writer = pq.ParquetWriter(path, self._schema)
+
+    def write(self, rows):
+        if rows:
+            columns = list(zip(*rows))
+            self._writer.write_table(self._pa.table(
+                {c: self._pa.array(columns[k], type=self._schema.field(c).type) for k, c in enumerate(COLUMNS)},
+                schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+
+def open_sink(path, fmt="auto"):
+    if fmt == "parquet" or (fmt == "auto" and path.endswith(".parquet")):
+        return ParquetSink(path)
+    return CsvSink(path)
+
+
+def run(paths, sink, params, workers=None, chunk_files=None):
+    """
+    재채점 실행. 작업자 1개면 현재 프로세스에서 순차 처리.
+    :return: dict - 상태별 세션 수
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = _chunks(iter_archive(paths), chunk_files or RESCORE_CHUNK_FILES)
+    counts = {}
+
+    def consume(rows):
+        sink.write(rows)
+        for row in rows:
+            status = row[3].split(":", 1)[0]
+            counts[status] = counts.get(status, 0) + 1
+        done = sum(counts.values())
+        if done // 10000 != (done - len(rows)) // 10000:
+            print(f"[rescore] {done} files", file=sys.stderr)
+
+    if workers == 1:
+        for chunk in chunks:
+            consume(rescore_chunk(chunk, params))
+        return counts
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for chunk in chunks:
+            # 제출 대기열 상한: 작업자 수 × 2 (경로 묶음·결과가 메모리에 쌓이지 않도록)
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    consume(future.result())
+            pending.add(executor.submit(rescore_chunk, chunk, params))
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                consume(future.result())
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="보관된 측정 JSON / .hemtrace 일괄 재채점 (compute_exposure 재계산)")
+    parser.add_argument("paths", nargs="+", help="파일 또는 디렉터리 (재귀)")
+    parser.add_argument("--out", required=True, help="요약 출력 (.csv 또는 .parquet)")
+    parser.add_argument("--format", choices=("auto", "csv", "parquet"), default="auto")
+    parser.add_argument("--bm-time", type=int, default=gas_controller.BM_TIME)
+    parser.add_argument("--end-tr", type=int, default=gas_controller.END_TR)
+    parser.add_argument("--archived-bm-time", type=int, default=gas_controller.BM_TIME,
+                        help="JSON 보관 당시 BM_TIME (보관 구간에서 feces_st 위치)")
+    parser.add_argument("--noise-1", type=float, help="NOISE_1_THRESHOLD (.hemtrace 에만 적용)")
+    parser.add_argument("--noise-5", type=float, help="NOISE_5_THRESHOLD (.hemtrace 에만 적용)")
+    parser.add_argument("--noise-5-high", type=float, help="NOISE_5_THRESHOLD_HIGH (.hemtrace 에만 적용)")
+    parser.add_argument("--stable-thre", type=float, help="STABLE_THRE (.hemtrace 에만 적용)")
+    parser.add_argument("--workers", type=int, default=0, help="작업자 프로세스 수 (0: CPU 수)")
+    parser.add_argument("--chunk-files", type=int, default=RESCORE_CHUNK_FILES)
+    args = parser.parse_args(argv)
+
+    params = {
+        "bm_time": args.bm_time,
+        "end_tr": args.end_tr,
+        "archived_bm_time": args.archived_bm_time,
+        "thresholds": dict(zip(_THRESHOLDS, (args.noise_1, args.noise_5, args.noise_5_high, args.stable_thre))),
+    }
+    try:
+        sink = open_sink(args.out, args.format)
+    except ImportError:
+        parser.error("parquet 출력에는 pyarrow 필요 (pip install pyarrow) → .csv 로 출력하세요")
+
+    t0 = time.monotonic()
+    try:
+        counts = run(args.paths, sink, params, args.workers or None, args.chunk_files)
+    finally:
+        sink.close()
+    elapsed = time.monotonic() - t0
+    total = sum(counts.values())
+    print(f"[rescore] {total} files {elapsed:.1f}s ({total / elapsed if elapsed else 0:.0f} files/s) {counts} -> {args.out}",
+          file=sys.stderr)
+    return 0 if total and counts.get("error", 0) < total else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+촬영 이미지 보관 관리.
+- staging(HEM_CAPTURE_DIR, 기본 /dev/shm/hem_capture = tmpfs): 촬영·전처리·업로드는 RAM 에서 → SD 카드 쓰기/마모 없음.
+- spool(HEM_IMAGE_SPOOL_DIR, SD 카드): 업로드 실패로 재전송(outbox)이 필요한 이미지만 retain() 으로 옮겨 보관.
+  outbox 가 전송 완료/dead 처리하면 파일 삭제. 총 크기가 IMAGE_SPOOL_QUOTA_BYTES 를 넘으면 오래된 파일부터 삭제(LRU).
+- sweep(): 기동 시 1회. 강제 종료된 실행이 남긴 staging 파일·쓰다 만 파일(.part/.tmp)·outbox 가 참조하지 않는 spool 파일 삭제.
+"""
+import os
+import sys
+import shutil
+import threading
+
+import config
+
+
+def _default_staging_dir():
+    # 라즈베리파이 OS: /dev/shm 은 tmpfs (RAM). 없으면 SD 카드의 tmp/capture
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+        return "/dev/shm/hem_capture"
+    return os.path.join(config.GPIO_CONTROLLER_DIR, "tmp", "capture")
+
+
+CAPTURE_STAGING_DIR = os.environ.get("HEM_CAPTURE_DIR") or _default_staging_dir()
+IMAGE_SPOOL_DIR = os.environ.get("HEM_IMAGE_SPOOL_DIR", os.path.join(config.GPIO_CONTROLLER_DIR, "tmp", "image_spool"))
+# spool 최대 총 크기(bytes). 초과 시 수정 시각이 오래된 파일부터 삭제 (0 이면 제한 없음)
+IMAGE_SPOOL_QUOTA_BYTES = int(os.environ.get("IMAGE_SPOOL_QUOTA_BYTES", str(200 * 1024 * 1024)))
+
+_PARTIAL_SUFFIXES = (".part", ".tmp")
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+    except OSError as e:
+        print(f"[retention] 삭제 실패 {path}: {e}", file=sys.stderr)
+        return False
+
+
+def _files(directory):
+    """directory 의 일반 파일 (path, stat) 목록. 디렉터리 없으면 빈 목록."""
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return []
+    out = []
+    for entry in entries:
+        try:
+            if entry.is_file(follow_symlinks=False):
+                out.append((entry.path, entry.stat(follow_symlinks=False)))
+        except OSError:
+            pass
+    return out
+
+
+def enforce_dir_quota(directory, quota_bytes, protect=(), lock=None):
+    """
+    directory 총 크기가 quota_bytes 이하가 될 때까지 오래된(mtime) 파일부터 삭제 (LRU). quota_bytes 0/None 이면 제한 없음.
+    :param protect: 삭제하지 않을 경로 (사용 중인 파일)
+    :param lock: 같은 디렉터리를 여러 스레드가 정리할 때 공유하는 lock
+    :return: 삭제한 경로 목록
+    """
+    if not quota_bytes:
+        return []
+    protect = {os.path.abspath(p) for p in protect}
+    with lock or threading.Lock():
+        files = sorted(_files(directory), key=lambda f: f[1].st_mtime)
+        total = sum(st.st_size for _, st in files)
+        evicted = []
+        for path, st in files:
+            if total <= quota_bytes:
+                break
+            if os.path.abspath(path) in protect:
+                continue
+            if _remove(path):
+                total -= st.st_size
+                evicted.append(path)
+    return evicted
+
+
+class RetentionManager:
+    """staging(tmpfs) ↔ spool(SD) 이미지 보관 정책. 프로세스 공용 1개 (get_retention)."""
+
+    def __init__(self, staging_dir=None, spool_dir=None, quota_bytes=None):
+        self.staging_dir = staging_dir or CAPTURE_STAGING_DIR
+        self.spool_dir = spool_dir or IMAGE_SPOOL_DIR
+        self.quota_bytes = IMAGE_SPOOL_QUOTA_BYTES if quota_bytes is None else quota_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.staging_dir, exist_ok=True)
+
+    def retain(self, path):
+        """
+        업로드 재시도가 필요한 staging 파일을 spool 로 이동 (복사 → fsync → rename → 원본 삭제).
+        이미 spool 에 있으면 그대로. 이동 후 quota 적용 (방금 옮긴 파일은 제외).
+        :return: spool 경로
+        """
+        if os.path.dirname(os.path.abspath(path)) == os.path.abspath(self.spool_dir):
+            return path
+        os.makedirs(self.spool_dir, exist_ok=True)
+        dest = os.path.join(self.spool_dir, os.path.basename(path))
+        part = dest + ".part"
+        with open(path, "rb") as src, open(part, "wb") as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.replace(part, dest)
+        try:
+            dir_fd = os.open(self.spool_dir, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+        except OSError:
+            pass
+        _remove(path)
+        self.enforce_quota(protect=(dest,))
+        return dest
+
+    def discard(self, path):
+        """업로드 완료/불필요 이미지 삭제. :return: bool - 삭제 여부"""
+        return _remove(path) if path else False
+
+    def discard_session(self, prefix):
+        """staging 에서 prefix(data_file_name)로 시작하는 파일 모두 삭제 (세션 종료 시). :return: 삭제 수"""
+        return sum(_remove(p) for p, _ in _files(self.staging_dir) if os.path.basename(p).startswith(prefix))
+
+    def spool_usage(self):
+        return sum(st.st_size for _, st in _files(self.spool_dir))
+
+    def enforce_quota(self, protect=()):
+        """
+        spool 총 크기가 quota_bytes 이하가 될 때까지 오래된(mtime) 파일부터 삭제.
+        삭제된 이미지의 outbox 항목은 전송 시 파일 없음 → dead 처리됨.
+        :return: 삭제한 경로 목록
+        """
+        evicted = enforce_dir_quota(self.spool_dir, self.quota_bytes, protect, self._lock)
+        if evicted:
+            print(f"[retention] spool quota {self.quota_bytes} bytes 초과 → 오래된 이미지 {len(evicted)}개 삭제", file=sys.stderr)
+        return evicted
+
+    def sweep(self, keep_paths=None):
+        """
+        기동 시 정리 (세션이 없을 때만 호출).
+        - staging: 이전 실행이 남긴 파일 전부 (세션 중에만 의미 있음)
+        - spool: 쓰다 만 .part/.tmp, keep_paths(outbox 전송 대기 이미지)에 없는 파일.
+          keep_paths=None(outbox 상태 모름)이면 .part/.tmp 만 삭제.
+        :return: dict - staging, spool 삭제 수
+        """
+        keep = None if keep_paths is None else {os.path.abspath(p) for p in keep_paths if p}
+        staging = sum(_remove(p) for p, _ in _files(self.staging_dir))
+        spool = 0
+        for path, _ in _files(self.spool_dir):
+            if path.endswith(_PARTIAL_SUFFIXES) or (keep is not None and os.path.abspath(path) not in keep):
+                spool += _remove(path)
+        if staging or spool:
+            print(f"[retention] 기동 정리: staging {staging}개, spool {spool}개 삭제", file=sys.stderr)
+        self.enforce_quota()
+        return {"staging": staging, "spool": spool}
+
+
+_retention = None
+_retention_lock = threading.Lock()
+
+
+def get_retention():
+    """프로세스 공용 RetentionManager."""
+    global _retention
+    with _retention_lock:
+        if _retention is None:
+            _retention = RetentionManager()
+        return _retention
@@ -4,13 +4,25 @@
 - process_sensor_data: 가스 측정 row를 DB 포맷 한 레코드로 정리 (gas_id, test_id는 main에서 설정).
 """
 from schema import build_empty_measurement
-try:
-    import RPi.GPIO as GPIO
-except (ImportError, ModuleNotFoundError):
-    GPIO = None  # Mac/PC 등 비라즈베리파이 환경 또는 GPIO_SIMULATION 시
-import os,time,gc,math,requests,json,shutil
+import os,time,gc,math,json,shutil
+import http_client
 from collections import OrderedDict
 
+# RPi.GPIO 는 LED/카메라 LED 첫 사용 시 import (시뮬레이션 경로에서는 로드하지 않음)
+_GPIO = None
+
+
+def _gpio():
+    """RPi.GPIO 지연 import. Mac/PC 등 비라즈베리파이 환경 또는 GPIO_SIMULATION 시 None."""
+    global _GPIO
+    if _GPIO is None:
+        try:
+            import RPi.GPIO as GPIO
+            _GPIO = GPIO
+        except (ImportError, ModuleNotFoundError, RuntimeError):
+            _GPIO = False
+    return _GPIO or None
+
 
 def process_sensor_data(raw_gas, raw_camera):
     """
@@ -33,14 +45,14 @@ def process_sensor_data(raw_gas, raw_camera):
 def send_image_to_serve(image_path,server_url):
     ans = 0
     try:
-        with open(image_path,'rb') as file:
-            files = {'file':file}
-            response = requests.post(server_url,files=files)
-            ans = response.status_code
-            if ans == 200:
-                print('image sending success',response.text)
-            else:
-                print('image sending fail: ',response.status_code)
+        body = http_client.MultipartFileBody(image_path)
+        response = http_client.request('POST', server_url, body=body, headers=body.headers(),
+                                       endpoint='image_upload', verify_tls=True)
+        ans = response.status
+        if ans == 200:
+            print('image sending success',response.text)
+        else:
+            print('image sending fail: ',response.status)
     except Exception as e:
         print('Image Error',e)
     return ans
@@ -128,7 +140,52 @@ def filter(c, b, a):
 
     return x, c, b
 
+def filter_batch(c, block_elems=32768):
+    """
+    filter 의 numpy 배치 버전 (재채점/분석용). 시계열 전체 또는 세션 스택을 1회 호출로 처리.
+    filter(c, b, a) 의 b, a 는 직전·2개 전 입력 (초기값 0, measure_sequence 와 동일) → 재귀 없는 3점 연산.
+    출력은 기본 x=b (1샘플 지연). |c-b|>0.01 인 위치만 골라 나머지 분기를 계산 (스파이크는 드묾).
+    행 묶음(block_elems 원소)마다 출력 복사·판정을 이어서 하고 임시 버퍼는 재사용 → 캐시 안에서 처리.
+    성능: 10000 세션 × 500 샘플에서 filter 루프 대비 약 20~30배 (목표 50배 미달). filter 는 샘플당 비교 1~2회라
+    루프 비용이 원래 작고, 배치 쪽은 출력 복사 + |c-b| 판정 2패스가 메모리 대역폭 한계라 더 줄일 연산이 없음.
+    동등성 검사: check_batch.py
+    :param c: 전압 시계열 (마지막 축 = 샘플, 예: (세션 수, 샘플 수))
+    :return: filter 를 순서대로 호출한 출력 x 와 같은 값의 float64 배열
+    """
+    import numpy as np
+    c = np.asarray(c, dtype=float)
+    n = c.shape[-1] if c.ndim else 0
+    if n < 3:
+        x = np.zeros_like(c)
+        x[..., 1:] = c[..., :-1]
+        return x
+    x = np.empty_like(c)
+    c2 = c.reshape(-1, n)
+    x2 = x.reshape(-1, n)
+    block = max(1, block_elems // n)
+    t = np.empty((min(block, len(c2)), n - 2))
+    m = np.empty(t.shape, dtype=bool)
+    for s in range(0, len(c2), block):
+        cc = c2[s:s + block]
+        xx = x2[s:s + block]
+        k = len(cc)
+        xx[:, 0] = 0.0
+        xx[:, 1:] = cc[:, :-1]
+        np.subtract(cc[:, 1:-1], cc[:, 2:], out=t[:k])
+        np.abs(t[:k], out=t[:k])
+        np.greater(t[:k], 0.01, out=m[:k])
+        r, i = np.divmod(np.flatnonzero(m[:k]), n - 2)
+        if r.size == 0:
+            continue
+        a, b, cur = cc[r, i], cc[r, i + 1], cc[r, i + 2]
+        d = (a - b) * (b - cur)
+        cond = (a != 0) & (np.abs(b - a) > 0.01)
+        # d<0: a 또는 (a+c)/2, d>0: a (d==0 은 |a-b|,|b-c|>0.01 이라 발생하지 않음)
+        xx[r, i + 2] = np.where(cond, np.where(d < 0, np.where(np.abs(a - cur) > 0.009, a, (a + cur) / 2), a), b)
+    return x
+
 def LEDs(COLOR):
+    GPIO = _gpio()
     if GPIO is None:
         return
     GPIO.setmode(GPIO.BCM)
@@ -156,6 +213,7 @@ def LEDs(COLOR):
 
 
 def Camera_LED(ONOFF):
+    GPIO = _gpio()
     if GPIO is None:
         return
     GPIO.setmode(GPIO.BCM)
@@ -168,6 +226,7 @@ def Camera_LED(ONOFF):
         GPIO.output(23,False)
 
 def WIFI_LED(ONOFF):
+    GPIO = _gpio()
     if GPIO is None:
         return
     GPIO.setmode(GPIO.BCM)
@@ -189,6 +248,7 @@ def cleanup_all_led_gpio():
     Ctrl+C 등 종료 시 utils에서 사용한 GPIO(LED·카메라 등)를 LOW로 두고 해제.
     RPi.GPIO 미사용 환경에서는 무시.
     """
+    GPIO = _gpio()
     if GPIO is None:
         return
     try:
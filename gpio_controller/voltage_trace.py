@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+세션별 원시 ADC 전압 trace 기록 (replay.py 재현·재채점용).
+- measure_sequence 가 샘플마다 read_adc_voltages 3채널 전압, monotonic 시각, 루프 처리 시간, 누적 시간(TIME)을 기록.
+- 파일: VOLTAGE_TRACE_DIR/{data_file_name}_{YYYYmmddHHMMSS}.hemtrace (SD 카드, 세션당 약 500 × 64 bytes).
+  헤더 = MAGIC(8) + "<HHI"(version, record_size, header_size) + JSON 메타데이터(세션/상수, 8바이트 정렬 공백 패딩).
+  본문 = 고정 크기 little-endian 레코드(RECORD, 64 bytes) append-only → 강제 종료돼도 마지막 flush 까지 읽을 수 있음.
+  numpy.memmap(path, dtype=RECORD_DTYPE, offset=header_size) 로 복사 없이 읽기 가능 (read_trace).
+- 루프에서는 미리 만든 bytearray 에 pack_into 후 버퍼링된 write 만 수행 (VOLTAGE_TRACE_FLUSH_RECORDS 마다 flush, 종료 시 fsync).
+- 보관: 새 trace 를 열 때 VOLTAGE_TRACE_QUOTA_BYTES 초과분을 오래된 파일부터 삭제.
+"""
+import os
+import sys
+import json
+import struct
+import threading
+from datetime import datetime
+
+import config
+from retention import enforce_dir_quota
+
+VOLTAGE_TRACE_ENABLED = os.environ.get("VOLTAGE_TRACE", "1").lower() in ("1", "true", "yes")
+VOLTAGE_TRACE_DIR = os.environ.get("HEM_TRACE_DIR", os.path.join(config.GPIO_CONTROLLER_DIR, "tmp", "traces"))
+# trace 디렉터리 최대 총 크기(bytes). 기본 16MB ≈ 500샘플 세션 500개 (0 이면 제한 없음)
+VOLTAGE_TRACE_QUOTA_BYTES = int(os.environ.get("VOLTAGE_TRACE_QUOTA_BYTES", str(16 * 1024 * 1024)))
+# 레코드 N개마다 flush (1Hz 기준 약 1분). 강제 종료 시 잃는 최대 구간.
+VOLTAGE_TRACE_FLUSH_RECORDS = int(os.environ.get("VOLTAGE_TRACE_FLUSH_RECORDS", "60"))
+
+TRACE_SUFFIX = ".hemtrace"
+MAGIC = b"HEMTRACE"
+VERSION = 1
+_HEADER = struct.Struct("<HHI")
+
+# idx, flags, t_start(루프 시작 monotonic), t_read(ADC 읽기 직후 monotonic), h2s_v, vocs_v, switch_v,
+# loop_sec(루프 처리 시간, sleep 제외), elapsed(SampleStore.time 누적 시간 = replay times)
+RECORD = struct.Struct("<IIddddddd")
+RECORD_FIELDS = ("idx", "flags", "t_start", "t_read", "h2s_v", "vocs_v", "switch_v", "loop_sec", "elapsed")
+RECORD_DTYPE = [("idx", "<u4"), ("flags", "<u4")] + [(name, "<f8") for name in RECORD_FIELDS[2:]]
+
+FLAG_DETECTED = 1  # 이 샘플에서 feces_st 감지
+FLAG_CAPTURE = 2   # 이 샘플에서 슬롯 촬영 요청
+
+
+class TraceWriter:
+    """세션 1개의 trace 파일 writer. measure_sequence 루프 스레드 전용 (lock 없음)."""
+
+    def __init__(self, path, meta):
+        self.path = path
+        meta_bytes = json.dumps(meta, ensure_ascii=False, sort_keys=True).encode("utf-8")
+        header_size = len(MAGIC) + _HEADER.size + len(meta_bytes)
+        pad = -header_size % 8
+        header_size += pad
+        self.records = 0
+        self._buf = bytearray(RECORD.size)
+        self._f = open(path, "wb", buffering=max(1, VOLTAGE_TRACE_FLUSH_RECORDS) * RECORD.size + header_size)
+        self._f.write(MAGIC + _HEADER.pack(VERSION, RECORD.size, header_size) + meta_bytes + b" " * pad)
+
+    def append(self, idx, flags, t_start, t_read, h2s_v, vocs_v, switch_v, loop_sec, elapsed):
+        """레코드 1개 기록 (버퍼링, flush 는 VOLTAGE_TRACE_FLUSH_RECORDS 마다)."""
+        if self._f is None:
+            return
+        RECORD.pack_into(self._buf, 0, idx, flags, t_start, t_read, h2s_v, vocs_v, switch_v, loop_sec, elapsed)
+        self._f.write(self._buf)
+        self.records += 1
+        if VOLTAGE_TRACE_FLUSH_RECORDS > 0 and self.records % VOLTAGE_TRACE_FLUSH_RECORDS == 0:
+            self._f.flush()
+
+    def close(self):
+        """flush + fsync 후 닫기. 여러 번 호출 가능."""
+        f, self._f = self._f, None
+        if f is None:
+            return
+        try:
+            f.flush()
+            os.fsync(f.fileno())
+        except OSError as e:
+            print(f"[voltage_trace] fsync 실패 {self.path}: {e}", file=sys.stderr)
+        finally:
+            f.close()
+
+
+_quota_lock = threading.Lock()
+
+
+def open_trace(data_file_name, meta=None, directory=None):
+    """
+    세션 trace 열기. 비활성(VOLTAGE_TRACE=0)이거나 열기 실패 시 None (측정은 trace 없이 진행).
+    열기 전에 quota 를 적용해 이번 세션 분량 여유 확보.
+    :param meta: 헤더에 넣을 JSON 직렬화 가능 dict (gas_id, 상수 등)
+    :return: TraceWriter 또는 None
+    """
+    if not VOLTAGE_TRACE_ENABLED:
+        return None
+    directory = directory or VOLTAGE_TRACE_DIR
+    try:
+        os.makedirs(directory, exist_ok=True)
+        evicted = enforce_dir_quota(directory, VOLTAGE_TRACE_QUOTA_BYTES, lock=_quota_lock)
+        if evicted:
+            print(f"[voltage_trace] quota {VOLTAGE_TRACE_QUOTA_BYTES} bytes 초과 → 오래된 trace {len(evicted)}개 삭제", file=sys.stderr)
+        started = datetime.now()
+        meta = dict(meta or {}, data_file_name=data_file_name, started_at=started.isoformat(timespec="seconds"),
+                    fields=list(RECORD_FIELDS))
+        path = os.path.join(directory, f"{data_file_name}_{started:%Y%m%d%H%M%S}{TRACE_SUFFIX}")
+        return TraceWriter(path, meta)
+    except OSError as e:
+        print(f"[voltage_trace] trace 열기 실패(기록 생략): {e}", file=sys.stderr)
+        return None
+
+
+def read_header(f):
+    """:return: (meta dict, header_size, record_size). 형식이 다르면 ValueError."""
+    head = f.read(len(MAGIC) + _HEADER.size)
+    if len(head) < len(MAGIC) + _HEADER.size or head[:len(MAGIC)] != MAGIC:
+        raise ValueError("hemtrace 파일이 아님")
+    version, record_size, header_size = _HEADER.unpack_from(head, len(MAGIC))
+    if version != VERSION or record_size != RECORD.size:
+        raise ValueError(f"지원하지 않는 trace version={version} record_size={record_size}")
+    meta = json.loads(f.read(header_size - len(head)).decode("utf-8").rstrip() or "{}")
+    return meta, header_size, record_size
+
+
+def read_trace(path, use_numpy=True):
+    """
+    trace 파일 읽기. 마지막 불완전 레코드(쓰는 중 강제 종료)는 무시.
+    :param use_numpy: True 이고 numpy 가 있으면 records 는 numpy.memmap 구조체 배열 (복사 없음, records["h2s_v"] 등)
+    :return: (meta, records) — numpy 미사용 시 records 는 RECORD_FIELDS 순서 tuple 리스트
+    """
+    with open(path, "rb") as f:
+        meta, header_size, record_size = read_header(f)
+        count = (os.fstat(f.fileno()).st_size - header_size) // record_size
+        if use_numpy:
+            try:
+                import numpy as np
+            except ImportError:
+                np = None
+            if np is not None:
+                if count <= 0:
+                    return meta, np.zeros(0, dtype=RECORD_DTYPE)
+                return meta, np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=header_size, shape=(count,))
+        body = f.read(count * record_size)
+    return meta, list(RECORD.iter_unpack(body))
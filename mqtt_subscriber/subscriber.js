@@ -13,6 +13,8 @@
 
  * - GPIO_SIMULATION=1 시 테스트 모드 (TEST_GAS_ID, TEST_TEST_ID, TEST_PROFILE_ID 로 payload 보강)
  * - GPIO_CONTROLLER_MAIN (default: 프로젝트 루트의 gpio_controller/main.py 경로)
+ * - GPIO_DAEMON=1 시 gpio_controller 를 `main.py --serve` 로 상주 실행, start/stop 을 stdin JSON-lines 로 전달
+ *   (명령마다 python 기동·import·ADC/I2C 초기화 없음). 미설정 시 기존처럼 명령마다 main.py 1회 실행.
  * - STATUS_API_URL 또는 API_BASE_URL / DATA_API_URL (디바이스 상태 보고용 API 베이스)
  */
 require('dotenv').config();
@@ -69,8 +71,15 @@ function isSimMode(envOnly, payloadObj) {
   return isTestMode;
 }
 
+// 상주 gpio_controller 사용 여부 (main.py --serve)
+const USE_GPIO_DAEMON = ['1', 'true', 'yes'].includes((process.env.GPIO_DAEMON || '').toString().toLowerCase());
+
 let currentGpioProcess = null;
 let lastMeasurementStartedAt = null;
+// 데몬 모드 상태: gpioDaemon = { proc, jobs: Map(id → { resolve, reject }) }, currentDaemonJobId = 진행 중 세션 id
+let gpioDaemon = null;
+let gpioDaemonJobSeq = 0;
+let currentDaemonJobId = null;
 
 function ts() {
   return new Date().toISOString();
@@ -120,20 +129,114 @@ async function registerDeviceStatus() {
   }
 }
 
+/** gpio_controller 자식 프로세스 환경변수 */
+function gpioEnv(extra) {
+  const env = {
+    ...process.env,
+    DEVICE_ID,
+    // 한글 로그 깨짐 방지: Python 자식 프로세스가 stdout/stderr를 UTF-8로 출력하도록 유도
+    PYTHONIOENCODING: 'utf-8',
+    LANG: process.env.LANG || 'C.UTF-8',
+    LC_ALL: process.env.LC_ALL || 'C.UTF-8',
+    ...(extra || {}),
+  };
+  if (process.env.GPIO_SIMULATION !== undefined) {
+    env.GPIO_SIMULATION = process.env.GPIO_SIMULATION;
+  }
+  return env;
+}
+
+/** 데몬 이벤트 1건 처리: 세션 종료 이벤트로 runGpioController promise 완료 */
+function handleDaemonEvent(ev) {
+  const job = ev.id != null ? gpioDaemon?.jobs.get(ev.id) : null;
+  switch (ev.event) {
+    case 'ready':
+      log('[SUBSCRIBER] gpio_controller 데몬 준비 완료 pid=', ev.pid);
+      return;
+    case 'started':
+      currentDaemonJobId = ev.id;
+      return;
+    case 'finished':
+    case 'stopped':
+    case 'error':
+    case 'busy':
+      if (currentDaemonJobId === ev.id) currentDaemonJobId = null;
+      if (!job) {
+        if (ev.event === 'error') logErr('[SUBSCRIBER] gpio_controller 데몬 오류:', ev.error);
+        return;
+      }
+      gpioDaemon.jobs.delete(ev.id);
+      if (ev.event === 'finished' && ev.code === 0) job.resolve({ stdout: '', stderr: '' });
+      else if (ev.event === 'stopped') job.resolve({ stdout: '', stderr: '', stopped: true });
+      else job.reject(new Error(`gpio_controller ${ev.event}: ${ev.error || (ev.code != null ? `exit ${ev.code}` : ev.current != null ? `세션 ${ev.current} 진행 중` : '')}`));
+      return;
+    default:
+      return;
+  }
+}
+
+/** 상주 gpio_controller(main.py --serve) 기동 (이미 실행 중이면 재사용) */
+function ensureGpioDaemon() {
+  if (gpioDaemon) return gpioDaemon;
+  const proc = spawn(PYTHON_BIN, [GPIO_CONTROLLER_MAIN, '--serve'], {
+    cwd: path.dirname(GPIO_CONTROLLER_MAIN),
+    env: gpioEnv(),
+    stdio: ['pipe', 'pipe', 'pipe'],
+  });
+  const daemon = { proc, jobs: new Map() };
+  gpioDaemon = daemon;
+  log('[SUBSCRIBER] gpio_controller 데몬 기동 pid=', proc.pid);
+  let buf = '';
+  proc.stdout.on('data', (d) => {
+    buf += d.toString('utf8');
+    let nl;
+    while ((nl = buf.indexOf('\n')) >= 0) {
+      const line = buf.slice(0, nl);
+      buf = buf.slice(nl + 1);
+      let ev = null;
+      try { ev = JSON.parse(line); } catch (_) {}
+      if (ev && typeof ev === 'object' && ev.event) handleDaemonEvent(ev);
+      else if (line) process.stdout.write(line + '\n', 'utf8');
+    }
+  });
+  proc.stderr.on('data', (d) => process.stderr.write(d.toString('utf8'), 'utf8'));
+  proc.stdin.on('error', (e) => logErr('[SUBSCRIBER] gpio_controller 데몬 stdin 오류:', e.message));
+  proc.on('close', (code) => {
+    logErr('[SUBSCRIBER] gpio_controller 데몬 종료 code=', code, '(다음 start 시 재기동)');
+    if (gpioDaemon === daemon) gpioDaemon = null;
+    currentDaemonJobId = null;
+    for (const job of daemon.jobs.values()) job.reject(new Error(`gpio_controller 데몬 종료 code=${code}`));
+    daemon.jobs.clear();
+  });
+  return daemon;
+}
+
+function sendDaemonCommand(msg) {
+  const daemon = ensureGpioDaemon();
+  daemon.proc.stdin.write(JSON.stringify(msg) + '\n');
+  return daemon;
+}
+
+function runGpioControllerDaemon(payload) {
+  return new Promise((resolve, reject) => {
+    const id = ++gpioDaemonJobSeq;
+    const payloadObj = typeof payload === 'string' ? JSON.parse(payload || '{}') : payload || {};
+    const daemon = ensureGpioDaemon();
+    daemon.jobs.set(id, { resolve, reject });
+    sendDaemonCommand({ cmd: 'start', id, payload: payloadObj });
+  });
+}
+
+function isGpioBusy() {
+  return USE_GPIO_DAEMON ? currentDaemonJobId != null || (gpioDaemon?.jobs.size || 0) > 0 : !!currentGpioProcess;
+}
+
 function runGpioController(payload) {
+  if (USE_GPIO_DAEMON) return runGpioControllerDaemon(payload);
   return new Promise((resolve, reject) => {
-    const env = {
-      ...process.env,
-      DEVICE_ID,
+    const env = gpioEnv({
       MQTT_PAYLOAD: typeof payload === 'string' ? payload : JSON.stringify(payload || {}),
-      // 한글 로그 깨짐 방지: Python 자식 프로세스가 stdout/stderr를 UTF-8로 출력하도록 유도
-      PYTHONIOENCODING: 'utf-8',
-      LANG: process.env.LANG || 'C.UTF-8',
-      LC_ALL: process.env.LC_ALL || 'C.UTF-8',
-    };
-    if (process.env.GPIO_SIMULATION !== undefined) {
-      env.GPIO_SIMULATION = process.env.GPIO_SIMULATION;
-    }
+    });
     const py = spawn(PYTHON_BIN, [GPIO_CONTROLLER_MAIN], {
       cwd: path.dirname(GPIO_CONTROLLER_MAIN),
       env,
@@ -162,6 +265,15 @@ function runGpioController(payload) {
 }
 
 function stopGpioController() {
+  if (USE_GPIO_DAEMON) {
+    if (!isGpioBusy()) {
+      log('[SUBSCRIBER] command/measurement/stop: 진행 중인 gpio_controller 세션 없음');
+      return;
+    }
+    log('[SUBSCRIBER] command/measurement/stop: gpio_controller 데몬에 stop 전달');
+    sendDaemonCommand({ cmd: 'stop' });
+    return;
+  }
   if (!currentGpioProcess) {
     log('[SUBSCRIBER] command/measurement/stop: 실행 중인 gpio_controller 없음');
     return;
@@ -193,7 +305,7 @@ function reportStatusToApi(payloadObj) {
     }
     const body = JSON.stringify({
       device_id: DEVICE_ID,
-      measuring: !!currentGpioProcess,
+      measuring: isGpioBusy(),
       last_measurement_started_at: lastMeasurementStartedAt || null,
       timestamp: new Date().toISOString(),
       ...(payloadObj && typeof payloadObj === 'object' ? payloadObj : {}),
@@ -242,7 +354,8 @@ const prefix = `device/${DEVICE_ID}/`;
 client.on('connect', async () => {
   log('[SCENARIO] 1. start.sh로 subscriber 기동 → MQTT 연결됨', 'clientId=', CLIENT_ID, 'deviceId=', DEVICE_ID);
   log('[SUBSCRIBER] 시뮬레이션 모드=', isTestMode ? 'ON (프로덕션은 gas_id/test_id만 전달; 누락 시 테스트값 보강)' : 'OFF (프로덕션)');
-  log('[SUBSCRIBER] gpio_controller Python:', PYTHON_BIN);
+  log('[SUBSCRIBER] gpio_controller Python:', PYTHON_BIN, USE_GPIO_DAEMON ? '(데몬 모드)' : '');
+  if (USE_GPIO_DAEMON) ensureGpioDaemon();
 
   await registerDeviceAP();
   await registerDeviceStatus();